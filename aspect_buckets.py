@@ -0,0 +1,170 @@
+import math
+import random
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import Sampler, Subset
+import torchvision.transforms as T
+from PIL import Image
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Width / height ratios, from tall mobile screenshots to wide client captures
+DEFAULT_BUCKET_RATIOS = (9 / 19.5, 9 / 16, 3 / 4, 1.0, 4 / 3, 16 / 9, 19.5 / 9)
+
+# Same normalization as GameUIDataset, without the fixed resize
+BUCKET_TRANSFORM = T.Compose([
+    T.ToTensor(),
+    T.Normalize(mean=[0.485, 0.456, 0.406],
+               std=[0.229, 0.224, 0.225])
+])
+
+def bucket_shape(ratio: float, area: int = 800 * 600, stride: int = 32) -> Tuple[int, int]:
+    """Return the (height, width) of a bucket with the given aspect ratio and about area pixels"""
+    height = math.sqrt(area / ratio)
+    width = height * ratio
+    return (max(stride, int(round(height / stride)) * stride),
+            max(stride, int(round(width / stride)) * stride))
+
+def nearest_bucket(aspect_ratio: float, bucket_ratios: Sequence[float] = DEFAULT_BUCKET_RATIOS) -> int:
+    """Index of the bucket closest to aspect_ratio (compared in log space)"""
+    log_ratios = np.log(np.asarray(bucket_ratios))
+    return int(np.argmin(np.abs(log_ratios - math.log(aspect_ratio))))
+
+def compute_aspect_ratios(dataset) -> np.ndarray:
+    """
+    Width / height of every sample of a map-style dataset.
+
+    Uses the sizes recorded in a COCO index when available and otherwise reads
+    only the image header, so no image is decoded.
+    """
+    if isinstance(dataset, Subset):
+        return compute_aspect_ratios(dataset.dataset)[np.asarray(dataset.indices)]
+
+    ratios = np.empty(len(dataset), dtype=np.float32)
+    sizes = getattr(dataset, 'image_sizes', None)
+    for idx in range(len(dataset)):
+        if sizes is not None and sizes[idx][0] > 0:
+            width, height = sizes[idx]
+        else:
+            with Image.open(dataset.image_path(idx)) as image:
+                width, height = image.size
+        ratios[idx] = width / height
+    return ratios
+
+def letterbox(image: torch.Tensor,
+              annotations: List[Dict],
+              size: Tuple[int, int],
+              fill: float = 0.0) -> Tuple[torch.Tensor, List[Dict]]:
+    """
+    Resize a CHW image to fit size (height, width) without distortion and pad the rest.
+
+    Relative bboxes are remapped to the letterboxed frame. With normalized
+    images a fill of 0 pads with the dataset mean color.
+    """
+    _, height, width = image.shape
+    out_height, out_width = size
+    scale = min(out_height / height, out_width / width)
+    new_height = max(1, int(round(height * scale)))
+    new_width = max(1, int(round(width * scale)))
+    pad_top = (out_height - new_height) // 2
+    pad_left = (out_width - new_width) // 2
+
+    output = image.new_full((image.shape[0], out_height, out_width), fill)
+    resized = F.interpolate(image[None], size=(new_height, new_width),
+                            mode='bilinear', align_corners=False, antialias=True)[0]
+    output[:, pad_top:pad_top + new_height, pad_left:pad_left + new_width] = resized
+
+    # Relative box -> pixels in the resized image -> relative to the padded frame
+    boxed = []
+    for ann in annotations:
+        x, y, w, h = ann['bbox']
+        ann = dict(ann)
+        ann['bbox'] = [(x * new_width + pad_left) / out_width,
+                       (y * new_height + pad_top) / out_height,
+                       w * new_width / out_width,
+                       h * new_height / out_height]
+        boxed.append(ann)
+
+    return output, boxed
+
+class Letterbox:
+    """Joint image/annotation transform letterboxing to a fixed (height, width)"""
+
+    def __init__(self, size: Tuple[int, int], fill: float = 0.0):
+        self.size = size
+        self.fill = fill
+
+    def __call__(self, image: torch.Tensor, annotations: List[Dict]) -> Tuple[torch.Tensor, List[Dict]]:
+        return letterbox(image, annotations, self.size, self.fill)
+
+class AspectRatioBucketSampler(Sampler[List[int]]):
+    """
+    Batch sampler yielding batches whose samples all fall in the same aspect ratio bucket.
+
+    Use with BucketCollate, which letterboxes every batch to the shape of its bucket.
+    """
+
+    def __init__(self,
+                 aspect_ratios: Sequence[float],
+                 batch_size: int,
+                 bucket_ratios: Sequence[float] = DEFAULT_BUCKET_RATIOS,
+                 shuffle: bool = True,
+                 drop_last: bool = False,
+                 seed: int = 0):
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+        self.buckets: List[List[int]] = [[] for _ in bucket_ratios]
+        for idx, ratio in enumerate(aspect_ratios):
+            self.buckets[nearest_bucket(ratio, bucket_ratios)].append(idx)
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __iter__(self) -> Iterator[List[int]]:
+        rng = random.Random(self.seed + self.epoch)
+        batches = []
+        for bucket in self.buckets:
+            indices = list(bucket)
+            if self.shuffle:
+                rng.shuffle(indices)
+            for start in range(0, len(indices), self.batch_size):
+                batch = indices[start:start + self.batch_size]
+                if len(batch) < self.batch_size and self.drop_last:
+                    continue
+                batches.append(batch)
+
+        # Interleave buckets so consecutive batches do not all share one shape
+        if self.shuffle:
+            rng.shuffle(batches)
+        return iter(batches)
+
+    def __len__(self) -> int:
+        if self.drop_last:
+            return sum(len(bucket) // self.batch_size for bucket in self.buckets)
+        return sum(math.ceil(len(bucket) / self.batch_size) for bucket in self.buckets)
+
+class BucketCollate:
+    """Letterbox a batch to the shape of its aspect ratio bucket and stack it"""
+
+    def __init__(self,
+                 bucket_ratios: Sequence[float] = DEFAULT_BUCKET_RATIOS,
+                 area: int = 800 * 600,
+                 stride: int = 32):
+        self.bucket_ratios = bucket_ratios
+        self.shapes = [bucket_shape(ratio, area, stride) for ratio in bucket_ratios]
+
+    def __call__(self, batch: List[Tuple[torch.Tensor, List[Dict]]]) -> Tuple[torch.Tensor, List[List[Dict]]]:
+        # The sampler keeps one bucket per batch, the first sample decides its shape
+        _, height, width = batch[0][0].shape
+        size = self.shapes[nearest_bucket(width / height, self.bucket_ratios)]
+
+        images, annotations = [], []
+        for image, anns in batch:
+            image, anns = letterbox(image, anns, size)
+            images.append(image)
+            annotations.append(anns)
+        return torch.stack(images), annotations
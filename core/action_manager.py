@@ -1,8 +1,12 @@
 # core/action_manager.py
-from typing import Dict, List, Optional
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 import time
 import json
+import cv2
+import numpy as np
+from core.instrumentation import metrics
 
 @dataclass
 class Action:
@@ -12,6 +16,16 @@ class Action:
     timeout: float = 5.0
     retry_interval: float = 0.5
 
+@dataclass
+class ActionTiming:
+    """How long an action waited for its target, None if it never became ready"""
+    sequence: str
+    action: str
+    window: int
+    time_to_ready: Optional[float] = None
+    attempts: int = 0    # Frames run through detection
+    frames: int = 0      # Frames looked at
+
 class ActionSequence:
     def __init__(self, name: str):
         self.name = name
@@ -20,12 +34,114 @@ class ActionSequence:
     def add_action(self, action: Action):
         self.actions.append(action)
 
+class ActionRun:
+    """
+    One action waiting for its target on one window: the deadline, the
+    change-driven detection schedule with its backoff, the click and the
+    ActionTiming. ActionManager._run_action drives one with its own waits;
+    MultiWindowExecutor drives one per window from its rounds.
+
+    For every new frame call needs_detection, then detected with what was
+    found when it returned True, then next_wait unless detected clicked.
+    """
+
+    def __init__(self,
+                 manager: "ActionManager",
+                 sequence_name: str,
+                 action: Action,
+                 window,
+                 max_retries: Optional[int] = None,
+                 clicked: Optional[np.ndarray] = None,
+                 threshold: float = 0.7):
+        self.manager = manager
+        self.sequence_name = sequence_name
+        self.action = action
+        self.window = window
+        self.max_retries = max_retries
+        self.threshold = threshold
+        self.wanted = {action.target, *action.required_elements}
+        self.start = time.monotonic()
+        self.deadline = self.start + action.timeout
+        self.timing = ActionTiming(sequence_name, action.name, window.handle)
+
+        # Until the screen changes from the one clicked last, re-detecting it is pointless
+        self.examined = clicked
+        self.last_detection = self.start
+        self.wait = manager.min_wait
+        self.sample: Optional[np.ndarray] = None
+        self.changed = False
+        self.status = "waiting"   # waiting, clicked or failed
+
+    def needs_detection(self, image: np.ndarray) -> bool:
+        """Look at a new frame, True when it should be run through detection"""
+        self.timing.frames += 1
+        self.sample = self.manager._sample(image)
+        self.changed = self.manager._changed(self.examined, self.sample)
+        now = time.monotonic()
+        # A still screen is re-checked every retry_interval, and at least once before the deadline
+        if (self.changed or now - self.last_detection >= self.action.retry_interval or
+                (self.timing.attempts == 0 and self.deadline - now <= self.wait)):
+            self.timing.attempts += 1
+            metrics.count("detection_attempts", sequence=self.sequence_name, action=self.action.name)
+            return True
+        metrics.count("unchanged_frames")
+        self.wait = min(self.wait * 2, self.action.retry_interval)
+        return False
+
+    def detected(self, found: Dict) -> bool:
+        """Handle the elements found in the frame, clicking the target (and returning True) when ready"""
+        manager = self.manager
+        if manager.recorder is not None:
+            manager.recorder.record_detections(found.values(), self.window.handle)
+
+        target = found.get(self.action.target)
+        if target and all(name in found for name in self.action.required_elements):
+            self.timing.time_to_ready = time.monotonic() - self.start
+            manager.action_timings.append(self.timing)
+            metrics.observe("action_ready", self.timing.time_to_ready,
+                            sequence=self.sequence_name, action=self.action.name)
+            # Execute click at relative coordinates
+            manager.window_manager.click_at(self.window, target.x, target.y)
+            self.status = "clicked"
+            return True
+
+        if self.changed:
+            # Something moved, the target may be about to appear: look again soon
+            self.wait = manager.min_wait
+        self.examined = self.sample
+        self.last_detection = time.monotonic()
+        return False
+
+    def next_wait(self) -> Optional[float]:
+        """Seconds until the next frame is due, or None (and failed) once out of time or retries"""
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0 or (self.max_retries is not None and self.timing.attempts >= self.max_retries):
+            self.fail()
+            return None
+        return min(self.wait, remaining)
+
+    def fail(self):
+        self.status = "failed"
+        self.manager.action_timings.append(self.timing)
+        metrics.count("action_failures", sequence=self.sequence_name, action=self.action.name)
+
 class ActionManager:
     """Manages game actions and sequences"""
     
-    def __init__(self, window_manager, element_detector):
+    def __init__(self, window_manager, element_detector, recorder=None, timing_history: int = 1000):
         self.window_manager = window_manager
         self.element_detector = element_detector
+        # Optional SessionRecorder, receives what each detection step found
+        self.recorder = recorder
+        # The last timing_history action timings; older ones only remain in the metrics
+        self.action_timings: Deque[ActionTiming] = deque(maxlen=timing_history)
+        # Waits between checks of a still screen grow from min_wait to Action.retry_interval
+        self.min_wait = 0.02
+        # A frame counts as changed when change_pixels samples (every change_step-th
+        # pixel) differ by more than change_threshold, so capture noise is ignored
+        self.change_step = 4
+        self.change_threshold = 12
+        self.change_pixels = 16
         self.sequences: Dict[str, ActionSequence] = {}
         
     def load_sequences(self, config_path: str):
@@ -40,39 +156,110 @@ class ActionManager:
                 sequence.add_action(action)
             self.sequences[seq_name] = sequence
     
+    def _continuous(self, window) -> bool:
+        return window.handle in getattr(self.window_manager, 'capture_threads', {})
+
+    def _first_frame(self, window) -> Tuple[np.ndarray, int]:
+        """The current frame and its sequence number (0 outside continuous capture mode)"""
+        if self._continuous(window):
+            return self.window_manager.capture_window_seq(window)
+        return self.window_manager.capture_window(window), 0
+
+    def _next_frame(self, window, after_seq: int, timeout: float) -> Tuple[Optional[np.ndarray], int]:
+        """
+        Wait up to timeout for a new frame. In continuous capture mode this
+        returns a copy of the first frame newer than after_seq as soon as it
+        arrives (None if none did), otherwise it sleeps and captures.
+        """
+        if self._continuous(window):
+            with metrics.span("wait", mode="frame"):
+                frame = self.window_manager.newer_frame(window, after_seq, timeout)
+            return frame if frame is not None else (None, after_seq)
+        with metrics.span("wait", mode="sleep"):
+            time.sleep(timeout)
+        return self.window_manager.capture_window(window), after_seq + 1
+
+    def _sample(self, image: np.ndarray) -> np.ndarray:
+        """Strided copy of a frame, enough to notice an icon appearing and cheap to compare"""
+        return np.ascontiguousarray(image[::self.change_step, ::self.change_step])
+
+    def _changed(self, reference: Optional[np.ndarray], sample: np.ndarray) -> bool:
+        if reference is None or reference.shape != sample.shape:
+            return True
+        diff = cv2.absdiff(reference, sample)
+        return np.count_nonzero(diff > self.change_threshold) >= self.change_pixels
+
+    def _run_action(self,
+                    sequence_name: str,
+                    action: Action,
+                    window,
+                    max_retries: Optional[int],
+                    clicked: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Wait until the action's target is ready and click it. Returns the
+        sample of the clicked frame, or None when the deadline passed.
+        """
+        run = ActionRun(self, sequence_name, action, window, max_retries, clicked)
+        # Waits start from the examined frame's seq, so they only return newer frames
+        image, seq = self._first_frame(window)
+        while True:
+            if run.needs_detection(image):
+                found = self.element_detector.find_elements(
+                    image, run.wanted, threshold=run.threshold, cache_key=window.handle)
+                if run.detected(found):
+                    return run.sample
+
+            wait = run.next_wait()
+            if wait is None:
+                return None
+            next_image, seq = self._next_frame(window, seq, wait)
+            if next_image is not None:
+                image = next_image
+
     def execute_sequence(self, 
                         sequence_name: str, 
                         window,
-                        max_retries: int = 3) -> bool:
-        """Execute a sequence of actions on specified window"""
+                        max_retries: Optional[int] = None) -> bool:
+        """
+        Execute a sequence of actions on specified window
+
+        Each action waits for its target until Action.timeout. Frames are
+        only run through detection when they differ from the last one that
+        was (or from the frame of the previous click), with checks backing off
+        from min_wait to the action's retry_interval while the screen is
+        still. max_retries optionally caps the detections per action.
+        Every action's time to ready is appended to action_timings, which
+        keeps the last timing_history of them.
+        """
         if sequence_name not in self.sequences:
             raise ValueError(f"Unknown sequence: {sequence_name}")
             
         sequence = self.sequences[sequence_name]
         
-        for action in sequence.actions:
-            retry_count = 0
-            while retry_count < max_retries:
-                # Capture current window state
-                image = self.window_manager.capture_window(window)
-                
-                # Detect required elements
-                elements = self.element_detector.detect_elements(image)
-                
-                # Find target element
-                target = next((e for e in elements 
-                             if e.name == action.target 
-                             and e.confidence > 0.7), None)
-                
-                if target:
-                    # Execute click at relative coordinates
-                    self.window_manager.click_at(window, target.x, target.y)
-                    break
-                    
-                retry_count += 1
-                time.sleep(action.retry_interval)
-            
-            if retry_count >= max_retries:
-                return False
-                
+        with metrics.span("sequence", sequence=sequence_name):
+            clicked = None
+            for action in sequence.actions:
+                clicked = self._run_action(sequence_name, action, window, max_retries, clicked)
+                if clicked is None:
+                    metrics.count("sequences", sequence=sequence_name, result="failed")
+                    return False
+
+        metrics.count("sequences", sequence=sequence_name, result="done")
         return True
+
+    def timing_summary(self) -> Dict[str, Dict[str, float]]:
+        """Time to ready percentiles and failures per action name, over action_timings"""
+        by_action: Dict[str, List[ActionTiming]] = {}
+        for timing in self.action_timings:
+            by_action.setdefault(timing.action, []).append(timing)
+        summary = {}
+        for name, timings in by_action.items():
+            ready = [t.time_to_ready for t in timings if t.time_to_ready is not None]
+            summary[name] = {
+                'count': len(timings),
+                'failed': len(timings) - len(ready),
+                'p50_s': float(np.percentile(ready, 50)) if ready else float('nan'),
+                'p95_s': float(np.percentile(ready, 95)) if ready else float('nan'),
+                'mean_attempts': float(np.mean([t.attempts for t in timings])),
+            }
+        return summary
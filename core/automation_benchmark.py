@@ -0,0 +1,118 @@
+# core/automation_benchmark.py
+from typing import Dict, List
+import json
+import time
+import numpy as np
+from core.action_manager import ActionManager
+from core.instrumentation import metrics
+from core.multi_window_executor import MultiWindowExecutor, summarize
+from core.simulated_environment import SimulatedWindowManager
+
+def detector_counts(detector) -> Dict[str, float]:
+    """Work counters of an ElementDetector (or a tracker wrapping one)"""
+    tracker_detections = getattr(detector, 'detection_count', None)
+    detector = getattr(detector, 'detector', detector)
+    counts = {
+        'model_inferences': detector.inference_count,
+        'region_inferences': detector.region_inference_count,
+        'fast_path_hits': detector.fast_path_count,
+    }
+    counts.update({f"cache_{k}": v for k, v in detector.detection_cache.stats().items()})
+    if tracker_detections is not None:
+        counts['tracker_detections'] = tracker_detections
+    return counts
+
+def run_benchmark(window_manager: SimulatedWindowManager,
+                  action_manager: ActionManager,
+                  sequence_names: List[str],
+                  repeats: int = 10) -> Dict:
+    """
+    Run every sequence repeats times on the simulated windows, resetting the
+    state graph before each run. One window uses execute_sequence, several
+    windows run concurrently through MultiWindowExecutor. Both record an
+    ActionTiming per action, so 'actions' summarizes either path.
+    """
+    action_manager.action_timings.clear()
+    windows = window_manager.find_game_windows(window_manager.simulation.title)
+    executor = MultiWindowExecutor(window_manager, action_manager) if len(windows) > 1 else None
+    simulation = window_manager.simulation
+
+    completed = failed = 0
+    sequence_latencies: Dict[str, List[float]] = {name: [] for name in sequence_names}
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for name in sequence_names:
+            simulation.reset()
+            run_start = time.perf_counter()
+            if executor is None:
+                success = action_manager.execute_sequence(name, windows[0])
+                completed += success
+                failed += not success
+            else:
+                summary = summarize(executor.run(name, windows), 0.0)
+                completed += summary['done']
+                failed += summary['failed']
+            sequence_latencies[name].append(time.perf_counter() - run_start)
+    elapsed = time.perf_counter() - start
+    if executor is not None:
+        executor.close()
+
+    return {
+        'windows': len(windows),
+        'repeats': repeats,
+        'elapsed_s': elapsed,
+        'sequences_completed': completed,
+        'sequences_failed': failed,
+        'sequences_per_sec': completed / elapsed if elapsed > 0 else 0.0,
+        'sequence_p50_s': {name: float(np.percentile(v, 50)) for name, v in sequence_latencies.items()},
+        'sequence_p95_s': {name: float(np.percentile(v, 95)) for name, v in sequence_latencies.items()},
+        'actions': action_manager.timing_summary(),
+        'detector': detector_counts(action_manager.element_detector),
+        'simulation': {'captures': simulation.captures, 'clicks': simulation.clicks,
+                       'missed_clicks': simulation.missed_clicks, 'transitions': simulation.transitions},
+    }
+
+# Usage example:
+if __name__ == "__main__":
+    import argparse
+    from core.detection_backends import TemplateMatchingBackend
+    from core.element_detection import ElementDetector
+    from core.element_tracker import ElementTracker
+
+    parser = argparse.ArgumentParser(description="End-to-end ActionManager benchmark on a simulated game")
+    parser.add_argument("environment", help="State graph config (see core.simulated_environment.load_state_graph)")
+    parser.add_argument("sequences", help="Sequences config, as loaded by ActionManager.load_sequences")
+    parser.add_argument("--names", nargs="+", help="Sequences to run (default: all)")
+    parser.add_argument("--model")
+    parser.add_argument("--categories")
+    parser.add_argument("--template-dir")
+    parser.add_argument("--tracker", action="store_true", help="Put an ElementTracker in front of the detector")
+    parser.add_argument("--windows", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--render-latency", type=float, default=0.1)
+    parser.add_argument("--noise", type=int, default=2)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    metrics.enable()
+    backend = TemplateMatchingBackend(args.template_dir) if args.template_dir else None
+    detector = ElementDetector(args.model, args.categories, fast_backend=backend)
+    detector.ready.result()
+    window_manager = SimulatedWindowManager(args.environment, args.windows, args.render_latency, args.noise)
+    action_manager = ActionManager(window_manager, ElementTracker(detector) if args.tracker else detector)
+    action_manager.load_sequences(args.sequences)
+
+    results = run_benchmark(window_manager, action_manager,
+                            args.names or list(action_manager.sequences), args.repeats)
+    results['metrics'] = metrics.snapshot()['histograms']
+
+    print(f"{results['sequences_completed']} sequences completed, {results['sequences_failed']} failed "
+          f"on {results['windows']} windows: {results['sequences_per_sec']:.2f} sequences/s")
+    for name, summary in results['actions'].items():
+        print(f"  {name:<20} time to ready p50 {1000 * summary['p50_s']:7.1f} ms  "
+              f"p95 {1000 * summary['p95_s']:7.1f} ms  {summary['mean_attempts']:.1f} detections")
+    print(f"  detector: {results['detector']}")
+    print(metrics.format_table())
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,281 @@
+# core/capture_backends.py
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+import ctypes
+import time
+import cv2
+import numpy as np
+
+# pywin32 only exists on Windows, everything else here must import without it
+try:
+    import win32api
+    import win32con
+    import win32gui
+except ImportError:
+    win32api = win32con = win32gui = None
+
+if TYPE_CHECKING:
+    from core.window_manager import Window
+
+class CaptureBackend:
+    """
+    Source of window frames for WindowManager. capture returns a BGRA
+    (height, width, 4) uint8 frame that may be a buffer reused by the next
+    capture of the same window, so copy it to keep it.
+    """
+
+    def find_windows(self, window_title: str) -> List["Window"]:
+        raise NotImplementedError
+
+    def capture(self, window: "Window") -> np.ndarray:
+        raise NotImplementedError
+
+    def click(self, window: "Window", x: int, y: int) -> None:
+        """Left click at absolute screen coordinates"""
+        raise NotImplementedError
+
+    def release(self, window: Optional["Window"] = None):
+        """Free what is kept for one window, or for all of them"""
+
+class BITMAPINFOHEADER(ctypes.Structure):
+    _fields_ = [('biSize', ctypes.c_uint32), ('biWidth', ctypes.c_int32), ('biHeight', ctypes.c_int32),
+                ('biPlanes', ctypes.c_uint16), ('biBitCount', ctypes.c_uint16),
+                ('biCompression', ctypes.c_uint32), ('biSizeImage', ctypes.c_uint32),
+                ('biXPelsPerMeter', ctypes.c_int32), ('biYPelsPerMeter', ctypes.c_int32),
+                ('biClrUsed', ctypes.c_uint32), ('biClrImportant', ctypes.c_uint32)]
+
+class BITMAPINFO(ctypes.Structure):
+    _fields_ = [('bmiHeader', BITMAPINFOHEADER), ('bmiColors', ctypes.c_uint32 * 1)]
+
+@dataclass
+class CaptureContext:
+    """GDI objects and destination array kept alive for one window"""
+    width: int
+    height: int
+    window_dc: int
+    memory_dc: int
+    bitmap: int
+    previous_bitmap: int
+    info: BITMAPINFO
+    frame: np.ndarray
+
+class Win32CaptureBackend(CaptureBackend):
+    """
+    BitBlt capture that keeps the window DC, a compatible memory DC, the
+    bitmap and the destination array of every window between frames. They are
+    rebuilt only when the window is resized. GetDIBits copies the bitmap
+    straight into the numpy array, so a capture allocates nothing.
+    """
+
+    SRCCOPY = 0x00CC0020
+    DIB_RGB_COLORS = 0
+    BI_RGB = 0
+
+    def __init__(self):
+        if win32gui is None:
+            raise RuntimeError("Win32CaptureBackend needs Windows with pywin32 installed")
+        self.user32 = ctypes.windll.user32
+        self.gdi32 = ctypes.windll.gdi32
+        # Handles are pointer sized, the default int restype would truncate them on 64-bit
+        for function in (self.user32.GetWindowDC, self.gdi32.CreateCompatibleDC,
+                         self.gdi32.CreateCompatibleBitmap, self.gdi32.SelectObject):
+            function.restype = ctypes.c_void_p
+        self.user32.GetWindowDC.argtypes = [ctypes.c_void_p]
+        self.user32.ReleaseDC.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        self.gdi32.CreateCompatibleDC.argtypes = [ctypes.c_void_p]
+        self.gdi32.CreateCompatibleBitmap.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
+        self.gdi32.SelectObject.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        self.gdi32.DeleteObject.argtypes = [ctypes.c_void_p]
+        self.gdi32.DeleteDC.argtypes = [ctypes.c_void_p]
+        self.gdi32.BitBlt.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                      ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_uint32]
+        self.gdi32.GetDIBits.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_uint,
+                                         ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint]
+        self.contexts: Dict[int, CaptureContext] = {}
+
+    def find_windows(self, window_title: str) -> List["Window"]:
+        from core.window_manager import Window
+
+        def enum_callback(hwnd, results):
+            if win32gui.IsWindowVisible(hwnd):
+                window_text = win32gui.GetWindowText(hwnd)
+                if window_title in window_text:
+                    x, y, right, bottom = win32gui.GetWindowRect(hwnd)
+                    results.append(Window(hwnd, window_text, x, y, right - x, bottom - y))
+
+        results = []
+        win32gui.EnumWindows(enum_callback, results)
+        return results
+
+    def _create_context(self, hwnd: int, width: int, height: int) -> CaptureContext:
+        window_dc = self.user32.GetWindowDC(hwnd)
+        memory_dc = self.gdi32.CreateCompatibleDC(window_dc)
+        bitmap = self.gdi32.CreateCompatibleBitmap(window_dc, width, height)
+        previous_bitmap = self.gdi32.SelectObject(memory_dc, bitmap)
+
+        info = BITMAPINFO()
+        info.bmiHeader.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+        info.bmiHeader.biWidth = width
+        info.bmiHeader.biHeight = -height  # Negative height: top-down rows, like numpy
+        info.bmiHeader.biPlanes = 1
+        info.bmiHeader.biBitCount = 32
+        info.bmiHeader.biCompression = self.BI_RGB
+        frame = np.empty((height, width, 4), dtype=np.uint8)
+        return CaptureContext(width, height, window_dc, memory_dc, bitmap, previous_bitmap, info, frame)
+
+    def _free_context(self, hwnd: int, context: CaptureContext):
+        self.gdi32.SelectObject(context.memory_dc, context.previous_bitmap)
+        self.gdi32.DeleteObject(context.bitmap)
+        self.gdi32.DeleteDC(context.memory_dc)
+        self.user32.ReleaseDC(hwnd, context.window_dc)
+
+    def capture(self, window: "Window") -> np.ndarray:
+        hwnd = window.handle
+        # The window may have moved or been resized since it was found
+        x, y, right, bottom = win32gui.GetWindowRect(hwnd)
+        window.x, window.y, window.width, window.height = x, y, right - x, bottom - y
+
+        context = self.contexts.get(hwnd)
+        if context is None or (context.width, context.height) != (window.width, window.height):
+            if context is not None:
+                self._free_context(hwnd, context)
+            context = self._create_context(hwnd, window.width, window.height)
+            self.contexts[hwnd] = context
+
+        self.gdi32.BitBlt(context.memory_dc, 0, 0, context.width, context.height,
+                          context.window_dc, 0, 0, self.SRCCOPY)
+        self.gdi32.GetDIBits(context.memory_dc, context.bitmap, 0, context.height,
+                             context.frame.ctypes.data, ctypes.byref(context.info), self.DIB_RGB_COLORS)
+        return context.frame
+
+    def click(self, window: "Window", x: int, y: int) -> None:
+        win32api.SetCursorPos((x, y))
+        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN, x, y, 0, 0)
+        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP, x, y, 0, 0)
+
+    def release(self, window: Optional["Window"] = None):
+        handles = list(self.contexts) if window is None else [window.handle]
+        for hwnd in handles:
+            context = self.contexts.pop(hwnd, None)
+            if context is not None:
+                self._free_context(hwnd, context)
+
+    def __del__(self):
+        if getattr(self, 'contexts', None):
+            self.release()
+
+class ReplayCaptureBackend(CaptureBackend):
+    """
+    Serves recorded frames as if they were live windows, so the automation
+    stack runs headless (e.g. on Linux) and capture overhead can be measured.
+
+    frames is any sequence of BGR(A) arrays (a list, a SessionReader, ...).
+    Every replayed window walks through it independently: one frame per
+    capture, or by wall clock when fps is given. Clicks are recorded in
+    clicks instead of being sent anywhere.
+    """
+
+    def __init__(self,
+                 frames: Sequence[np.ndarray],
+                 window_count: int = 1,
+                 fps: Optional[float] = None,
+                 loop: bool = True,
+                 title: str = "Replay"):
+        if len(frames) == 0:
+            raise ValueError("ReplayCaptureBackend needs at least one frame")
+        self.frames = frames
+        self.window_count = window_count
+        self.fps = fps
+        self.loop = loop
+        self.title = title
+        self.positions: Dict[int, int] = {}
+        self.started: Dict[int, float] = {}
+        self.buffers: Dict[int, np.ndarray] = {}
+        self.clicks: List[tuple] = []
+
+    @classmethod
+    def from_directory(cls, image_dir: str, **kwargs) -> "ReplayCaptureBackend":
+        """Replay the screenshots of a directory (e.g. a dataset's images) in name order"""
+        paths = sorted(p for p in Path(image_dir).iterdir() if p.suffix.lower() in ('.png', '.jpg'))
+        frames = [frame for frame in (cv2.imread(str(p), cv2.IMREAD_UNCHANGED) for p in paths)
+                  if frame is not None]
+        return cls(frames, **kwargs)
+
+    def find_windows(self, window_title: str) -> List["Window"]:
+        from core.window_manager import Window
+
+        if window_title not in self.title:
+            return []
+        height, width = self.frames[0].shape[:2]
+        return [Window(handle, f"{self.title} {handle}", 0, 0, width, height)
+                for handle in range(1, self.window_count + 1)]
+
+    def _index(self, handle: int) -> int:
+        if self.fps is not None:
+            started = self.started.setdefault(handle, time.monotonic())
+            index = int((time.monotonic() - started) * self.fps)
+        else:
+            index = self.positions.get(handle, 0)
+            self.positions[handle] = index + 1
+        if self.loop:
+            return index % len(self.frames)
+        return min(index, len(self.frames) - 1)
+
+    def capture(self, window: "Window") -> np.ndarray:
+        frame = self.frames[self._index(window.handle)]
+        if frame.ndim == 3 and frame.shape[2] == 3:
+            # Live captures are BGRA, convert into a per-window buffer like Win32CaptureBackend
+            buffer = self.buffers.get(window.handle)
+            if buffer is None or buffer.shape[:2] != frame.shape[:2]:
+                buffer = np.empty(frame.shape[:2] + (4,), dtype=np.uint8)
+                self.buffers[window.handle] = buffer
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=buffer)
+        window.height, window.width = frame.shape[:2]
+        return frame
+
+    def click(self, window: "Window", x: int, y: int) -> None:
+        self.clicks.append((window.handle, x, y, time.monotonic()))
+
+    def release(self, window: Optional["Window"] = None):
+        if window is None:
+            self.buffers.clear()
+        else:
+            self.buffers.pop(window.handle, None)
+
+def benchmark_capture(backend: CaptureBackend, window: "Window", frames: int = 200) -> Dict[str, float]:
+    """Capture latency of a backend for one window"""
+    backend.capture(window)  # First capture builds the per-window context
+    latencies = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        backend.capture(window)
+        latencies.append(time.perf_counter() - start)
+    return {'fps': len(latencies) / sum(latencies),
+            'mean_ms': 1000 * float(np.mean(latencies)),
+            'p95_ms': 1000 * float(np.percentile(latencies, 95))}
+
+# Usage example:
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure capture latency of a backend")
+    parser.add_argument("--title", help="Benchmark Win32 capture of the first window with this title")
+    parser.add_argument("--replay-dir", help="Benchmark replay of the screenshots in this directory")
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.title:
+        backend = Win32CaptureBackend()
+    elif args.replay_dir:
+        backend = ReplayCaptureBackend.from_directory(args.replay_dir)
+    else:
+        parser.error("pass --title or --replay-dir")
+    windows = backend.find_windows(args.title or "")
+    if not windows:
+        parser.error("no matching window")
+
+    result = benchmark_capture(backend, windows[0], args.frames)
+    print(f"{type(backend).__name__}: {result['fps']:.1f} fps, "
+          f"mean {result['mean_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms")
+    backend.release()
@@ -0,0 +1,136 @@
+# core/detection_backends.py
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import threading
+import cv2
+import numpy as np
+from core.element_detection import DetectedElement
+
+class DetectionBackend:
+    """
+    Detection backend that ElementDetector can run before (or instead of) its
+    CNN. detect returns elements with relative coordinates; names, when given,
+    restricts detection to those element names.
+    """
+
+    def detect(self,
+               image: np.ndarray,
+               threshold: float,
+               names: Optional[Iterable[str]] = None) -> List[DetectedElement]:
+        raise NotImplementedError
+
+class TemplateMatchingBackend(DetectionBackend):
+    """
+    Finds fixed icons with cv2.matchTemplate, using the same template directory
+    as data_prep_tools/coco (element name = file name without extension).
+
+    Templates are cut from reference_width wide screenshots. For every window
+    size they are rescaled once and kept, and frames are matched at match_scale
+    of the window size. Fixed icons rarely move, so each template is first
+    searched in a small window around where it was last found, and only
+    searched across the whole frame when it is not there. Confidence is the
+    normalized correlation of the best match. detect may be called from
+    several threads at once (e.g. by ElementDetector.detect_elements_batch).
+    """
+
+    def __init__(self,
+                 template_dir: str,
+                 reference_width: int = 1920,
+                 match_scale: float = 0.5,
+                 grayscale: bool = True,
+                 search_margin: int = 16):
+        self.reference_width = reference_width
+        self.match_scale = match_scale
+        self.grayscale = grayscale
+        self.search_margin = search_margin
+        self.last_locations: Dict[Tuple[int, int, str], Tuple[int, int]] = {}
+        self.templates: Dict[str, np.ndarray] = {}
+        for path in sorted(Path(template_dir).iterdir()):
+            if path.suffix.lower() in ('.png', '.jpg'):
+                template = cv2.imread(str(path))
+                if template is not None:
+                    self.templates[path.name.split('.')[0]] = self._convert(template)
+        self.scaled_templates: Dict[Tuple[int, int], Dict[str, np.ndarray]] = {}
+        self.lock = threading.Lock()
+
+    def _convert(self, image: np.ndarray) -> np.ndarray:
+        if self.grayscale:
+            code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+            return cv2.cvtColor(image, code)
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2BGR) if image.shape[2] == 4 else image
+
+    def _templates_for(self, frame_w: int, frame_h: int) -> Dict[str, np.ndarray]:
+        """Templates rescaled for a window size, computed on the first frame of that size"""
+        key = (frame_w, frame_h)
+        with self.lock:
+            scaled = self.scaled_templates.get(key)
+        if scaled is None:
+            scale = frame_w / self.reference_width * self.match_scale
+            scaled = {}
+            for name, template in self.templates.items():
+                h, w = template.shape[:2]
+                size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+                scaled[name] = cv2.resize(template, size, interpolation=cv2.INTER_AREA)
+            with self.lock:
+                self.scaled_templates[key] = scaled
+        return scaled
+
+    def _match(self,
+               frame: np.ndarray,
+               template: np.ndarray,
+               near: Optional[Tuple[int, int]] = None) -> Tuple[float, int, int]:
+        """Best (score, x, y) of template in frame, optionally only around a previous location"""
+        x0 = y0 = 0
+        if near is not None:
+            h, w = template.shape[:2]
+            x0 = max(0, near[0] - self.search_margin)
+            y0 = max(0, near[1] - self.search_margin)
+            frame = frame[y0:near[1] + h + self.search_margin, x0:near[0] + w + self.search_margin]
+            if frame.shape[0] < h or frame.shape[1] < w:
+                return 0.0, 0, 0
+        result = cv2.matchTemplate(frame, template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (x, y) = cv2.minMaxLoc(result)
+        return float(score), x0 + x, y0 + y
+
+    def detect(self,
+               image: np.ndarray,
+               threshold: float,
+               names: Optional[Iterable[str]] = None) -> List[DetectedElement]:
+        frame_h, frame_w = image.shape[:2]
+        templates = self._templates_for(frame_w, frame_h)
+
+        frame = cv2.resize(image, None, fx=self.match_scale, fy=self.match_scale,
+                           interpolation=cv2.INTER_AREA)
+        frame = self._convert(frame)
+        search_h, search_w = frame.shape[:2]
+
+        elements = []
+        for name in (names if names is not None else templates):
+            template = templates.get(name)
+            if template is None:
+                continue
+            h, w = template.shape[:2]
+            if h > search_h or w > search_w:
+                continue
+
+            location_key = (frame_w, frame_h, name)
+            match = None
+            with self.lock:
+                last_location = self.last_locations.get(location_key)
+            if last_location is not None:
+                match = self._match(frame, template, last_location)
+            if match is None or match[0] < threshold:
+                match = self._match(frame, template)
+            score, x, y = match
+            if score >= threshold:
+                with self.lock:
+                    self.last_locations[location_key] = (x, y)
+                elements.append(DetectedElement(
+                    name=name,
+                    confidence=float(score),
+                    x=(x + w / 2) / search_w,
+                    y=(y + h / 2) / search_h,
+                    width=w / search_w,
+                    height=h / search_h
+                ))
+        return elements
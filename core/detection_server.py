@@ -0,0 +1,332 @@
+# core/detection_server.py
+from dataclasses import dataclass
+from multiprocessing import AuthenticationError, shared_memory
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+import os
+import queue
+import secrets
+import threading
+import time
+import numpy as np
+from core.element_detection import DetectedElement
+
+DEFAULT_ADDRESS = ('127.0.0.1', 6001)
+# The server generates a fresh key on every start and writes it where only this user can read it
+AUTHKEY_ENV = "GOG_VIPER_AUTHKEY"
+DEFAULT_AUTHKEY_FILE = os.path.join(os.path.expanduser("~"), ".gog_viper", "detection_server.key")
+
+def create_authkey(path: str = DEFAULT_AUTHKEY_FILE) -> bytes:
+    """Random connection key, written (hex) to a file readable by the current user only"""
+    key = secrets.token_bytes(32)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(key.hex())
+    # O_CREAT's mode does not apply to a key file left by an earlier run
+    os.chmod(path, 0o600)
+    return key
+
+def load_authkey(path: str = DEFAULT_AUTHKEY_FILE) -> bytes:
+    """The key of the running server, from GOG_VIPER_AUTHKEY (hex) or the server's key file"""
+    if os.environ.get(AUTHKEY_ENV):
+        return bytes.fromhex(os.environ[AUTHKEY_ENV])
+    try:
+        with open(path) as f:
+            return bytes.fromhex(f.read().strip())
+    except FileNotFoundError:
+        raise RuntimeError(f"No detection server key at {path}, is the DetectionServer running?")
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open a client's segment without taking ownership of it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the segment with this process's
+        # resource tracker, which would unlink it when the server exits
+        segment = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        except (ImportError, AttributeError):
+            pass
+        return segment
+
+@dataclass
+class DetectionRequest:
+    connection: Connection
+    kind: str                       # 'detect' or 'find'
+    image: np.ndarray               # View of the client's shared memory
+    threshold: float
+    use_cache: bool
+    cache_timeout: float
+    cache_key: Optional[Hashable]
+    names: Optional[List[str]] = None
+
+class DetectionServer:
+    """
+    Serves one ElementDetector to every bot process on the machine.
+
+    Clients (DetectionClient) write frames into shared memory segments they
+    own and send only the segment name and frame shape over a local
+    multiprocessing connection; the server reads the frame in place. Requests
+    arriving within batch_window seconds of each other (up to max_batch) are
+    run as one detect_elements_batch forward pass, then every request is
+    answered with the elements above its own threshold. A request that
+    arrives alone is answered with the regular single-frame path, so a
+    find_elements query keeps its cheap cache/backend/ROI stages.
+
+    Without an explicit authkey the key comes from GOG_VIPER_AUTHKEY, or a
+    random one is generated and written to authkey_file for the clients.
+    """
+
+    def __init__(self,
+                 detector,
+                 address=DEFAULT_ADDRESS,
+                 authkey: Optional[bytes] = None,
+                 batch_window: float = 0.005,
+                 max_batch: int = 16,
+                 authkey_file: str = DEFAULT_AUTHKEY_FILE):
+        self.detector = detector
+        self.address = address
+        if authkey is None:
+            authkey = (bytes.fromhex(os.environ[AUTHKEY_ENV]) if os.environ.get(AUTHKEY_ENV)
+                       else create_authkey(authkey_file))
+        self.authkey = authkey
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.requests: "queue.Queue[DetectionRequest]" = queue.Queue()
+        self.listener: Optional[Listener] = None
+        self.running = False
+
+        self.batch_count = 0
+        self.request_count = 0
+
+    def _serve_connection(self, connection: Connection):
+        """Read requests of one client until it disconnects"""
+        segments: Dict[str, shared_memory.SharedMemory] = {}
+        try:
+            while self.running:
+                message = connection.recv()
+                kind = message[0]
+                if kind == 'info':
+                    connection.send(('ok', {'min_confidence': self.detector.min_confidence,
+                                            'input_size': self.detector.input_size}))
+                    continue
+                _, segment_name, shape, dtype, threshold, use_cache, cache_timeout, cache_key, names = message
+                if segment_name not in segments:
+                    segments[segment_name] = _attach(segment_name)
+                image = np.ndarray(shape, dtype=dtype, buffer=segments[segment_name].buf)
+                self.requests.put(DetectionRequest(connection, kind, image, threshold, use_cache,
+                                                   cache_timeout, cache_key, names))
+        except (EOFError, OSError):
+            pass
+        finally:
+            connection.close()
+            for segment in segments.values():
+                try:
+                    segment.close()
+                except BufferError:
+                    # A queued request still holds a view, the mapping goes with the process
+                    pass
+
+    def _next_batch(self) -> List[DetectionRequest]:
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_single(self, request: DetectionRequest):
+        if request.kind == 'find':
+            return self.detector.find_elements(request.image, request.names, request.threshold,
+                                               request.use_cache, request.cache_timeout, request.cache_key)
+        return self.detector.detect_elements(request.image, request.threshold, request.use_cache,
+                                             request.cache_timeout, request.cache_key)
+
+    def _run_batch(self, batch: List[DetectionRequest]) -> list:
+        """One forward pass for the whole batch, filtered per request"""
+        results = [None] * len(batch)
+        # Requests that bypass the cache, or expire it sooner, cannot share a call with the others
+        groups: Dict[Tuple[bool, float], List[int]] = {}
+        for i, request in enumerate(batch):
+            groups.setdefault((request.use_cache, request.cache_timeout), []).append(i)
+
+        for (use_cache, cache_timeout), indices in groups.items():
+            elements = self.detector.detect_elements_batch(
+                [batch[i].image for i in indices], self.detector.min_confidence,
+                use_cache, cache_timeout, [batch[i].cache_key for i in indices])
+            for i, frame_elements in zip(indices, elements):
+                request = batch[i]
+                frame_elements = [e for e in frame_elements if e.confidence >= request.threshold]
+                if request.kind == 'find':
+                    found = {}
+                    for element in frame_elements:
+                        best = found.get(element.name)
+                        if element.name in request.names and (best is None or element.confidence > best.confidence):
+                            found[element.name] = element
+                    results[i] = found
+                else:
+                    results[i] = frame_elements
+        return results
+
+    def _process(self):
+        while self.running:
+            batch = self._next_batch()
+            batch = [request for request in batch if request is not None]
+            if not batch:
+                continue
+            try:
+                if len(batch) == 1:
+                    results = [self._run_single(batch[0])]
+                else:
+                    results = self._run_batch(batch)
+                    self.batch_count += 1
+                replies = [('ok', result) for result in results]
+            except Exception as e:
+                replies = [('error', e)] * len(batch)
+
+            self.request_count += len(batch)
+            for request, reply in zip(batch, replies):
+                try:
+                    request.connection.send(reply)
+                except (OSError, EOFError):
+                    pass
+
+    def serve_forever(self):
+        """Accept clients until stop() is called"""
+        self.detector.ready.result()
+        self.listener = Listener(self.address, authkey=self.authkey)
+        self.running = True
+        threading.Thread(target=self._process, name="DetectionServer-batch", daemon=True).start()
+        try:
+            while self.running:
+                try:
+                    connection = self.listener.accept()
+                except (OSError, EOFError, AuthenticationError):
+                    # A client with the wrong key is turned away, the others keep being served
+                    continue
+                threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+        finally:
+            self.listener.close()
+
+    def start(self) -> threading.Thread:
+        """Run serve_forever on a background thread"""
+        thread = threading.Thread(target=self.serve_forever, name="DetectionServer", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.running = False
+        self.requests.put(None)
+        if self.listener is not None:
+            self.listener.close()
+
+class DetectionClient:
+    """
+    Drop-in replacement for ElementDetector in bot processes, backed by a
+    DetectionServer. Frames are copied once into a shared memory segment per
+    frame shape; capture straight into frame_buffer(shape) to skip that copy.
+    The key defaults to load_authkey().
+
+    Calls from several threads are serialized, since a copied frame must
+    stay in its segment until the server has answered.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey: Optional[bytes] = None,
+                 authkey_file: str = DEFAULT_AUTHKEY_FILE):
+        self.connection = Client(address, authkey=authkey if authkey is not None else load_authkey(authkey_file))
+        self.lock = threading.Lock()
+        self.segments: Dict[Tuple[Tuple[int, ...], str], Tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+        info = self._call(('info',))
+        self.min_confidence = info['min_confidence']
+        self.input_size = info['input_size']
+
+    def _exchange(self, message):
+        """Send a request and wait for its reply, with self.lock held"""
+        self.connection.send(message)
+        status, result = self.connection.recv()
+        if status == 'error':
+            raise result
+        return result
+
+    def _call(self, message):
+        with self.lock:
+            return self._exchange(message)
+
+    def _segment(self, shape: Tuple[int, ...], dtype: np.dtype) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+        key = (tuple(shape), np.dtype(dtype).str)
+        if key not in self.segments:
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            segment = shared_memory.SharedMemory(create=True, size=size)
+            self.segments[key] = (segment, np.ndarray(shape, dtype=dtype, buffer=segment.buf))
+        return self.segments[key]
+
+    def frame_buffer(self, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """Shared array to capture into; passing it to detect_elements sends it without copying"""
+        return self._segment(shape, dtype)[1]
+
+    def _request(self, kind: str, image: np.ndarray, threshold: float, use_cache: bool,
+                 cache_timeout: float, cache_key: Optional[Hashable], names: Optional[List[str]] = None):
+        with self.lock:
+            segment, buffer = self._segment(image.shape, image.dtype)
+            if not np.shares_memory(image, buffer):
+                np.copyto(buffer, image)
+            return self._exchange((kind, segment.name, image.shape, image.dtype.str, threshold,
+                                   use_cache, cache_timeout, cache_key, names))
+
+    def detect_elements(self,
+                        image: np.ndarray,
+                        threshold: float = 0.7,
+                        use_cache: bool = True,
+                        cache_timeout: float = 1.0,
+                        cache_key: Optional[Hashable] = None) -> List[DetectedElement]:
+        """See ElementDetector.detect_elements"""
+        return self._request('detect', image, threshold, use_cache, cache_timeout, cache_key)
+
+    def find_elements(self,
+                      image: np.ndarray,
+                      names: Iterable[str],
+                      threshold: float = 0.7,
+                      use_cache: bool = True,
+                      cache_timeout: float = 1.0,
+                      cache_key: Optional[Hashable] = None) -> Dict[str, DetectedElement]:
+        """See ElementDetector.find_elements"""
+        return self._request('find', image, threshold, use_cache, cache_timeout, cache_key, list(set(names)))
+
+    def close(self):
+        self.connection.close()
+        for segment, _ in self.segments.values():
+            segment.close()
+            segment.unlink()
+        self.segments.clear()
+
+# Usage example:
+if __name__ == "__main__":
+    import argparse
+    from core.element_detection import ElementDetector
+
+    parser = argparse.ArgumentParser(description="Serve one ElementDetector to all local bot processes")
+    parser.add_argument("model_path")
+    parser.add_argument("--categories", help="categories.json of the dataset the model was trained on")
+    parser.add_argument("--host", default=DEFAULT_ADDRESS[0])
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1])
+    parser.add_argument("--batch-window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--authkey-file", default=DEFAULT_AUTHKEY_FILE,
+                        help="Where the generated key is written for the clients")
+    args = parser.parse_args()
+
+    detector = ElementDetector(args.model_path, args.categories)
+    server = DetectionServer(detector, (args.host, args.port), batch_window=args.batch_window_ms / 1000,
+                             max_batch=args.max_batch, authkey_file=args.authkey_file)
+    print(f"Serving detections on {args.host}:{args.port}"
+          + ("" if os.environ.get(AUTHKEY_ENV) else f", key in {args.authkey_file}"))
+    # Bots then use DetectionClient() wherever they used ElementDetector(...)
+    server.serve_forever()
@@ -0,0 +1,303 @@
+# core/element_tracker.py
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+from concurrent.futures import Executor
+import time
+import cv2
+import numpy as np
+from core.element_detection import DetectedElement, _iou
+
+@dataclass
+class Track:
+    """One element followed across frames of a window"""
+    element: DetectedElement
+    patch: np.ndarray       # Grayscale pixels of the element box when it was last confirmed
+    misses: int = 0         # Full detections in a row that did not find it again
+
+@dataclass
+class WindowTracks:
+    frame_shape: Tuple[int, ...]
+    tracks: List[Track] = field(default_factory=list)
+    frames_since_detection: int = 0
+
+def _gray(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 2:
+        return image
+    code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+    return cv2.cvtColor(image, code)
+
+class ElementTracker:
+    """
+    Per-window tracking layer in front of an ElementDetector, with the same
+    detect_elements / find_elements / detect_elements_batch interface so
+    ActionManager and MultiWindowExecutor can use either.
+
+    After a full detection, every element of a window (cache_key) becomes a
+    track holding the grayscale patch under its box. On following frames each
+    track is verified by correlating that patch with the frame in a small
+    search window around its last position (also following small moves), which
+    costs a fraction of a millisecond per element. Verified tracks keep their
+    detection confidence multiplied by decay per frame, so they go stale. The
+    detector only runs when a track fails verification, decays below the
+    requested threshold, an asked-for element has no track, or every
+    detection_interval frames.
+
+    Full detections are associated with existing tracks by name and IoU.
+    Tracks that are not found again are kept for max_misses detections so a
+    briefly hidden element keeps its patch, but are not reported meanwhile.
+    """
+
+    def __init__(self,
+                 detector,
+                 detection_interval: int = 10,
+                 decay: float = 0.98,
+                 verify_threshold: float = 0.85,
+                 search_margin: int = 8,
+                 iou_threshold: float = 0.3,
+                 max_misses: int = 2):
+        self.detector = detector
+        self.detection_interval = detection_interval
+        self.decay = decay
+        self.verify_threshold = verify_threshold
+        self.search_margin = search_margin
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.windows: Dict[Optional[Hashable], WindowTracks] = {}
+
+        self.detection_count = 0
+        self.verification_count = 0
+        self.verification_failures = 0
+        self.verification_time = 0.0
+
+    def _box(self, element: DetectedElement, frame_w: int, frame_h: int) -> Tuple[int, int, int, int]:
+        """Pixel (x1, y1, x2, y2) of an element, clipped to the frame"""
+        x1 = int(round((element.x - element.width / 2) * frame_w))
+        y1 = int(round((element.y - element.height / 2) * frame_h))
+        x2 = int(round((element.x + element.width / 2) * frame_w))
+        y2 = int(round((element.y + element.height / 2) * frame_h))
+        return max(0, x1), max(0, y1), min(frame_w, x2), min(frame_h, y2)
+
+    def _new_track(self, image: np.ndarray, element: DetectedElement) -> Track:
+        frame_h, frame_w = image.shape[:2]
+        x1, y1, x2, y2 = self._box(element, frame_w, frame_h)
+        return Track(element, _gray(image[y1:y2, x1:x2]))
+
+    def _verify(self, image: np.ndarray, track: Track) -> bool:
+        """Correlate the track's patch around its last position, moving the track to the best match"""
+        patch_h, patch_w = track.patch.shape[:2]
+        if patch_h < 4 or patch_w < 4:
+            return False
+        frame_h, frame_w = image.shape[:2]
+        x1, y1, x2, y2 = self._box(track.element, frame_w, frame_h)
+        sx1, sy1 = max(0, x1 - self.search_margin), max(0, y1 - self.search_margin)
+        sx2, sy2 = min(frame_w, x1 + patch_w + self.search_margin), min(frame_h, y1 + patch_h + self.search_margin)
+        search = image[sy1:sy2, sx1:sx2]
+        if search.shape[0] < patch_h or search.shape[1] < patch_w:
+            return False
+
+        result = cv2.matchTemplate(_gray(search), track.patch, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (dx, dy) = cv2.minMaxLoc(result)
+        # Flat patches (e.g. a solid button) have no variance and correlate as nan
+        if not score >= self.verify_threshold:
+            return False
+
+        element = track.element
+        track.element = DetectedElement(
+            name=element.name,
+            confidence=element.confidence * self.decay,
+            x=element.x + (sx1 + dx - x1) / frame_w,
+            y=element.y + (sy1 + dy - y1) / frame_h,
+            width=element.width,
+            height=element.height
+        )
+        return True
+
+    def _associate(self, state: WindowTracks, image: np.ndarray, elements: Iterable[DetectedElement]):
+        """Match detections to tracks by name and IoU, refreshing matched patches"""
+        unmatched = list(state.tracks)
+        tracks = []
+        for element in sorted(elements, key=lambda e: -e.confidence):
+            best = max((t for t in unmatched if t.element.name == element.name),
+                       key=lambda t: _iou(t.element, element), default=None)
+            if best is not None and _iou(best.element, element) >= self.iou_threshold:
+                unmatched.remove(best)
+            tracks.append(self._new_track(image, element))
+        for track in unmatched:
+            track.misses += 1
+            if track.misses <= self.max_misses:
+                tracks.append(track)
+        state.tracks = tracks
+
+    def _state(self, image: np.ndarray, cache_key: Optional[Hashable]) -> WindowTracks:
+        state = self.windows.get(cache_key)
+        if state is None or state.frame_shape != image.shape:
+            state = WindowTracks(image.shape, frames_since_detection=self.detection_interval)
+            self.windows[cache_key] = state
+        return state
+
+    def _verified(self, image: np.ndarray, state: WindowTracks, threshold: float) -> Optional[List[DetectedElement]]:
+        """Elements of verified tracks, or None when the detector has to run"""
+        state.frames_since_detection += 1
+        if state.frames_since_detection >= self.detection_interval:
+            return None
+
+        start = time.perf_counter()
+        try:
+            elements = []
+            for track in state.tracks:
+                if track.misses:
+                    continue
+                self.verification_count += 1
+                if not self._verify(image, track) or track.element.confidence < threshold:
+                    self.verification_failures += 1
+                    return None
+                elements.append(track.element)
+            return elements
+        finally:
+            self.verification_time += time.perf_counter() - start
+
+    def detect_elements(self,
+                        image: np.ndarray,
+                        threshold: float = 0.7,
+                        use_cache: bool = True,
+                        cache_timeout: float = 1.0,
+                        cache_key: Optional[Hashable] = None) -> List[DetectedElement]:
+        """Detect UI elements, from verified tracks when possible (see ElementDetector.detect_elements)"""
+        state = self._state(image, cache_key)
+        elements = self._verified(image, state, threshold)
+        if elements is None:
+            # Track confidences are checked against threshold, so keep weaker detections too
+            elements = self.detector.detect_elements(image, self.detector.min_confidence,
+                                                     use_cache, cache_timeout, cache_key)
+            self.detection_count += 1
+            self._associate(state, image, elements)
+            state.frames_since_detection = 0
+        return [e for e in elements if e.confidence >= threshold]
+
+    def detect_elements_batch(self,
+                              images: Sequence[np.ndarray],
+                              threshold: float = 0.7,
+                              use_cache: bool = True,
+                              cache_timeout: float = 1.0,
+                              cache_keys: Optional[Sequence[Optional[Hashable]]] = None,
+                              executor: Optional[Executor] = None) -> List[List[DetectedElement]]:
+        """
+        detect_elements for several windows: frames whose tracks all verify
+        are answered from them, the rest go through one detect_elements_batch
+        call of the detector (one detect_elements call per frame if it has none)
+        """
+        cache_keys = list(cache_keys) if cache_keys is not None else [None] * len(images)
+        states = [self._state(image, cache_key) for image, cache_key in zip(images, cache_keys)]
+        results = [self._verified(image, state, threshold) for image, state in zip(images, states)]
+
+        pending = [i for i, elements in enumerate(results) if elements is None]
+        if pending:
+            # As in detect_elements, keep the detections below threshold for the tracks
+            min_confidence = self.detector.min_confidence
+            if hasattr(self.detector, 'detect_elements_batch'):
+                detected = self.detector.detect_elements_batch(
+                    [images[i] for i in pending], min_confidence, use_cache, cache_timeout,
+                    [cache_keys[i] for i in pending], executor)
+            else:
+                detected = [self.detector.detect_elements(images[i], min_confidence, use_cache,
+                                                          cache_timeout, cache_keys[i]) for i in pending]
+            self.detection_count += len(pending)
+            for i, elements in zip(pending, detected):
+                self._associate(states[i], images[i], elements)
+                states[i].frames_since_detection = 0
+                results[i] = elements
+        return [[e for e in elements if e.confidence >= threshold] for elements in results]
+
+    def find_elements(self,
+                      image: np.ndarray,
+                      names: Iterable[str],
+                      threshold: float = 0.7,
+                      use_cache: bool = True,
+                      cache_timeout: float = 1.0,
+                      cache_key: Optional[Hashable] = None) -> Dict[str, DetectedElement]:
+        """
+        Find the best element above threshold for each wanted name (see
+        ElementDetector.find_elements). Names without a verified track are
+        queried from the detector, and what it finds starts being tracked.
+        """
+        wanted = set(names)
+        state = self._state(image, cache_key)
+        found: Dict[str, DetectedElement] = {}
+        elements = self._verified(image, state, threshold)
+        if elements is not None:
+            for element in elements:
+                best = found.get(element.name)
+                if element.name in wanted and (best is None or element.confidence > best.confidence):
+                    found[element.name] = element
+            if wanted.issubset(found):
+                return found
+
+        missing = wanted - set(found)
+        detected = self.detector.find_elements(image, missing, threshold, use_cache, cache_timeout, cache_key)
+        self.detection_count += 1
+        found.update(detected)
+
+        if elements is None:
+            # Every track failed or went stale, rebuild them from this query
+            self._associate(state, image, found.values())
+            state.frames_since_detection = 0
+        else:
+            # Replaces hidden tracks of the queried names, or counts a miss for them
+            self._associate(state, image, [*elements, *detected.values()])
+        return found
+
+    def reset(self, cache_key: Optional[Hashable] = None):
+        """Forget the tracks of one window, e.g. after a click changed its screen"""
+        self.windows.pop(cache_key, None)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'detections': self.detection_count,
+            'verifications': self.verification_count,
+            'verification_failures': self.verification_failures,
+            'mean_verification_ms': 1000 * self.verification_time / max(1, self.verification_count),
+            'tracks': sum(len(state.tracks) for state in self.windows.values()),
+        }
+
+# Usage example:
+if __name__ == "__main__":
+    import argparse
+    from pathlib import Path
+    from core.detection_backends import TemplateMatchingBackend
+    from core.element_detection import ElementDetector
+
+    parser = argparse.ArgumentParser(description="Count detector runs with and without ElementTracker")
+    parser.add_argument("frames_dir", help="Screenshots, e.g. a dataset images directory")
+    parser.add_argument("--model")
+    parser.add_argument("--categories")
+    parser.add_argument("--template-dir", help="Use template matching when no model is given")
+    parser.add_argument("--queries", type=int, default=30, help="find_elements calls per screenshot")
+    parser.add_argument("--names", nargs="+", required=True, help="Elements each query looks for")
+    args = parser.parse_args()
+
+    paths = sorted(p for p in Path(args.frames_dir).iterdir() if p.suffix.lower() in ('.png', '.jpg'))
+    frames = [frame for frame in (cv2.imread(str(p)) for p in paths) if frame is not None]
+    backend = TemplateMatchingBackend(args.template_dir) if args.template_dir else None
+    rng = np.random.default_rng(0)
+
+    for label in ("detector", "tracker"):
+        detector = ElementDetector(args.model, args.categories, fast_backend=backend)
+        detector.ready.result()
+        tracker = ElementTracker(detector) if label == "tracker" else None
+        runs = 0
+        start = time.perf_counter()
+        for frame in frames:
+            for _ in range(args.queries):
+                # Capture noise so consecutive frames are never byte-identical
+                noisy = cv2.add(frame, rng.integers(0, 3, size=frame.shape, dtype=np.uint8))
+                if tracker is None:
+                    detector.find_elements(noisy, args.names, cache_key=0)
+                else:
+                    tracker.find_elements(noisy, args.names, cache_key=0)
+            runs = detector.inference_count + detector.region_inference_count + detector.fast_path_count
+        elapsed = time.perf_counter() - start
+        queries = len(frames) * args.queries
+        print(f"{label:<9} {runs:5d} detector runs for {queries} queries "
+              f"({runs / queries:.2f} per query), {1000 * elapsed / queries:.2f} ms per query")
+        if tracker is not None:
+            print(f"          {tracker.stats()}")
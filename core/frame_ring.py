@@ -0,0 +1,114 @@
+# core/frame_ring.py
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+import threading
+import time
+import numpy as np
+
+@dataclass
+class CapturedFrame:
+    seq: int            # 1 for the first frame of a window, +1 per capture
+    timestamp: float    # time.monotonic() when the capture finished
+    image: np.ndarray   # View of a ring slot
+    ring: "FrameRing"
+    slot: int
+
+    def valid(self) -> bool:
+        """Whether the slot still holds this frame (it is reused slots - 1 captures later)"""
+        return self.ring.slot_seqs[self.slot] == self.seq
+
+class FrameRing:
+    """
+    Preallocated ring of frames written by one producer thread. Readers get
+    the newest frame without blocking or wait for one newer than a sequence
+    number. Frames are views of the slots, so a reader that keeps a frame for
+    longer than slots - 1 captures must copy it (CapturedFrame.valid tells).
+    """
+
+    def __init__(self, slots: int = 4):
+        if slots < 2:
+            raise ValueError("FrameRing needs at least 2 slots")
+        self.slots = slots
+        self.buffers: List[Optional[np.ndarray]] = [None] * slots
+        self.slot_seqs = [0] * slots
+        self.timestamps = [0.0] * slots
+        self.seq = 0
+        self.error: Optional[BaseException] = None
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def write(self, image: np.ndarray):
+        """Copy a capture into the next slot and publish it"""
+        slot = self.seq % self.slots
+        buffer = self.buffers[slot]
+        if buffer is None or buffer.shape != image.shape:
+            # First frame, or the window was resized
+            buffer = np.empty_like(image)
+            self.buffers[slot] = buffer
+        # Invalidate the slot before overwriting it so readers do not trust half-written frames
+        self.slot_seqs[slot] = 0
+        np.copyto(buffer, image)
+        with self.condition:
+            self.seq += 1
+            self.slot_seqs[slot] = self.seq
+            self.timestamps[slot] = time.monotonic()
+            self.condition.notify_all()
+
+    def _frame(self) -> Optional[CapturedFrame]:
+        if self.seq == 0:
+            return None
+        slot = (self.seq - 1) % self.slots
+        return CapturedFrame(self.seq, self.timestamps[slot], self.buffers[slot], self, slot)
+
+    def latest(self) -> Optional[CapturedFrame]:
+        """Newest frame, or None before the first capture"""
+        with self.condition:
+            return self._frame()
+
+    def wait_for(self, after_seq: int = 0, timeout: Optional[float] = None) -> Optional[CapturedFrame]:
+        """Newest frame with seq > after_seq, waiting up to timeout; None on timeout"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.seq > after_seq or self.closed, timeout):
+                return None
+            if self.seq > after_seq:
+                return self._frame()
+            if self.error is not None:
+                raise self.error
+            return None
+
+    def close(self, error: Optional[BaseException] = None):
+        with self.condition:
+            self.closed = True
+            self.error = error
+            self.condition.notify_all()
+
+class CaptureThread(threading.Thread):
+    """Calls capture at a fixed rate and writes every frame into a FrameRing"""
+
+    def __init__(self, capture: Callable[[], np.ndarray], fps: float = 10.0, slots: int = 4, name: str = None):
+        super().__init__(name=name, daemon=True)
+        self.capture = capture
+        self.interval = 1.0 / fps
+        self.ring = FrameRing(slots)
+        self.stopped = threading.Event()
+
+    def run(self):
+        next_time = time.monotonic()
+        try:
+            while not self.stopped.is_set():
+                self.ring.write(self.capture())
+                next_time += self.interval
+                delay = next_time - time.monotonic()
+                if delay < 0:
+                    # Capture is slower than the target rate, do not try to catch up
+                    next_time = time.monotonic()
+                    delay = 0
+                self.stopped.wait(delay)
+            self.ring.close()
+        except Exception as e:
+            # e.g. the window was closed, readers get the error from wait_for
+            self.ring.close(e)
+
+    def stop(self, timeout: Optional[float] = None):
+        self.stopped.set()
+        self.join(timeout)
@@ -0,0 +1,193 @@
+# core/inference_modes.py
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import time
+import cv2
+import numpy as np
+import torch
+import torch.nn as nn
+from core.element_detection import _iou
+
+INFERENCE_MODES = ("eager", "traced", "compiled", "channels_last", "int8_dynamic", "int8_static")
+
+class ChannelsLast(nn.Module):
+    """Runs a channels_last model, converting inputs that are not already NHWC in memory"""
+
+    def __init__(self, model: nn.Module):
+        super().__init__()
+        self.model = model.to(memory_format=torch.channels_last)
+
+    def forward(self, x: torch.Tensor):
+        return self.model(x.contiguous(memory_format=torch.channels_last))
+
+def _trace(model: nn.Module, example_input: torch.Tensor) -> nn.Module:
+    if not isinstance(model, torch.jit.ScriptModule):
+        try:
+            # strict=False lets the trace return the list of detection dicts
+            model = torch.jit.trace(model, example_input, strict=False, check_trace=False)
+        except Exception:
+            # Data-dependent control flow (e.g. NMS) cannot be traced, script it instead
+            model = torch.jit.script(model)
+    return torch.jit.optimize_for_inference(torch.jit.freeze(model.eval()))
+
+def _quantize_static(model: nn.Module,
+                     example_input: torch.Tensor,
+                     calibration_inputs: Sequence[torch.Tensor]) -> nn.Module:
+    """
+    Post-training int8 quantization with FX graph mode. Detection models have
+    data-dependent post-processing that FX cannot trace, so when the model has a
+    backbone submodule (as torchvision detectors do) only the backbone is
+    quantized and the heads stay float.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    if not calibration_inputs:
+        raise ValueError("int8_static needs calibration frames (calibration_dir)")
+    engines = torch.backends.quantized.supported_engines
+    torch.backends.quantized.engine = 'x86' if 'x86' in engines else 'qnnpack'
+    qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+
+    backbone = getattr(model, 'backbone', None)
+    if isinstance(backbone, nn.Module):
+        # Record what the backbone actually receives to use as its example input
+        captured = []
+        handle = backbone.register_forward_pre_hook(lambda module, args: captured.append(args))
+        with torch.no_grad():
+            model(example_input)
+        handle.remove()
+        model.backbone = prepare_fx(backbone, qconfig_mapping, captured[0])
+    else:
+        model = prepare_fx(model, qconfig_mapping, (example_input,))
+
+    # Observers record activation ranges on real frames
+    with torch.no_grad():
+        for batch in calibration_inputs:
+            model(batch)
+
+    if isinstance(backbone, nn.Module):
+        model.backbone = convert_fx(model.backbone)
+        return model
+    return convert_fx(model)
+
+def prepare_model(model: nn.Module,
+                  mode: str,
+                  example_input: torch.Tensor,
+                  calibration_inputs: Sequence[torch.Tensor] = ()) -> nn.Module:
+    """Return model prepared for CPU inference in the given mode (see INFERENCE_MODES)"""
+    model.eval()
+    if mode == "eager":
+        return model
+    if mode == "traced":
+        return _trace(model, example_input)
+    if mode == "compiled":
+        return torch.compile(model, dynamic=False)
+    if mode == "channels_last":
+        return ChannelsLast(model)
+    if mode == "int8_dynamic":
+        from torch.ao.quantization import quantize_dynamic
+        # Only Linear/LSTM layers have dynamic int8 kernels, convolutions stay float
+        return quantize_dynamic(model, {nn.Linear, nn.LSTM}, dtype=torch.qint8)
+    if mode == "int8_static":
+        return _quantize_static(model, example_input, calibration_inputs)
+    raise ValueError(f"Unknown inference mode: {mode}")
+
+def load_calibration_frames(image_dir: str, limit: int = 32) -> List[np.ndarray]:
+    """Read up to limit BGR frames from a dataset images directory"""
+    paths = sorted(p for p in Path(image_dir).iterdir() if p.suffix.lower() in ('.png', '.jpg'))
+    frames = [cv2.imread(str(p)) for p in paths[:limit]]
+    return [frame for frame in frames if frame is not None]
+
+def detection_parity(reference: Sequence[Sequence], candidate: Sequence[Sequence],
+                     iou_threshold: float = 0.5) -> Dict[str, float]:
+    """
+    Compare per-frame element lists of a mode against the eager reference.
+    Recall is the share of reference elements matched by name and IoU, score
+    delta the largest confidence difference of a matched pair.
+    """
+    matched = total = 0
+    max_score_delta = 0.0
+    for ref_elements, cand_elements in zip(reference, candidate):
+        available = list(cand_elements)
+        for ref in ref_elements:
+            total += 1
+            best = max((c for c in available if c.name == ref.name),
+                       key=lambda c: _iou(ref, c), default=None)
+            if best is not None and _iou(ref, best) >= iou_threshold:
+                matched += 1
+                available.remove(best)
+                max_score_delta = max(max_score_delta, abs(best.confidence - ref.confidence))
+    return {'recall': matched / total if total else 1.0,
+            'extra': sum(len(c) for c in candidate) - matched,
+            'max_score_delta': max_score_delta}
+
+def benchmark_inference_modes(model_path: str,
+                              frames: Sequence[np.ndarray],
+                              modes: Sequence[str] = INFERENCE_MODES,
+                              categories_path: Optional[str] = None,
+                              calibration_dir: Optional[str] = None,
+                              threshold: float = 0.5,
+                              repeats: int = 3) -> Dict[str, Dict[str, float]]:
+    """Latency per frame and parity with eager of every inference mode"""
+    from core.element_detection import ElementDetector
+
+    results = {}
+    reference = None
+    for mode in ("eager",) + tuple(m for m in modes if m != "eager"):
+        try:
+            detector = ElementDetector(model_path, categories_path,
+                                       inference_mode=mode, calibration_dir=calibration_dir)
+            # First call triggers tracing/compilation, keep it out of the timings
+            detector.detect_elements(frames[0], use_cache=False)
+        except Exception as e:
+            results[mode] = {'error': f"{type(e).__name__}: {e}"}
+            continue
+
+        latencies = []
+        outputs = []
+        for _ in range(repeats):
+            outputs = []
+            for frame in frames:
+                start = time.perf_counter()
+                outputs.append(detector.detect_elements(frame, threshold, use_cache=False))
+                latencies.append(time.perf_counter() - start)
+
+        if reference is None:
+            reference = outputs
+        result = {
+            'mean_ms': 1000 * float(np.mean(latencies)),
+            'p50_ms': 1000 * float(np.percentile(latencies, 50)),
+            'p95_ms': 1000 * float(np.percentile(latencies, 95)),
+        }
+        result.update(detection_parity(reference, outputs))
+        results[mode] = result
+    return results
+
+# Usage example:
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare ElementDetector inference modes on CPU")
+    parser.add_argument("model_path")
+    parser.add_argument("--categories")
+    parser.add_argument("--frames-dir", help="Dataset images used as benchmark frames")
+    parser.add_argument("--calibration-dir", help="Dataset images used to calibrate int8_static")
+    parser.add_argument("--modes", nargs="+", default=list(INFERENCE_MODES), choices=INFERENCE_MODES)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.frames_dir:
+        frames = load_calibration_frames(args.frames_dir, limit=16)
+    else:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, size=(1080, 1920, 4), dtype=np.uint8) for _ in range(8)]
+
+    results = benchmark_inference_modes(args.model_path, frames, args.modes, args.categories,
+                                        args.calibration_dir or args.frames_dir, repeats=args.repeats)
+    for mode, result in results.items():
+        if 'error' in result:
+            print(f"{mode:<14} failed: {result['error']}")
+            continue
+        print(f"{mode:<14} mean {result['mean_ms']:7.1f} ms  p50 {result['p50_ms']:7.1f} ms  "
+              f"p95 {result['p95_ms']:7.1f} ms  recall {result['recall']:.3f}  "
+              f"extra {result['extra']}  max score delta {result['max_score_delta']:.3f}")
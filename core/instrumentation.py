@@ -0,0 +1,210 @@
+# core/instrumentation.py
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+import bisect
+import json
+import math
+import threading
+import time
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+# Latency bucket upper bounds in seconds: 1us to ~100s, 10% apart, so a
+# quantile read from the buckets is within 10% of the true value
+BUCKET_BOUNDS = [1e-6 * 1.1 ** i for i in range(194)]
+QUANTILES = (0.5, 0.95, 0.99)
+
+class Histogram:
+    """Latency histogram with fixed log-spaced buckets"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                # Interpolate inside the bucket, capped by the largest value seen
+                lower = BUCKET_BOUNDS[i - 1] if i > 0 else 0.0
+                upper = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                value = lower + (upper - lower) * (1 - (seen - rank) / count)
+                return min(value, self.max)
+        return self.max
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ('metrics', 'name', 'labels', 'start')
+
+    def __init__(self, metrics: "Instrumentation", name: str, labels: Dict[str, str]):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        self.metrics.observe(self.name, duration, **self.labels)
+        if exc_type is not None:
+            self.metrics.count(f"{self.name}_errors", **self.labels)
+        if self.metrics.trace is not None:
+            self.metrics.trace.append((self.name, self.labels, self.start, duration,
+                                       threading.current_thread().name))
+        return False
+
+class Instrumentation:
+    """
+    Spans, latency histograms and counters for the automation loop.
+
+    Disabled (the default), span() returns a shared no-op context manager and
+    count/observe return immediately, so instrumented code pays one attribute
+    check per call. Call enable() to start collecting, then snapshot(),
+    export_json() or prometheus_text(). With trace_size, the last spans are
+    also kept with their start times and threads.
+    """
+
+    def __init__(self, enabled: bool = False, trace_size: int = 0):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.histograms: Dict[LabelKey, Histogram] = {}
+        self.counters: Dict[LabelKey, float] = {}
+        self.trace: Optional[deque] = deque(maxlen=trace_size) if trace_size else None
+        self.started = time.time()
+
+    def enable(self, trace_size: int = 0):
+        self.trace = deque(maxlen=trace_size) if trace_size else None
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            if self.trace is not None:
+                self.trace.clear()
+            self.started = time.time()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, object]) -> LabelKey:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def span(self, name: str, **labels):
+        """Context manager timing a block into the name histogram"""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, labels)
+
+    def observe(self, name: str, seconds: float, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def snapshot(self) -> Dict[str, List[Dict]]:
+        """Every histogram with count, mean and p50/p95/p99 (seconds), and every counter"""
+        with self.lock:
+            histograms = []
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                entry = {'name': name, 'labels': dict(labels), 'count': histogram.count,
+                         'mean': histogram.sum / histogram.count, 'max': histogram.max}
+                entry.update({f"p{int(q * 100)}": histogram.quantile(q) for q in QUANTILES})
+                histograms.append(entry)
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            trace = [{'name': name, 'labels': labels, 'start': start, 'duration': duration, 'thread': thread}
+                     for name, labels, start, duration, thread in (self.trace or ())]
+        return {'histograms': histograms, 'counters': counters, 'trace': trace}
+
+    def export_json(self, path: str):
+        snapshot = self.snapshot()
+        snapshot['started'] = self.started
+        snapshot['exported'] = time.time()
+        with open(path, 'w') as f:
+            json.dump(snapshot, f, indent=2)
+
+    def prometheus_text(self, prefix: str = "gog_viper_") -> str:
+        """Prometheus exposition format: histograms as summaries in seconds, counters as totals"""
+        def label_text(labels: Dict[str, str], **extra) -> str:
+            items = {**labels, **extra}
+            if not items:
+                return ""
+            escaped = (k + '="' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"'
+                       for k, v in items.items())
+            return "{" + ",".join(escaped) + "}"
+
+        snapshot = self.snapshot()
+        lines = []
+        seen = set()
+        for entry in snapshot['histograms']:
+            metric = f"{prefix}{entry['name']}_seconds"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} summary")
+                seen.add(metric)
+            for q in QUANTILES:
+                lines.append(f"{metric}{label_text(entry['labels'], quantile=q)} {entry[f'p{int(q * 100)}']:.6g}")
+            lines.append(f"{metric}_sum{label_text(entry['labels'])} {entry['mean'] * entry['count']:.6g}")
+            lines.append(f"{metric}_count{label_text(entry['labels'])} {entry['count']}")
+        for entry in snapshot['counters']:
+            metric = f"{prefix}{entry['name']}_total"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{label_text(entry['labels'])} {entry['value']:.6g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, prefix: str = "gog_viper_"):
+        """Write the metrics file for node_exporter's textfile collector"""
+        with open(path, 'w') as f:
+            f.write(self.prometheus_text(prefix))
+
+    def format_table(self) -> str:
+        """Human readable p50/p95/p99 per histogram, in milliseconds"""
+        lines = [f"{'stage':<40} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+        for entry in self.snapshot()['histograms']:
+            labels = ",".join(f"{k}={v}" for k, v in entry['labels'].items())
+            name = f"{entry['name']}{{{labels}}}" if labels else entry['name']
+            lines.append(f"{name:<40} {entry['count']:>7} {1000 * entry['p50']:>9.2f} "
+                         f"{1000 * entry['p95']:>9.2f} {1000 * entry['p99']:>9.2f}")
+        return "\n".join(lines)
+
+# Shared instance used by WindowManager, ElementDetector and ActionManager
+metrics = Instrumentation()
@@ -0,0 +1,247 @@
+# core/multi_window_executor.py
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+import time
+import numpy as np
+from core.action_manager import ActionManager, ActionRun
+from core.instrumentation import metrics
+
+@dataclass
+class WindowRun:
+    """Progress of one window through a sequence"""
+    window: object
+    action_index: int = 0
+    action: Optional[ActionRun] = None    # The current action's wait for its target
+    seq: int = 0                          # Sequence number of the last frame looked at
+    clicked: Optional[np.ndarray] = None  # Sample of the frame of the previous click
+    next_attempt: float = 0.0
+    status: str = "running"   # running, done or failed
+    error: Optional[str] = None
+    actions_done: int = 0
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+
+class MultiWindowExecutor:
+    """
+    Runs a sequence on many windows at once, in rounds.
+
+    Every round grabs a frame of every window that is due (in a thread pool,
+    so Win32 captures overlap), detects elements in the frames that need it
+    with one detect_elements_batch call, then lets each window's ActionRun
+    click or schedule its next look. Deadlines, the change-driven backoff,
+    max_retries, action_timings and metrics are therefore the same as in
+    ActionManager.execute_sequence. A window whose capture or detection
+    fails is marked failed without affecting the others. Clicks go through
+    WindowManager.click_at, which serializes them.
+
+    With an ElementTracker, frames whose tracks verify skip the detector and
+    only the rest are batched.
+
+    Detectors are not thread-safe: ElementDetector shares its preprocess
+    buffers between frames of the same size, and its counters, last_seen and
+    ElementTracker's per-window tracks are unlocked. So the detector is only
+    called from the thread running run(). The one exception is the executor
+    handed to detect_elements_batch, which only runs the detection cache
+    (locked) and the fast backend (TemplateMatchingBackend locks its state)
+    on the pool. Detectors without detect_elements_batch (DetectionClient)
+    are called once per window, one after another.
+    """
+
+    def __init__(self,
+                 window_manager,
+                 action_manager: ActionManager,
+                 element_detector=None,
+                 max_workers: int = 8,
+                 threshold: float = 0.7):
+        self.window_manager = window_manager
+        self.action_manager = action_manager
+        self.element_detector = element_detector or action_manager.element_detector
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="window")
+        self.threshold = threshold
+        self.sequence_name: Optional[str] = None
+        self.max_retries: Optional[int] = None
+        self.rounds = 0
+
+    def _grab(self, runs: List[WindowRun]) -> List[Optional[np.ndarray]]:
+        """A new frame per window, None when capture failed or no new frame is there yet"""
+        manager = self.action_manager
+
+        def grab(run: WindowRun) -> Optional[np.ndarray]:
+            try:
+                if run.seq == 0:
+                    image, run.seq = manager._first_frame(run.window)
+                else:
+                    image, run.seq = manager._next_frame(run.window, run.seq, 0.0)
+                return image
+            except Exception as e:
+                self._fail(run, f"capture: {type(e).__name__}: {e}")
+                return None
+        return list(self.pool.map(grab, runs))
+
+    def _detect_one(self, run: WindowRun, image: np.ndarray) -> Optional[Dict]:
+        try:
+            return self.element_detector.find_elements(
+                image, run.action.wanted, self.threshold, cache_key=run.window.handle)
+        except Exception as e:
+            self._fail(run, f"detection: {type(e).__name__}: {e}")
+            return None
+
+    def _detect(self, runs: List[WindowRun], images: List[np.ndarray]) -> List[Optional[Dict]]:
+        """Best element per name for every frame"""
+        if not hasattr(self.element_detector, 'detect_elements_batch'):
+            return [self._detect_one(run, image) for run, image in zip(runs, images)]
+        try:
+            batch = self.element_detector.detect_elements_batch(
+                images, self.threshold, cache_keys=[run.window.handle for run in runs], executor=self.pool)
+        except Exception:
+            # Find out which frame broke the batch, the other windows go on
+            return [self._detect_one(run, image) for run, image in zip(runs, images)]
+
+        results = []
+        for elements in batch:
+            found = {}
+            for element in elements:
+                best = found.get(element.name)
+                if best is None or element.confidence > best.confidence:
+                    found[element.name] = element
+            results.append(found)
+        return results
+
+    def _finish(self, run: WindowRun, status: str):
+        """Same sequence metrics as ActionManager.execute_sequence"""
+        run.status = status
+        run.finished = time.monotonic()
+        metrics.observe("sequence", run.finished - run.started, sequence=self.sequence_name)
+        metrics.count("sequences", sequence=self.sequence_name, result=status)
+
+    def _fail(self, run: WindowRun, error: str):
+        run.error = error
+        if run.action is not None and run.action.status == "waiting":
+            run.action.fail()
+        self._finish(run, "failed")
+
+    def _start_action(self, run: WindowRun):
+        actions = self.action_manager.sequences[self.sequence_name].actions
+        run.action = ActionRun(self.action_manager, self.sequence_name, actions[run.action_index],
+                               run.window, self.max_retries, run.clicked, self.threshold)
+        run.next_attempt = 0.0
+
+    def _clicked(self, run: WindowRun):
+        """Move on to the next action, or finish the sequence"""
+        run.clicked = run.action.sample
+        run.actions_done += 1
+        run.action_index += 1
+        if run.action_index < len(self.action_manager.sequences[self.sequence_name].actions):
+            self._start_action(run)
+            return
+        self._finish(run, "done")
+
+    def _schedule(self, run: WindowRun):
+        wait = run.action.next_wait()
+        if wait is None:
+            self._fail(run, f"{run.action.action.name}: {run.action.action.target} not found")
+        else:
+            run.next_attempt = time.monotonic() + wait
+
+    def run(self,
+            sequence_name: str,
+            windows: Sequence,
+            max_retries: Optional[int] = None) -> Dict[int, WindowRun]:
+        """Execute a sequence on every window, returning the outcome per window handle"""
+        if sequence_name not in self.action_manager.sequences:
+            raise ValueError(f"Unknown sequence: {sequence_name}")
+        self.sequence_name = sequence_name
+        self.max_retries = max_retries
+        runs = {window.handle: WindowRun(window) for window in windows}
+        for run in runs.values():
+            self._start_action(run)
+
+        while True:
+            active = [run for run in runs.values() if run.status == "running"]
+            if not active:
+                return runs
+            now = time.monotonic()
+            due = [run for run in active if run.next_attempt <= now]
+            if not due:
+                time.sleep(min(run.next_attempt for run in active) - now)
+                continue
+
+            images = self._grab(due)
+            detect = []
+            for run, image in zip(due, images):
+                if run.status != "running":
+                    continue
+                if image is not None and run.action.needs_detection(image):
+                    detect.append((run, image))
+                else:
+                    self._schedule(run)
+
+            if detect:
+                detect_runs, detect_images = zip(*detect)
+                for run, found in zip(detect_runs, self._detect(list(detect_runs), list(detect_images))):
+                    if found is None or run.status != "running":
+                        continue
+                    try:
+                        clicked = run.action.detected(found)
+                    except Exception as e:
+                        self._fail(run, f"click: {type(e).__name__}: {e}")
+                        continue
+                    if clicked:
+                        self._clicked(run)
+                    else:
+                        self._schedule(run)
+            self.rounds += 1
+
+    def close(self):
+        self.pool.shutdown()
+
+def summarize(runs: Dict[int, WindowRun], elapsed: float) -> Dict[str, float]:
+    actions = sum(run.actions_done for run in runs.values())
+    return {
+        'windows': len(runs),
+        'done': sum(run.status == "done" for run in runs.values()),
+        'failed': sum(run.status == "failed" for run in runs.values()),
+        'actions': actions,
+        'actions_per_sec': actions / elapsed if elapsed > 0 else 0.0,
+    }
+
+# Usage example:
+if __name__ == "__main__":
+    import argparse
+    from core.action_manager import Action, ActionSequence
+    from core.capture_backends import ReplayCaptureBackend
+    from core.detection_backends import TemplateMatchingBackend
+    from core.element_detection import ElementDetector
+    from core.window_manager import WindowManager
+
+    parser = argparse.ArgumentParser(description="Actions/sec of MultiWindowExecutor on replayed windows")
+    parser.add_argument("frames_dir", help="Screenshots replayed as every window")
+    parser.add_argument("--model")
+    parser.add_argument("--categories")
+    parser.add_argument("--template-dir")
+    parser.add_argument("--target", required=True, help="Element clicked by every action")
+    parser.add_argument("--actions", type=int, default=20)
+    parser.add_argument("--windows", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    backend = TemplateMatchingBackend(args.template_dir) if args.template_dir else None
+    detector = ElementDetector(args.model, args.categories, fast_backend=backend)
+    detector.ready.result()
+
+    for count in args.windows:
+        capture = ReplayCaptureBackend.from_directory(args.frames_dir, window_count=count)
+        window_manager = WindowManager(capture)
+        action_manager = ActionManager(window_manager, detector)
+        sequence = ActionSequence("bench")
+        for i in range(args.actions):
+            sequence.add_action(Action(f"click_{i}", args.target, [], retry_interval=0.05))
+        action_manager.sequences["bench"] = sequence
+
+        executor = MultiWindowExecutor(window_manager, action_manager)
+        start = time.perf_counter()
+        runs = executor.run("bench", window_manager.find_game_windows("Replay"))
+        summary = summarize(runs, time.perf_counter() - start)
+        executor.close()
+        print(f"{count:3d} windows: {summary['actions_per_sec']:7.1f} actions/s, "
+              f"{summary['done']} done, {summary['failed']} failed, {executor.rounds} rounds")
@@ -0,0 +1,69 @@
+# core/preprocessing.py
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Sequence, Tuple
+import cv2
+import numpy as np
+
+if TYPE_CHECKING:
+    import torch
+
+@dataclass
+class PreprocessBuffers:
+    """Preallocated intermediates for one (height, width, channels) combination"""
+    resized: np.ndarray      # (H, W, C) uint8, frame resized to the model input size
+    rgb: np.ndarray          # (H, W, 3) uint8
+    normalized: np.ndarray   # (H, W, 3) float32
+    tensor: "torch.Tensor"   # (1, 3, H, W) view of normalized, channels_last in memory
+
+class FramePreprocessor:
+    """
+    Turns BGR(A) captures into normalized model input without per-frame allocations.
+
+    Every step writes into buffers allocated on the first frame of a given
+    size: cv2 resize and color conversion use dst=, the normalization runs as
+    two in-place ufuncs, and the returned tensor is a torch.from_numpy view of
+    the HWC float buffer permuted to NCHW (i.e. channels_last memory layout).
+    The tensor is overwritten by the next call with the same size, so it must
+    be consumed (or cloned) before preprocessing another frame.
+    """
+
+    def __init__(self,
+                 mean: Sequence[float] = (0.485, 0.456, 0.406),
+                 std: Sequence[float] = (0.229, 0.224, 0.225)):
+        # (x / 255 - mean) / std == x * scale + bias
+        std = np.asarray(std, dtype=np.float32)
+        self.scale = (1.0 / (255.0 * std)).astype(np.float32)
+        self.bias = (-np.asarray(mean, dtype=np.float32) / std).astype(np.float32)
+        self.buffers: Dict[Tuple[int, int, int], PreprocessBuffers] = {}
+
+    def _buffers_for(self, height: int, width: int, channels: int) -> PreprocessBuffers:
+        key = (height, width, channels)
+        buffers = self.buffers.get(key)
+        if buffers is None:
+            import torch
+            normalized = np.empty((height, width, 3), dtype=np.float32)
+            buffers = PreprocessBuffers(
+                resized=np.empty((height, width, channels), dtype=np.uint8),
+                rgb=np.empty((height, width, 3), dtype=np.uint8),
+                normalized=normalized,
+                tensor=torch.from_numpy(normalized).permute(2, 0, 1).unsqueeze(0)
+            )
+            self.buffers[key] = buffers
+        return buffers
+
+    def __call__(self, image: np.ndarray, size: Tuple[int, int]) -> "torch.Tensor":
+        height, width = size
+        channels = image.shape[2]
+        buffers = self._buffers_for(height, width, channels)
+
+        resized = image
+        if image.shape[:2] != (height, width):
+            cv2.resize(image, (width, height), dst=buffers.resized, interpolation=cv2.INTER_AREA)
+            resized = buffers.resized
+
+        code = cv2.COLOR_BGRA2RGB if channels == 4 else cv2.COLOR_BGR2RGB
+        cv2.cvtColor(resized, code, dst=buffers.rgb)
+
+        np.multiply(buffers.rgb, self.scale, out=buffers.normalized)
+        np.add(buffers.normalized, self.bias, out=buffers.normalized)
+        return buffers.tensor
@@ -0,0 +1,371 @@
+# core/session_recorder.py
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+import bisect
+import json
+import queue
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+
+# File layout: MAGIC, then records of (type, payload length, payload), then an
+# index record and TRAILER (index offset + INDEX_MAGIC). A file without the
+# trailer (e.g. the bot crashed) is still readable by scanning its records.
+MAGIC = b'GVSR\x01'
+INDEX_MAGIC = b'GVSI'
+RECORD = struct.Struct('<cI')            # type, payload length
+FRAME = struct.Struct('<Iqd3HH')         # frame index, window, timestamp, height, width, channels, tile size
+TRAILER = struct.Struct('<Q4s')
+KEYFRAME, DELTA, EVENT, INDEX = b'K', b'D', b'E', b'I'
+
+@dataclass
+class FrameEntry:
+    index: int
+    window: int
+    timestamp: float
+    offset: int
+    keyframe: bool
+
+class SessionRecorder:
+    """
+    Records what the bot saw and did into one chunked file.
+
+    Every keyframe_interval frames of a window (and whenever its size
+    changes) the whole frame is stored zlib-compressed. Frames in between
+    only store the tiles that changed since the window's previous frame, as
+    the XOR with it, which compresses to almost nothing where a tile barely
+    changed. Detections and clicks are stored as JSON events.
+
+    record_* calls only copy the frame into a pooled buffer and queue it;
+    diffing, compression and disk writes run on a writer thread. When the
+    writer falls max_queue items behind, frames and events are dropped
+    (counted in dropped_frames and dropped_events) instead of blocking the
+    bot. Events recorded after a dropped frame are not attached to any frame.
+    """
+
+    def __init__(self,
+                 path: str,
+                 keyframe_interval: int = 30,
+                 tile_size: int = 32,
+                 compression_level: int = 1,
+                 max_queue: int = 16):
+        self.path = Path(path)
+        self.keyframe_interval = keyframe_interval
+        self.tile_size = tile_size
+        self.compression_level = compression_level
+        self.file = open(self.path, 'wb')
+        self.file.write(MAGIC)
+
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self.free_buffers: Dict[Tuple[int, ...], List[np.ndarray]] = {}
+        self.lock = threading.Lock()
+        self.frame_count = 0
+        self.dropped_frames = 0
+        self.dropped_events = 0
+        self.last_frame: Dict[Hashable, Optional[int]] = {}
+
+        # Writer thread state
+        self.previous: Dict[int, np.ndarray] = {}       # Padded previous frame per window
+        self.scratch: Dict[int, np.ndarray] = {}
+        self.since_keyframe: Dict[int, int] = {}
+        self.entries: List[FrameEntry] = []
+        self.event_offsets: List[int] = []
+        self.writer = threading.Thread(target=self._write_loop, name="SessionRecorder", daemon=True)
+        self.writer.start()
+
+    def _buffer(self, image: np.ndarray) -> np.ndarray:
+        with self.lock:
+            buffers = self.free_buffers.get(image.shape)
+            if buffers:
+                return buffers.pop()
+        return np.empty_like(image)
+
+    def _release_buffer(self, buffer: np.ndarray):
+        with self.lock:
+            self.free_buffers.setdefault(buffer.shape, []).append(buffer)
+
+    def record_frame(self, image: np.ndarray, window: Hashable = 0, timestamp: Optional[float] = None) -> Optional[int]:
+        """Queue a captured frame, returning its frame index or None if it was dropped"""
+        if self.queue.full():
+            self.dropped_frames += 1
+            self.last_frame[window] = None
+            return None
+        buffer = self._buffer(image)
+        np.copyto(buffer, image)
+        with self.lock:
+            index = self.frame_count
+            self.frame_count += 1
+        try:
+            self.queue.put_nowait(('frame', index, int(window), timestamp or time.time(), buffer))
+        except queue.Full:
+            self._release_buffer(buffer)
+            self.dropped_frames += 1
+            self.last_frame[window] = None
+            return None
+        self.last_frame[window] = index
+        return index
+
+    def record_event(self, kind: str, window: Hashable = 0, frame: Optional[int] = None, **data):
+        """Queue a JSON event, attached by default to the window's last recorded frame"""
+        event = {'type': kind, 'window': int(window), 'time': time.time(),
+                 'frame': frame if frame is not None else self.last_frame.get(window)}
+        event.update(data)
+        try:
+            self.queue.put_nowait(('event', event))
+        except queue.Full:
+            self.dropped_events += 1
+
+    def record_detections(self, elements: Iterable, window: Hashable = 0, frame: Optional[int] = None):
+        """Record DetectedElements found in a frame"""
+        self.record_event('detections', window, frame, elements=[asdict(e) for e in elements])
+
+    def record_click(self, window: Hashable, x: float, y: float):
+        """Record a click at relative window coordinates"""
+        self.record_event('click', window, x=x, y=y)
+
+    def _write_record(self, kind: bytes, *parts: bytes) -> int:
+        offset = self.file.tell()
+        self.file.write(RECORD.pack(kind, sum(len(part) for part in parts)))
+        for part in parts:
+            self.file.write(part)
+        return offset
+
+    def _write_frame(self, index: int, window: int, timestamp: float, image: np.ndarray):
+        tile = self.tile_size
+        height, width = image.shape[:2]
+        channels = image.shape[2] if image.ndim == 3 else 1
+        rows, cols = -(-height // tile), -(-width // tile)
+
+        shape = (rows * tile, cols * tile, channels)
+        previous = self.previous.get(window)
+        keyframe = (previous is None or previous.shape != shape or
+                    self.since_keyframe.get(window, 0) + 1 >= self.keyframe_interval)
+        current = self.scratch.get(window)
+        if current is None or current.shape != shape:
+            current = np.zeros(shape, dtype=np.uint8)
+        current[:height, :width] = image.reshape(height, width, channels)
+        header = FRAME.pack(index, window, timestamp, height, width, channels, tile)
+
+        if keyframe:
+            payload = zlib.compress(image.tobytes(), self.compression_level)
+            offset = self._write_record(KEYFRAME, header, payload)
+            self.since_keyframe[window] = 0
+        else:
+            # previous becomes the XOR delta, it is overwritten by the swap below anyway
+            delta = np.bitwise_xor(previous, current, out=previous).reshape(rows, tile, cols, tile, channels)
+            dirty = np.flatnonzero(delta.any(axis=(1, 3, 4))).astype(np.uint32)
+            tile_rows, tile_cols = np.divmod(dirty, cols)
+            changed = delta[tile_rows, :, tile_cols]   # (count, tile, tile, channels)
+            payload = zlib.compress(changed.tobytes(), self.compression_level)
+            offset = self._write_record(DELTA, header, struct.pack('<I', len(dirty)), dirty.tobytes(), payload)
+            self.since_keyframe[window] += 1
+
+        # The current frame becomes the reference, the old reference the next scratch buffer
+        self.previous[window], self.scratch[window] = current, previous
+        self.entries.append(FrameEntry(index, window, timestamp, offset, keyframe))
+
+    def _write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if item[0] == 'frame':
+                _, index, window, timestamp, buffer = item
+                self._write_frame(index, window, timestamp, buffer)
+                self._release_buffer(buffer)
+            else:
+                self.event_offsets.append(self._write_record(EVENT, json.dumps(item[1]).encode()))
+
+    def close(self):
+        """Flush queued records and write the index"""
+        if self.file.closed:
+            return
+        self.queue.put(None)
+        self.writer.join()
+        index = {'frames': [asdict(entry) for entry in self.entries], 'events': self.event_offsets}
+        offset = self._write_record(INDEX, json.dumps(index).encode())
+        self.file.write(TRAILER.pack(offset, INDEX_MAGIC))
+        self.file.close()
+
+    def __enter__(self) -> "SessionRecorder":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class SessionReader:
+    """
+    Random access to a recorded session. Frames of one window (or of all
+    windows, in recording order) are a sequence of BGR(A) arrays, so a reader
+    can be replayed with ReplayCaptureBackend. Seeking decodes forward from
+    the window's previous keyframe; sequential reads decode one delta each.
+    """
+
+    def __init__(self, path: str, window: Optional[int] = None):
+        self.path = Path(path)
+        self.file = open(self.path, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a session recording: {path}")
+        self.entries, self.event_offsets = self._load_index()
+        if window is not None:
+            self.entries = [entry for entry in self.entries if entry.window == window]
+        self.windows = sorted({entry.window for entry in self.entries})
+        self.entries_by_window: Dict[int, List[int]] = {}
+        for position, entry in enumerate(self.entries):
+            self.entries_by_window.setdefault(entry.window, []).append(position)
+        # Last decoded (rank within the window, padded frame) per window, for sequential reads
+        self.decoded: Dict[int, Tuple[int, np.ndarray]] = {}
+
+    def _read_record(self, offset: int) -> Tuple[bytes, bytes]:
+        self.file.seek(offset)
+        kind, length = RECORD.unpack(self.file.read(RECORD.size))
+        return kind, self.file.read(length)
+
+    def _load_index(self) -> Tuple[List[FrameEntry], List[int]]:
+        self.file.seek(0, 2)
+        size = self.file.tell()
+        if size >= len(MAGIC) + TRAILER.size:
+            self.file.seek(size - TRAILER.size)
+            offset, magic = TRAILER.unpack(self.file.read(TRAILER.size))
+            if magic == INDEX_MAGIC:
+                index = json.loads(self._read_record(offset)[1])
+                return [FrameEntry(**entry) for entry in index['frames']], index['events']
+
+        # No index, the recording was not closed: scan the records
+        entries, events = [], []
+        offset = len(MAGIC)
+        while offset + RECORD.size <= size:
+            self.file.seek(offset)
+            kind, length = RECORD.unpack(self.file.read(RECORD.size))
+            if offset + RECORD.size + length > size:
+                break  # Truncated last record
+            if kind in (KEYFRAME, DELTA):
+                index, window, timestamp = FRAME.unpack(self.file.read(FRAME.size))[:3]
+                entries.append(FrameEntry(index, window, timestamp, offset, kind == KEYFRAME))
+            elif kind == EVENT:
+                events.append(offset)
+            offset += RECORD.size + length
+        return entries, events
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _apply(self, position: int, padded: Optional[np.ndarray]) -> np.ndarray:
+        kind, payload = self._read_record(self.entries[position].offset)
+        _, _, _, height, width, channels, tile = FRAME.unpack_from(payload)
+        rows, cols = -(-height // tile), -(-width // tile)
+        body = payload[FRAME.size:]
+        if kind == KEYFRAME:
+            padded = np.zeros((rows * tile, cols * tile, channels), dtype=np.uint8)
+            image = np.frombuffer(zlib.decompress(body), dtype=np.uint8)
+            padded[:height, :width] = image.reshape(height, width, channels)
+            return padded
+
+        count, = struct.unpack_from('<I', body)
+        dirty = np.frombuffer(body, dtype=np.uint32, count=count, offset=4)
+        changed = np.frombuffer(zlib.decompress(body[4 + 4 * count:]), dtype=np.uint8)
+        tile_rows, tile_cols = np.divmod(dirty, cols)
+        tiles = padded.reshape(rows, tile, cols, tile, channels)
+        tiles[tile_rows, :, tile_cols] ^= changed.reshape(count, tile, tile, channels)
+        return padded
+
+    def _frame_shape(self, position: int) -> Tuple[int, int, int]:
+        kind, payload = self._read_record(self.entries[position].offset)
+        return FRAME.unpack_from(payload)[3:6]
+
+    def __getitem__(self, position: int) -> np.ndarray:
+        if position < 0:
+            position += len(self.entries)
+        entry = self.entries[position]
+        window_positions = self.entries_by_window[entry.window]
+        rank = bisect.bisect_left(window_positions, position)
+
+        decoded = self.decoded.get(entry.window)
+        if decoded is not None and decoded[0] <= rank:
+            start, padded = decoded[0] + 1, decoded[1]
+        else:
+            start, padded = rank, None
+        # Deltas only apply on top of everything since the last keyframe
+        keyframe = rank
+        while not self.entries[window_positions[keyframe]].keyframe:
+            keyframe -= 1
+        if padded is None or keyframe >= start:
+            start, padded = keyframe, None
+        for i in range(start, rank + 1):
+            padded = self._apply(window_positions[i], padded)
+        self.decoded[entry.window] = (rank, padded)
+
+        height, width, channels = self._frame_shape(position)
+        image = padded[:height, :width]
+        return (image[:, :, 0] if channels == 1 else image).copy()
+
+    def events(self, kind: Optional[str] = None) -> List[Dict]:
+        events = [json.loads(self._read_record(offset)[1]) for offset in self.event_offsets]
+        return [event for event in events if kind is None or event['type'] == kind]
+
+    def export_to_dataset(self, dataset_creator, step: int = 1, prefix: str = "session") -> List[Path]:
+        """
+        Save every step-th frame as a PNG in a DatasetCreator's images folder,
+        skipping near-duplicates of images already there when the
+        DatasetCreator has dedup on (see DatasetCreator.save_screenshot). Frames with recorded detections also
+        get an annotation file in the DatasetCreator format, to correct in
+        annotate_image instead of drawing every box from scratch.
+        """
+        detections = {event['frame']: event['elements'] for event in self.events('detections')}
+        paths = []
+        for position in range(0, len(self.entries), step):
+            entry = self.entries[position]
+            image = self[position]
+            name = f"{prefix}_{entry.window}_{entry.index:06d}"
+            path = dataset_creator.save_screenshot(image, name)
+            if path is None:
+                continue
+            paths.append(path)
+
+            if entry.index in detections:
+                height, width = image.shape[:2]
+                annotations = []
+                for element in detections[entry.index]:
+                    if element['name'] not in dataset_creator.categories:
+                        continue
+                    w, h = element['width'] * width, element['height'] * height
+                    annotations.append({
+                        'bbox': [element['x'] * width - w / 2, element['y'] * height - h / 2, w, h],
+                        'category_id': dataset_creator.categories[element['name']],
+                        'area': w * h,
+                        'iscrowd': 0
+                    })
+                with open(dataset_creator.annotations_path / f"{name}.json", 'w') as f:
+                    json.dump(annotations, f, indent=2)
+        dataset_creator.flush()
+        return paths
+
+    def close(self):
+        self.file.close()
+
+# Usage example:
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect a recorded session or export it to a dataset")
+    parser.add_argument("session")
+    parser.add_argument("--export", help="DatasetCreator base path to export frames into")
+    parser.add_argument("--step", type=int, default=1, help="Export every step-th frame")
+    parser.add_argument("--dedup", action="store_true", help="Skip frames that near-duplicate exported images")
+    args = parser.parse_args()
+
+    reader = SessionReader(args.session)
+    keyframes = sum(entry.keyframe for entry in reader.entries)
+    size = reader.path.stat().st_size
+    print(f"{len(reader)} frames ({keyframes} keyframes) from {len(reader.windows)} windows, "
+          f"{len(reader.events('detections'))} detections, {len(reader.events('click'))} clicks, "
+          f"{size / 1e6:.1f} MB ({size / max(1, len(reader)) / 1e3:.1f} kB per frame)")
+    if args.export:
+        from dataset_creator import DatasetCreator
+        from phash_index import DEFAULT_MAX_DISTANCE
+        dataset_creator = DatasetCreator(args.export, dedup_distance=DEFAULT_MAX_DISTANCE if args.dedup else None)
+        paths = reader.export_to_dataset(dataset_creator, args.step)
+        print(f"Exported {len(paths)} frames to {args.export}")
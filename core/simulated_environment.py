@@ -0,0 +1,184 @@
+# core/simulated_environment.py
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import json
+import time
+import cv2
+import numpy as np
+from core.capture_backends import CaptureBackend
+from core.window_manager import Window, WindowManager
+
+@dataclass
+class Transition:
+    region: Tuple[float, float, float, float]   # Relative (x1, y1, x2, y2) that reacts to clicks
+    to: str
+
+@dataclass
+class SimulatedState:
+    name: str
+    image: np.ndarray                            # BGRA screenshot shown in this state
+    transitions: List[Transition] = field(default_factory=list)
+
+@dataclass
+class WindowSimulation:
+    state: str
+    pending: Optional[Tuple[str, float]] = None  # (next state, time it is rendered)
+
+def _element_regions(annotation_path: Path, categories: Dict[str, int],
+                     width: int, height: int) -> Dict[str, Tuple[float, float, float, float]]:
+    """Relative regions of the elements of a DatasetCreator annotation file"""
+    names = {category_id: name for name, category_id in categories.items()}
+    with open(annotation_path) as f:
+        annotations = json.load(f)
+    regions = {}
+    for annotation in annotations:
+        x, y, w, h = annotation['bbox']
+        name = names.get(annotation['category_id'])
+        if name is not None:
+            regions[name] = (x / width, y / height, (x + w) / width, (y + h) / height)
+    return regions
+
+def load_state_graph(config_path: str) -> Tuple[Dict[str, SimulatedState], str]:
+    """
+    Read a state graph config:
+
+        {"initial": "home",
+         "categories": "game_ui_dataset/categories.json",
+         "states": {
+            "home": {"image": "game_ui_dataset/images/home.png",
+                     "annotations": "game_ui_dataset/annotations/home.json",
+                     "transitions": [{"element": "mail", "to": "mail"},
+                                     {"region": [0.9, 0.0, 1.0, 0.1], "to": "home"}]},
+            ...}}
+
+    Paths are relative to the config file. A transition names either an
+    annotated element of the state's screenshot or a relative region.
+    """
+    base = Path(config_path).parent
+    with open(config_path) as f:
+        config = json.load(f)
+    categories = {}
+    if 'categories' in config:
+        with open(base / config['categories']) as f:
+            categories = json.load(f)
+
+    states = {}
+    for name, state_config in config['states'].items():
+        image = cv2.imread(str(base / state_config['image']))
+        if image is None:
+            raise ValueError(f"Cannot read screenshot of state {name}: {state_config['image']}")
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        height, width = image.shape[:2]
+        regions = {}
+        if 'annotations' in state_config:
+            regions = _element_regions(base / state_config['annotations'], categories, width, height)
+
+        transitions = []
+        for transition in state_config.get('transitions', []):
+            if 'element' in transition:
+                if transition['element'] not in regions:
+                    raise ValueError(f"State {name} has no annotated element {transition['element']}")
+                region = regions[transition['element']]
+            else:
+                region = tuple(transition['region'])
+            transitions.append(Transition(region, transition['to']))
+        states[name] = SimulatedState(name, image, transitions)
+
+    initial = config.get('initial', next(iter(states)))
+    for state in states.values():
+        for transition in state.transitions:
+            if transition.to not in states:
+                raise ValueError(f"State {state.name} transitions to unknown state {transition.to}")
+    return states, initial
+
+class SimulatedCaptureBackend(CaptureBackend):
+    """
+    Game stand-in for WindowManager: every simulated window shows the
+    screenshot of its current state, and a click inside a transition region
+    switches the window to the target state render_latency seconds later
+    (captures before that still show the old screen). noise adds capture
+    noise of up to that many levels per pixel, as real captures have.
+    """
+
+    def __init__(self,
+                 states: Dict[str, SimulatedState],
+                 initial: str,
+                 window_count: int = 1,
+                 render_latency: float = 0.1,
+                 noise: int = 0,
+                 seed: int = 0,
+                 title: str = "Simulated"):
+        self.states = states
+        self.initial = initial
+        self.window_count = window_count
+        self.render_latency = render_latency
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.title = title
+        self.windows: Dict[int, WindowSimulation] = {}
+        self.buffers: Dict[int, np.ndarray] = {}
+        self.reset()
+
+        self.captures = 0
+        self.clicks = 0
+        self.missed_clicks = 0
+        self.transitions = 0
+
+    def reset(self):
+        """Put every window back in the initial state"""
+        self.windows = {handle: WindowSimulation(self.initial) for handle in range(1, self.window_count + 1)}
+
+    def state(self, window: Window) -> str:
+        return self._simulation(window).state
+
+    def _simulation(self, window: Window) -> WindowSimulation:
+        simulation = self.windows[window.handle]
+        if simulation.pending is not None and time.monotonic() >= simulation.pending[1]:
+            simulation.state = simulation.pending[0]
+            simulation.pending = None
+        return simulation
+
+    def find_windows(self, window_title: str) -> List[Window]:
+        if window_title not in self.title:
+            return []
+        height, width = self.states[self.initial].image.shape[:2]
+        return [Window(handle, f"{self.title} {handle}", 0, 0, width, height) for handle in self.windows]
+
+    def capture(self, window: Window) -> np.ndarray:
+        self.captures += 1
+        image = self.states[self._simulation(window).state].image
+        window.height, window.width = image.shape[:2]
+        if not self.noise:
+            return image
+        buffer = self.buffers.get(window.handle)
+        if buffer is None or buffer.shape != image.shape:
+            buffer = self.buffers[window.handle] = np.empty_like(image)
+        noise = self.rng.integers(0, self.noise + 1, size=image.shape, dtype=np.uint8)
+        return cv2.add(image, noise, dst=buffer)
+
+    def click(self, window: Window, x: int, y: int) -> None:
+        self.clicks += 1
+        simulation = self._simulation(window)
+        rel_x, rel_y = (x - window.x) / window.width, (y - window.y) / window.height
+        for transition in self.states[simulation.state].transitions:
+            x1, y1, x2, y2 = transition.region
+            if x1 <= rel_x <= x2 and y1 <= rel_y <= y2:
+                simulation.pending = (transition.to, time.monotonic() + self.render_latency)
+                self.transitions += 1
+                return
+        self.missed_clicks += 1
+
+class SimulatedWindowManager(WindowManager):
+    """WindowManager playing a state graph of screenshots instead of game clients"""
+
+    def __init__(self,
+                 config_path: str,
+                 window_count: int = 1,
+                 render_latency: float = 0.1,
+                 noise: int = 0,
+                 recorder=None):
+        states, initial = load_state_graph(config_path)
+        super().__init__(SimulatedCaptureBackend(states, initial, window_count, render_latency, noise),
+                         recorder=recorder)
+        self.simulation = self.capture_backend
@@ -1,10 +1,15 @@
 # core/window_manager.py
-import win32gui
-import win32ui
-import win32con
+import logging
+import threading
+import time
 import numpy as np
 from dataclasses import dataclass
 from typing import Tuple, Optional
+from core.capture_backends import CaptureBackend, Win32CaptureBackend, win32gui
+from core.frame_ring import CaptureThread, CapturedFrame
+from core.instrumentation import metrics
+
+logger = logging.getLogger(__name__)
 
 @dataclass
 class Window:
@@ -16,62 +21,143 @@ class Window:
     height: int
 
 class WindowManager:
-    """Manages game windows and their coordinates"""
+    """
+    Manages game windows and their coordinates
+
+    Finding, capturing and clicking go through a capture backend (see
+    core.capture_backends): Win32CaptureBackend by default on Windows, or e.g.
+    a ReplayCaptureBackend to run headless. Captured frames may be reused by
+    the backend for the next capture of the same window.
+
+    start_capture switches a window to continuous capture: a background
+    thread fills a ring buffer at a fixed rate, latest_frame / wait_for_frame
+    read it, and capture_window returns a copy of the newest frame without
+    capturing. latest_frame / wait_for_frame hand out views of ring slots,
+    newer_frame copies the frame out so it stays intact however long it is
+    used.
+
+    With a recorder (core.session_recorder.SessionRecorder), every frame
+    returned by capture_window and every click is recorded.
+    """
     
-    def __init__(self):
+    def __init__(self, capture_backend: Optional[CaptureBackend] = None, recorder=None):
         self.windows: dict[int, Window] = {}
+        if capture_backend is None and win32gui is not None:
+            capture_backend = Win32CaptureBackend()
+        self.capture_backend = capture_backend
+        self.capture_threads: dict[int, CaptureThread] = {}
+        self.recorder = recorder
+        # Sequence number of the last ring frame recorded per window
+        self.recorded_seqs: dict[int, int] = {}
+        # Clicks move the one system cursor, so windows must not click at the same time
+        self.click_lock = threading.Lock()
+        # How long capture_window waits for the first frame of a continuous capture
+        self.frame_timeout = 5.0
+        # How long stop_capture waits for capture threads, a hung capture call is left behind
+        self.stop_timeout = 2.0
+
+    def _backend(self) -> CaptureBackend:
+        if self.capture_backend is None:
+            raise RuntimeError("No capture backend: pass one to WindowManager when not on Windows")
+        return self.capture_backend
         
     def find_game_windows(self, window_title: str) -> list[Window]:
         """Find all game windows matching the title pattern"""
-        def enum_callback(hwnd, results):
-            if win32gui.IsWindowVisible(hwnd):
-                window_text = win32gui.GetWindowText(hwnd)
-                if window_title in window_text:
-                    rect = win32gui.GetWindowRect(hwnd)
-                    x, y, right, bottom = rect
-                    width = right - x
-                    height = bottom - y
-                    window = Window(hwnd, window_text, x, y, width, height)
-                    self.windows[hwnd] = window
-                    results.append(window)
-        
-        results = []
-        win32gui.EnumWindows(enum_callback, results)
+        results = self._backend().find_windows(window_title)
+        for window in results:
+            self.windows[window.handle] = window
         return results
     
     def capture_window(self, window: Window) -> np.ndarray:
         """Capture screenshot of specific window"""
-        hwnd = window.handle
-        
-        # Get window DC
-        wDC = win32gui.GetWindowDC(hwnd)
-        dcObj = win32ui.CreateDCFromHandle(wDC)
-        cDC = dcObj.CreateCompatibleDC()
-        
-        # Create bitmap object
-        bmp = win32ui.CreateBitmap()
-        bmp.CreateCompatibleBitmap(dcObj, window.width, window.height)
-        cDC.SelectObject(bmp)
-        
-        # Copy window content
-        cDC.BitBlt((0, 0), (window.width, window.height), dcObj, (0, 0), win32con.SRCCOPY)
-        
-        # Convert to numpy array
-        signedIntsArray = bmp.GetBitmapBits(True)
-        img = np.frombuffer(signedIntsArray, dtype='uint8')
-        img.shape = (window.height, window.width, 4)
-        
-        # Free resources
-        dcObj.DeleteDC()
-        cDC.DeleteDC()
-        win32gui.ReleaseDC(hwnd, wDC)
-        win32gui.DeleteObject(bmp.GetHandle())
-        
-        return img
+        return self.capture_window_seq(window)[0]
+
+    def capture_window_seq(self, window: Window) -> Tuple[np.ndarray, int]:
+        """
+        capture_window, also returning the frame's sequence number in
+        continuous mode (0 otherwise). Raises RuntimeError when continuous
+        capture has stopped or produced no frame within frame_timeout.
+        """
+        with metrics.span("capture_window"):
+            if window.handle in self.capture_threads:
+                frame = self.newer_frame(window, 0, self.frame_timeout)
+                if frame is None:
+                    raise RuntimeError(f"No frame from the continuous capture of {window.title}")
+                return frame
+            image = self._backend().capture(window)
+        if self.recorder is not None:
+            self.recorder.record_frame(image, window.handle)
+        return image, 0
+
+    def newer_frame(self,
+                    window: Window,
+                    after_seq: int = 0,
+                    timeout: Optional[float] = None) -> Optional[Tuple[np.ndarray, int]]:
+        """
+        Copy of the newest continuous capture with seq > after_seq and its
+        seq, None if none arrives within timeout or capture has stopped
+        """
+        while True:
+            frame = self.wait_for_frame(window, after_seq, timeout)
+            if frame is None:
+                return None
+            image = frame.image.copy()
+            if frame.valid():
+                break
+            # The slot was reused while copying, so a newer frame is already there
+            after_seq = frame.seq
+        # Ring frames are handed out repeatedly, record each one once
+        if self.recorder is not None and self.recorded_seqs.get(window.handle) != frame.seq:
+            self.recorder.record_frame(image, window.handle)
+            self.recorded_seqs[window.handle] = frame.seq
+        return image, frame.seq
+
+    def start_capture(self, window: Window, fps: float = 10.0, slots: int = 4) -> None:
+        """Capture the window continuously on a background thread"""
+        if window.handle in self.capture_threads:
+            return
+        backend = self._backend()
+        thread = CaptureThread(lambda: backend.capture(window), fps, slots,
+                               name=f"capture-{window.handle}")
+        self.capture_threads[window.handle] = thread
+        thread.start()
+
+    def latest_frame(self, window: Window) -> Optional[CapturedFrame]:
+        """Newest continuous capture of the window without blocking, None before the first one"""
+        return self.capture_threads[window.handle].ring.latest()
+
+    def wait_for_frame(self,
+                       window: Window,
+                       after_seq: int = 0,
+                       timeout: Optional[float] = None) -> Optional[CapturedFrame]:
+        """Newest continuous capture with seq > after_seq, None if none arrives within timeout"""
+        return self.capture_threads[window.handle].ring.wait_for(after_seq, timeout)
+
+    def stop_capture(self, window: Optional[Window] = None, timeout: Optional[float] = None) -> None:
+        """
+        Stop continuous capture of one window, or of all of them, waiting up
+        to timeout (default stop_timeout) in total. A thread stuck in a capture
+        call is logged and abandoned (its ring is closed so readers do not wait
+        for it); it is a daemon and exits after that call.
+        """
+        handles = list(self.capture_threads) if window is None else [window.handle]
+        threads = [thread for thread in (self.capture_threads.pop(handle, None) for handle in handles)
+                   if thread is not None]
+        for thread in threads:
+            thread.stopped.set()
+        deadline = time.monotonic() + (self.stop_timeout if timeout is None else timeout)
+        for thread in threads:
+            thread.stop(max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                logger.warning("Capture thread %s did not stop, its capture call may be hung", thread.name)
+                # Release readers waiting for its next frame
+                thread.ring.close()
 
     def click_at(self, window: Window, x: float, y: float) -> None:
         """Convert relative coordinates to absolute and perform click"""
         abs_x = window.x + int(x * window.width)
         abs_y = window.y + int(y * window.height)
-        # Implement click using pyautogui or win32api
-        pass
+        with metrics.span("click_at"), self.click_lock:
+            self._backend().click(window, abs_x, abs_y)
+        if self.recorder is not None:
+            self.recorder.record_click(window.handle, x, y)
@@ -0,0 +1,252 @@
+from contextlib import redirect_stdout
+from pathlib import Path
+import io
+import json
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from typing import Callable, Dict, List, Optional
+
+from data_prep_tools.coco import generate_bb_coco, generate_poly_coco
+from ml_label_tool import labelme_polygons_v3, resize_images
+
+RESULTS_FILE = "data_prep_benchmark.json"
+STAGES = ("template_matching", "polygon_generation", "json_writing", "mask_rasterization", "resizing")
+
+def make_synthetic_dataset(root: str,
+                           images: int = 8,
+                           templates: int = 4,
+                           width: int = 1920,
+                           height: int = 1080,
+                           shapes: int = 20,
+                           seed: int = 0) -> Dict[str, str]:
+    """
+    Write screenshots with pasted templates, the templates themselves and one
+    LabelMe JSON per screenshot (polygons and rectangles) under root.
+    Returns the directories used by the benchmark stages.
+    """
+    rng = np.random.default_rng(seed)
+    dirs = {name: os.path.join(root, name) for name in ("screenshots", "templates", "labelme")}
+    for path in dirs.values():
+        os.makedirs(path, exist_ok=True)
+
+    # Random blocky icons, distinct enough for TM_CCOEFF_NORMED >= 0.8 to only hit themselves
+    icons = []
+    for i in range(templates):
+        size = int(rng.integers(32, 97))
+        icon = cv2.resize(rng.integers(0, 256, (8, 8, 3), dtype=np.uint8), (size, size),
+                          interpolation=cv2.INTER_NEAREST)
+        cv2.imwrite(os.path.join(dirs["templates"], f"icon_{i}.png"), icon)
+        icons.append(icon)
+
+    background = np.empty((height, width, 3), dtype=np.uint8)
+    background[:, :, 0] = np.linspace(20, 120, width, dtype=np.uint8)[None]
+    background[:, :, 1] = np.linspace(40, 160, height, dtype=np.uint8)[:, None]
+    background[:, :, 2] = 60
+    labels = [f"class_{i}" for i in range(max(templates, 1))]
+
+    for i in range(images):
+        image = background.copy()
+        for icon in icons:
+            size = icon.shape[0]
+            x, y = int(rng.integers(0, width - size)), int(rng.integers(0, height - size))
+            image[y:y + size, x:x + size] = icon
+        name = f"{i:05d}"
+        cv2.imwrite(os.path.join(dirs["screenshots"], f"{name}.png"), image)
+
+        labelme_shapes = []
+        for _ in range(shapes):
+            cx, cy = rng.uniform(0, width), rng.uniform(0, height)
+            radius = rng.uniform(10, 120)
+            label = labels[int(rng.integers(len(labels)))]
+            if rng.random() < 0.5:
+                angles = np.sort(rng.uniform(0, 2 * np.pi, int(rng.integers(4, 12))))
+                points = [[float(cx + radius * np.cos(a)), float(cy + radius * np.sin(a))] for a in angles]
+                labelme_shapes.append({"label": label, "points": points, "shape_type": "polygon"})
+            else:
+                points = [[cx, cy], [cx + radius, cy + radius * 0.6]]
+                labelme_shapes.append({"label": label, "points": points, "shape_type": "rectangle"})
+        with open(os.path.join(dirs["labelme"], f"{name}.json"), 'w') as f:
+            json.dump({"shapes": labelme_shapes, "imagePath": f"{name}.png",
+                       "imageHeight": height, "imageWidth": width}, f)
+    return dirs
+
+def _json_files(directory: str) -> List[str]:
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.json'))
+
+def stage_functions(dirs: Dict[str, str], output_dir: str,
+                    resize_to: tuple = (256, 144)) -> Dict[str, Callable[[], int]]:
+    """One callable per stage, each returning the number of items it processed"""
+    os.makedirs(output_dir, exist_ok=True)
+    screenshots = len(os.listdir(dirs["screenshots"]))
+
+    def template_matching():
+        generate_bb_coco.create_coco_annotations(
+            dirs["screenshots"], dirs["templates"], os.path.join(output_dir, "bb_coco.json"))
+        return screenshots
+
+    def polygon_generation():
+        generate_poly_coco.create_coco_annotations(
+            dirs["screenshots"], dirs["templates"], os.path.join(output_dir, "poly_coco.json"))
+        return screenshots
+
+    # A COCO file with as many polygons as the LabelMe annotations hold
+    coco = {"images": [], "annotations": [], "categories": []}
+    for image_id, path in enumerate(_json_files(dirs["labelme"]), 1):
+        with open(path) as f:
+            data = json.load(f)
+        coco["images"].append({"id": image_id, "file_name": data["imagePath"],
+                               "height": data["imageHeight"], "width": data["imageWidth"]})
+        for shape in data["shapes"]:
+            coco["annotations"].append({"id": len(coco["annotations"]) + 1, "image_id": image_id,
+                                        "category_id": 1, "iscrowd": 0,
+                                        "segmentation": [[c for point in shape["points"] for c in point]]})
+
+    def json_writing():
+        with open(os.path.join(output_dir, "written_coco.json"), 'w') as f:
+            json.dump(coco, f)
+        return len(coco["annotations"])
+
+    def mask_rasterization():
+        masks_dir = os.path.join(output_dir, "masks")
+        os.makedirs(masks_dir, exist_ok=True)
+        class_mapping = labelme_polygons_v3.build_class_mapping(dirs["labelme"])
+        json_files = _json_files(dirs["labelme"])
+        for path in json_files:
+            mask_path = os.path.join(masks_dir, f"{Path(path).stem}_P.png")
+            labelme_polygons_v3.labelme_to_mask(path, mask_path, class_mapping)
+        return len(json_files)
+
+    def resizing():
+        resize_images.resize_image(dirs["screenshots"], os.path.join(output_dir, "resized"), resize_to)
+        return screenshots
+
+    return {"template_matching": template_matching, "polygon_generation": polygon_generation,
+            "json_writing": json_writing, "mask_rasterization": mask_rasterization, "resizing": resizing}
+
+def measure(fn: Callable[[], int], repeats: int = 3) -> Dict[str, float]:
+    """
+    Best-of-repeats wall time and throughput, then one more run under
+    tracemalloc for the peak of Python and NumPy allocations (buffers
+    allocated inside OpenCV or PIL are not traced).
+    """
+    times = []
+    items = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            items = fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        with redirect_stdout(io.StringIO()):
+            fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(times)
+    return {
+        'items': items,
+        'best_s': best,
+        'median_s': float(np.median(times)),
+        'items_per_sec': items / best if best > 0 else 0.0,
+        'peak_mb': peak / 2 ** 20,
+    }
+
+def current_commit() -> str:
+    """Short hash of HEAD, with -dirty for uncommitted changes, or unknown outside git"""
+    root = Path(__file__).resolve().parent.parent
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+def run_benchmark(config: Dict, stages=STAGES, repeats: int = 3,
+                  work_dir: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """Build the synthetic dataset described by config and measure every stage"""
+    with tempfile.TemporaryDirectory(dir=work_dir) as root:
+        dirs = make_synthetic_dataset(os.path.join(root, "data"), **config)
+        functions = stage_functions(dirs, os.path.join(root, "output"))
+        return {stage: measure(functions[stage], repeats) for stage in stages}
+
+def load_results(path: str) -> Dict[str, Dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_results(path: str, commit: str, config: Dict, results: Dict[str, Dict[str, float]]):
+    """
+    Store results under the commit. Stages of an earlier run of the same
+    commit and config are kept unless measured again.
+    """
+    all_results = load_results(path)
+    previous = all_results.get(commit)
+    stages = dict(previous['stages']) if previous and previous['config'] == config else {}
+    stages.update(results)
+    all_results[commit] = {'timestamp': time.time(), 'config': config, 'stages': stages}
+    with open(path, 'w') as f:
+        json.dump(all_results, f, indent=2)
+
+def compare(baseline: Dict, results: Dict[str, Dict[str, float]]) -> List[str]:
+    """Speedup and memory change per stage relative to a stored baseline run"""
+    lines = []
+    for stage, current in results.items():
+        before = baseline['stages'].get(stage)
+        if before is None:
+            continue
+        speedup = before['best_s'] / current['best_s'] if current['best_s'] > 0 else float('inf')
+        lines.append(f"{stage:<20} {speedup:6.2f}x speed  "
+                     f"{current['peak_mb'] - before['peak_mb']:+8.2f} MB peak")
+    return lines
+
+# Usage example:
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the data preparation scripts on synthetic data")
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--templates", type=int, default=4)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--shapes", type=int, default=20, help="LabelMe shapes per screenshot")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--work-dir", help="Where the synthetic data is written (default: system temp)")
+    parser.add_argument("--results", default=RESULTS_FILE, help="JSON file of results keyed by commit")
+    parser.add_argument("--compare", help="Commit in the results file to compare against")
+    args = parser.parse_args()
+
+    config = {'images': args.images, 'templates': args.templates, 'width': args.width,
+              'height': args.height, 'shapes': args.shapes, 'seed': args.seed}
+    results = run_benchmark(config, args.stages, args.repeats, args.work_dir)
+    commit = current_commit()
+
+    print(f"commit {commit}, {config}")
+    print(f"{'stage':<20} {'items':>6} {'best s':>9} {'items/s':>9} {'peak MB':>9}")
+    for stage, result in results.items():
+        print(f"{stage:<20} {result['items']:>6} {result['best_s']:>9.3f} "
+              f"{result['items_per_sec']:>9.1f} {result['peak_mb']:>9.2f}")
+
+    if args.compare:
+        baseline = load_results(args.results).get(args.compare)
+        if baseline is None:
+            raise ValueError(f"No results for commit {args.compare} in {args.results}")
+        if baseline['config'] != config:
+            print(f"Warning: {args.compare} was measured with {baseline['config']}")
+        print(f"\nCompared to {args.compare}:")
+        print("\n".join(compare(baseline, results)))
+
+    save_results(args.results, commit, config, results)
+    print(f"\nResults for {commit} written to {args.results}")
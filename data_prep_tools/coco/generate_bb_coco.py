@@ -2,7 +2,6 @@ import cv2
 import numpy as np
 import os
 import json
-from pycocotools import mask as maskUtils
 
 def create_coco_annotations(screenshot_dir, template_dir, output_json):
     # Prepare COCO format data
@@ -57,7 +56,7 @@ def create_coco_annotations(screenshot_dir, template_dir, output_json):
 
                 # Create annotations for each found match
                 for pt in zip(*locations[::-1]):  # Switch columns and rows
-                    x, y = pt
+                    x, y = int(pt[0]), int(pt[1])  # np.int64 is not JSON serializable
                     w, h = template.shape[1], template.shape[0]
                     
                     # Add annotation
@@ -77,5 +76,6 @@ def create_coco_annotations(screenshot_dir, template_dir, output_json):
     with open(output_json, 'w') as f:
         json.dump(coco_format, f)
 
-# Example usage
-create_coco_annotations('path_to_screenshots', 'path_to_templates', 'annotations.json')
+if __name__ == "__main__":
+    # Example usage
+    create_coco_annotations('path_to_screenshots', 'path_to_templates', 'annotations.json')
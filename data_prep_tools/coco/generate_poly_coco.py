@@ -93,8 +93,9 @@ def create_coco_annotations(screenshot_dir, template_dir, output_json):
     with open(output_json, 'w') as f:
         json.dump(coco_format, f)
 
-# Example usage
-screenshot_dir = 'data/gog_dataset/images'
-template_dir = 'data/gog_dataset/templates'
-annotation_file = 'data/gog_dataset/codes.txt'
-create_coco_annotations(screenshot_dir, template_dir, 'annotations.json')
+if __name__ == "__main__":
+    # Example usage
+    screenshot_dir = 'data/gog_dataset/images'
+    template_dir = 'data/gog_dataset/templates'
+    annotation_file = 'data/gog_dataset/codes.txt'
+    create_coco_annotations(screenshot_dir, template_dir, 'annotations.json')
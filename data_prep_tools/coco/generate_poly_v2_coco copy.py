@@ -106,9 +106,10 @@ def create_coco_annotations(screenshot_dir, template_dir, output_json, annotated
     with open(output_json, 'w') as f:
         json.dump(coco_format, f)
 
-# Example usage
-screenshot_dir = 'data/gog_dataset/source_images'
-template_dir = 'data/gog_dataset/templates'
-annotation_file = 'data/gog_dataset/annotated_coco_v2.txt'
-annotated_dir = 'data/gog_dataset/annotated_images'
-create_coco_annotations(screenshot_dir, template_dir, annotation_file, annotated_dir)
\ No newline at end of file
+if __name__ == "__main__":
+    # Example usage
+    screenshot_dir = 'data/gog_dataset/source_images'
+    template_dir = 'data/gog_dataset/templates'
+    annotation_file = 'data/gog_dataset/annotated_coco_v2.txt'
+    annotated_dir = 'data/gog_dataset/annotated_images'
+    create_coco_annotations(screenshot_dir, template_dir, annotation_file, annotated_dir)
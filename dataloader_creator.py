@@ -3,18 +3,32 @@ import torch
 from torch.utils.data import Dataset
 import torchvision.transforms as T
 from PIL import Image
+import copy
 import json
+import os
 import numpy as np
-from typing import Tuple, Dict, List
+from typing import Tuple, Dict, List, Optional
+from shard_dataset import ShardedUIDataset
+from aspect_buckets import AspectRatioBucketSampler, BucketCollate, BUCKET_TRANSFORM, compute_aspect_ratios
+from dataloader_tuner import TUNED_CONFIG_FILE, load_tuned_config
+from augmentation import AugmentingCollate, BatchAugmenter, uint8_transform
+from phash_index import DEFAULT_MAX_DISTANCE, grouped_split
 
 class GameUIDataset(Dataset):
-    """Dataset class for game UI elements"""
+    """
+    Dataset class for game UI elements
+
+    With mask_dir set, every sample also returns the LabelMe class-id mask
+    (<image stem>_P.png) resized with nearest neighbour to the transformed image.
+    """
     
     def __init__(self, 
                  dataset_path: str,
                  transform=None,
-                 target_size: Tuple[int, int] = (800, 600)):
+                 target_size: Tuple[int, int] = (800, 600),
+                 mask_dir: Optional[str] = None):
         self.dataset_path = Path(dataset_path)
+        self.mask_dir = Path(mask_dir) if mask_dir else None
         self.transform = transform or T.Compose([
             T.Resize(target_size),
             T.ToTensor(),
@@ -37,15 +51,21 @@ class GameUIDataset(Dataset):
     
     def __len__(self) -> int:
         return len(self.samples)
+
+    def image_path(self, idx: int) -> str:
+        return self.samples[idx][0]
+
+    def get_annotations(self, idx: int) -> List[Dict]:
+        """Return a copy of the annotations of an image in absolute pixel coordinates"""
+        return [dict(ann) for ann in self.samples[idx][1]]
     
     def __getitem__(self, idx: int) -> Tuple[torch.Tensor, Dict]:
-        image_path, annotations = self.samples[idx]
-        
         # Load image
-        image = Image.open(image_path).convert('RGB')
+        image = Image.open(self.image_path(idx)).convert('RGB')
         width, height = image.size
         
         # Convert annotations to relative coordinates
+        annotations = self.get_annotations(idx)
         for ann in annotations:
             x, y, w, h = ann['bbox']
             ann['bbox'] = [x/width, y/height, w/width, h/height]
@@ -53,35 +73,367 @@ class GameUIDataset(Dataset):
         # Transform image
         if self.transform:
             image = self.transform(image)
+
+        if self.mask_dir is not None:
+            mask_path = self.mask_dir / f"{Path(self.image_path(idx)).stem}_P.png"
+            # Tensors are CHW, the uint8 arrays for augmentation HWC
+            if isinstance(image, torch.Tensor):
+                mask_height, mask_width = image.shape[-2:]
+            elif isinstance(image, np.ndarray):
+                mask_height, mask_width = image.shape[:2]
+            else:
+                mask_width, mask_height = image.size
+            mask = Image.open(mask_path).resize((mask_width, mask_height), Image.NEAREST)
+            return image, annotations, np.asarray(mask)
             
         return image, annotations
 
+class COCOUIDataset(Dataset):
+    """
+    Dataset reading the single COCO JSON written by data_prep_tools/coco.
+
+    Annotations are stored in flat arrays sorted by image, so looking up the
+    annotations of an image is an O(1) slice. The parsed index is cached next
+    to the JSON file (``<annotation_file>.index.npz``) and reused as long as
+    the JSON file is unchanged.
+    """
+
+    INDEX_VERSION = 1
+
+    def __init__(self,
+                 annotation_file: str,
+                 image_dir: str,
+                 transform=None,
+                 target_size: Tuple[int, int] = (800, 600),
+                 cache_index: bool = True):
+        self.annotation_file = Path(annotation_file)
+        self.image_dir = Path(image_dir)
+        self.transform = transform or T.Compose([
+            T.Resize(target_size),
+            T.ToTensor(),
+            T.Normalize(mean=[0.485, 0.456, 0.406],
+                       std=[0.229, 0.224, 0.225])
+        ])
+
+        index = self._load_index(cache_index)
+        self.image_ids = index['image_ids']
+        self.file_names = index['file_names']
+        self.image_sizes = index['image_sizes']
+        self.ann_range = index['ann_range']
+        self.ann_ids = index['ann_ids']
+        self.ann_category = index['ann_category']
+        self.ann_bbox = index['ann_bbox']
+        self.ann_area = index['ann_area']
+        self.ann_iscrowd = index['ann_iscrowd']
+        self.poly_range = index['poly_range']
+        self.coord_start = index['coord_start']
+        self.seg_coords = index['seg_coords']
+
+        # Lookup tables (image_id -> row, category id <-> name)
+        self.image_index = {int(image_id): row for row, image_id in enumerate(self.image_ids)}
+        self.category_names = {int(cat_id): str(name) for cat_id, name
+                               in zip(index['cat_ids'], index['cat_names'])}
+        self.categories = {name: cat_id for cat_id, name in self.category_names.items()}
+
+    @property
+    def index_path(self) -> Path:
+        return self.annotation_file.with_name(self.annotation_file.name + ".index.npz")
+
+    def _source_fingerprint(self) -> np.ndarray:
+        stat = os.stat(self.annotation_file)
+        return np.array([self.INDEX_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+    def _load_index(self, cache_index: bool) -> Dict[str, np.ndarray]:
+        """Load the cached binary index, rebuilding it when the JSON changed"""
+        fingerprint = self._source_fingerprint()
+        if cache_index and self.index_path.exists():
+            try:
+                with np.load(self.index_path, allow_pickle=False) as cached:
+                    if np.array_equal(cached['fingerprint'], fingerprint):
+                        return {key: cached[key] for key in cached.files}
+            except (OSError, ValueError, KeyError):
+                pass  # Corrupt or outdated cache, rebuild below
+
+        index = self._build_index()
+        if cache_index:
+            # Write to a temporary file first so concurrent readers never see a partial index
+            tmp_path = self.index_path.with_name(self.index_path.name + f".{os.getpid()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, fingerprint=fingerprint, **index)
+            os.replace(tmp_path, self.index_path)
+        return index
+
+    def _build_index(self) -> Dict[str, np.ndarray]:
+        """Parse the COCO JSON into flat, image-sorted arrays"""
+        with open(self.annotation_file) as f:
+            coco = json.load(f)
+
+        images = sorted(coco.get('images', []), key=lambda img: img['id'])
+        image_ids = np.array([img['id'] for img in images], dtype=np.int64)
+        file_names = np.array([img['file_name'] for img in images], dtype=str)
+        # Some generators do not record the image size, -1 marks it unknown
+        image_sizes = np.array([(img.get('width', -1), img.get('height', -1)) for img in images],
+                               dtype=np.int32).reshape(-1, 2)
+
+        categories = coco.get('categories', [])
+        cat_ids = np.array([cat['id'] for cat in categories], dtype=np.int64)
+        cat_names = np.array([cat['name'] for cat in categories], dtype=str)
+
+        annotations = coco.get('annotations', [])
+        num_anns = len(annotations)
+        ann_image = np.empty(num_anns, dtype=np.int64)
+        ann_ids = np.empty(num_anns, dtype=np.int64)
+        ann_category = np.empty(num_anns, dtype=np.int64)
+        ann_bbox = np.empty((num_anns, 4), dtype=np.float32)
+        ann_area = np.empty(num_anns, dtype=np.float32)
+        ann_iscrowd = np.empty(num_anns, dtype=np.uint8)
+        polygons_per_ann = np.zeros(num_anns, dtype=np.int64)
+        polygons = []
+
+        for i, ann in enumerate(annotations):
+            ann_image[i] = ann['image_id']
+            # The resize generator does not write annotation ids
+            ann_ids[i] = ann.get('id', i + 1)
+            ann_category[i] = ann['category_id']
+            ann_iscrowd[i] = ann.get('iscrowd', 0)
+
+            segmentation = ann.get('segmentation') or []
+            if isinstance(segmentation, list):
+                for polygon in segmentation:
+                    polygons.append(np.asarray(polygon, dtype=np.float32))
+                polygons_per_ann[i] = len(segmentation)
+
+            if 'bbox' in ann:
+                ann_bbox[i] = ann['bbox']
+            elif polygons_per_ann[i]:
+                # Polygon generators only write the segmentation, derive the box from it
+                points = np.concatenate(polygons[-polygons_per_ann[i]:]).reshape(-1, 2)
+                x_min, y_min = points.min(axis=0)
+                x_max, y_max = points.max(axis=0)
+                ann_bbox[i] = [x_min, y_min, x_max - x_min, y_max - y_min]
+            else:
+                ann_bbox[i] = 0
+            ann_area[i] = ann.get('area', ann_bbox[i, 2] * ann_bbox[i, 3])
+
+        # Flatten polygons: annotation -> polygon range -> coordinate range
+        poly_start = np.zeros(num_anns + 1, dtype=np.int64)
+        np.cumsum(polygons_per_ann, out=poly_start[1:])
+        coord_start = np.zeros(len(polygons) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in polygons], out=coord_start[1:])
+        seg_coords = np.concatenate(polygons) if polygons else np.empty(0, dtype=np.float32)
+
+        # Sort annotations by image so every image owns a contiguous range,
+        # polygons stay in file order and are reached through poly_range
+        order = np.argsort(ann_image, kind='stable')
+        ann_image = ann_image[order]
+        ann_range = np.stack([np.searchsorted(ann_image, image_ids, side='left'),
+                              np.searchsorted(ann_image, image_ids, side='right')], axis=1)
+        poly_range = np.stack([poly_start[:-1], poly_start[1:]], axis=1)[order]
+
+        return {
+            'image_ids': image_ids,
+            'file_names': file_names,
+            'image_sizes': image_sizes,
+            'ann_range': ann_range,
+            'ann_ids': ann_ids[order],
+            'ann_category': ann_category[order],
+            'ann_bbox': ann_bbox[order],
+            'ann_area': ann_area[order],
+            'ann_iscrowd': ann_iscrowd[order],
+            'poly_range': poly_range,
+            'coord_start': coord_start,
+            'seg_coords': seg_coords,
+            'cat_ids': cat_ids,
+            'cat_names': cat_names,
+        }
+
+    def __len__(self) -> int:
+        return len(self.image_ids)
+
+    def image_path(self, idx: int) -> str:
+        return str(self.image_dir / self.file_names[idx])
+
+    def annotation_range(self, image_id: int) -> Tuple[int, int]:
+        """Return the [start, end) slice of the annotation arrays for an image id"""
+        start, end = self.ann_range[self.image_index[image_id]]
+        return int(start), int(end)
+
+    def get_annotations(self, idx: int) -> List[Dict]:
+        """Return the annotations of an image in absolute pixel coordinates"""
+        start, end = self.ann_range[idx]
+        annotations = []
+        for i in range(start, end):
+            ann = {
+                'id': int(self.ann_ids[i]),
+                'bbox': self.ann_bbox[i].tolist(),
+                'category_id': int(self.ann_category[i]),
+                'area': float(self.ann_area[i]),
+                'iscrowd': int(self.ann_iscrowd[i])
+            }
+            poly_begin, poly_end = self.poly_range[i]
+            if poly_end > poly_begin:
+                ann['segmentation'] = [
+                    self.seg_coords[self.coord_start[p]:self.coord_start[p + 1]].tolist()
+                    for p in range(poly_begin, poly_end)
+                ]
+            annotations.append(ann)
+        return annotations
+
+    def __getitem__(self, idx: int) -> Tuple[torch.Tensor, List[Dict]]:
+        image = Image.open(self.image_path(idx)).convert('RGB')
+        width, height = image.size
+
+        # Convert annotations to relative coordinates
+        annotations = self.get_annotations(idx)
+        for ann in annotations:
+            x, y, w, h = ann['bbox']
+            ann['bbox'] = [x/width, y/height, w/width, h/height]
+
+        if self.transform:
+            image = self.transform(image)
+
+        return image, annotations
+
+def collate_detections(batch: List[Tuple[torch.Tensor, List[Dict]]]) -> Tuple[torch.Tensor, List[List[Dict]]]:
+    """Stack images (and masks, if present) and keep the variable-length annotation lists as a list"""
+    images = torch.stack([sample[0] for sample in batch])
+    annotations = [sample[1] for sample in batch]
+    if len(batch[0]) > 2:
+        masks = torch.from_numpy(np.stack([sample[2] for sample in batch]))
+        return images, annotations, masks
+    return images, annotations
+
 def create_dataloaders(dataset_path: str,
-                      batch_size: int = 8,
-                      num_workers: int = 4) -> Tuple[torch.utils.data.DataLoader, 
+                      batch_size: Optional[int] = None,
+                      num_workers: Optional[int] = None,
+                      backend: str = "folder",
+                      annotation_file: Optional[str] = None,
+                      bucketed: bool = False,
+                      augment: bool = False,
+                      loader_config: Optional[str] = None,
+                      split: str = "random",
+                      dedup_distance: int = DEFAULT_MAX_DISTANCE,
+                      seed: Optional[int] = None) -> Tuple[torch.utils.data.DataLoader, 
                                                    torch.utils.data.DataLoader]:
-    """Create training and validation dataloaders"""
+    """
+    Create training and validation dataloaders
+
+    backend "folder" reads the DatasetCreator layout (categories.json plus one
+    annotation JSON per image), "coco" reads the images in dataset_path with the
+    single COCO annotation_file written by data_prep_tools/coco and "shards"
+    streams the shards written by shard_dataset.pack_shards from dataset_path.
+
+    With bucketed=True images keep their aspect ratio: batches are grouped by
+    aspect ratio bucket and letterboxed to a bucket-specific shape instead of
+    being stretched to a single target size.
+
+    With augment=True training batches go through augmentation.BatchAugmenter,
+    which augments whole uint8 batches at once inside the loader workers.
+
+    Loader settings not passed explicitly come from loader_config (by default
+    the dataloader_config.json written by dataloader_tuner into dataset_path),
+    falling back to batch_size=8 and num_workers=4.
+
+    split "random" splits images 80/20 at random; "grouped" keeps every group
+    of near-duplicate screenshots (perceptual-hash distance <= dedup_distance)
+    on the same side, so validation does not score frames seen in training.
+
+    seed makes the split, the training order and the augmentations
+    reproducible; every loader worker augments with its own generator either way.
+    """
+    tuned = load_tuned_config(loader_config or str(Path(dataset_path) / TUNED_CONFIG_FILE))
+    batch_size = batch_size or tuned.get('batch_size', 8)
+    num_workers = num_workers if num_workers is not None else tuned.get('num_workers', 4)
+    loader_kwargs = {'num_workers': num_workers, 'pin_memory': tuned.get('pin_memory', False)}
+    if num_workers > 0:
+        loader_kwargs['prefetch_factor'] = tuned.get('prefetch_factor', 2)
+        loader_kwargs['persistent_workers'] = tuned.get('persistent_workers', False)
     
     # Split dataset into train/val
-    dataset = GameUIDataset(dataset_path)
-    train_size = int(0.8 * len(dataset))
-    val_size = len(dataset) - train_size
-    train_dataset, val_dataset = torch.utils.data.random_split(
-        dataset, [train_size, val_size])
+    if (bucketed or augment) and backend == "shards":
+        raise ValueError("Bucketed batching and augmentation need a map-style backend (folder or coco)")
+    if split != "random" and backend == "shards":
+        raise ValueError("Shards are split at pack time, pass split to shard_dataset.pack_shards")
+    if bucketed and augment:
+        raise ValueError("Augmentation works on fixed-size batches and cannot be combined with bucketed")
+    transform = BUCKET_TRANSFORM if bucketed else None
+    generator = torch.Generator().manual_seed(seed) if seed is not None else None
+    sampler_seed = seed if seed is not None else 0
+
+    if backend == "shards":
+        # Shards are split at pack time and shuffle themselves while streaming
+        train_dataset = ShardedUIDataset(dataset_path, split="train", seed=sampler_seed)
+        val_dataset = ShardedUIDataset(dataset_path, split="val", shuffle=False)
+    else:
+        if backend == "folder":
+            dataset = GameUIDataset(dataset_path, transform=transform)
+        elif backend == "coco":
+            if annotation_file is None:
+                raise ValueError("The coco backend requires an annotation_file")
+            dataset = COCOUIDataset(annotation_file, dataset_path, transform=transform)
+        else:
+            raise ValueError(f"Unknown dataset backend: {backend}")
+        if split == "random":
+            train_size = int(0.8 * len(dataset))
+            val_size = len(dataset) - train_size
+            train_dataset, val_dataset = torch.utils.data.random_split(
+                dataset, [train_size, val_size],
+                generator=generator if generator is not None else torch.default_generator)
+        elif split == "grouped":
+            train_indices, val_indices = grouped_split(
+                [dataset.image_path(i) for i in range(len(dataset))], 0.2, dedup_distance, sampler_seed)
+            train_dataset = torch.utils.data.Subset(dataset, train_indices)
+            val_dataset = torch.utils.data.Subset(dataset, val_indices)
+        else:
+            raise ValueError(f"Unknown split: {split}")
+
+        if augment:
+            # Training samples stay uint8 until the batch has been augmented
+            train_source = copy.copy(dataset)
+            train_source.transform = uint8_transform()
+            train_dataset = torch.utils.data.Subset(train_source, train_dataset.indices)
     
     # Create dataloaders
+    if bucketed:
+        collate = BucketCollate()
+        train_loader = torch.utils.data.DataLoader(
+            train_dataset,
+            batch_sampler=AspectRatioBucketSampler(compute_aspect_ratios(train_dataset), batch_size,
+                                                   seed=sampler_seed),
+            collate_fn=collate,
+            **loader_kwargs
+        )
+        val_loader = torch.utils.data.DataLoader(
+            val_dataset,
+            batch_sampler=AspectRatioBucketSampler(compute_aspect_ratios(val_dataset), batch_size,
+                                                   shuffle=False),
+            collate_fn=collate,
+            **loader_kwargs
+        )
+        return train_loader, val_loader
+
+    if augment:
+        collate = AugmentingCollate(BatchAugmenter(seed=seed))
+        # Reseeds the augmenter in every worker as it starts (every epoch unless workers persist)
+        train_kwargs = dict(loader_kwargs, worker_init_fn=collate.seed_worker)
+    else:
+        collate = collate_detections
+        train_kwargs = loader_kwargs
     train_loader = torch.utils.data.DataLoader(
         train_dataset,
         batch_size=batch_size,
-        shuffle=True,
-        num_workers=num_workers
+        shuffle=backend != "shards",
+        collate_fn=collate,
+        generator=generator,
+        **train_kwargs
     )
     
     val_loader = torch.utils.data.DataLoader(
         val_dataset,
         batch_size=batch_size,
         shuffle=False,
-        num_workers=num_workers
+        collate_fn=collate_detections,
+        **loader_kwargs
     )
     
     return train_loader, val_loader
\ No newline at end of file
@@ -0,0 +1,229 @@
+from pathlib import Path
+import io
+import json
+import os
+import random
+import time
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+from PIL import Image
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+TUNED_CONFIG_FILE = "dataloader_config.json"
+STAGES = ("read", "decode", "transform", "collate")
+
+class StageTimedDataset(Dataset):
+    """
+    Wraps a GameUIDataset or COCOUIDataset and times the read, decode and
+    transform stage of every sample. Timings travel with the sample, so they
+    are collected from worker processes as well.
+    """
+
+    def __init__(self, dataset, indices: Optional[Sequence[int]] = None):
+        self.dataset = dataset
+        self.indices = list(indices) if indices is not None else list(range(len(dataset)))
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, idx: int):
+        idx = self.indices[idx]
+        start = time.perf_counter()
+
+        with open(self.dataset.image_path(idx), 'rb') as f:
+            data = f.read()
+        read_done = time.perf_counter()
+
+        image = Image.open(io.BytesIO(data)).convert('RGB')
+        decode_done = time.perf_counter()
+
+        width, height = image.size
+        annotations = self.dataset.get_annotations(idx)
+        for ann in annotations:
+            x, y, w, h = ann['bbox']
+            ann['bbox'] = [x/width, y/height, w/width, h/height]
+        if self.dataset.transform:
+            image = self.dataset.transform(image)
+        transform_done = time.perf_counter()
+
+        timings = (read_done - start, decode_done - read_done, transform_done - decode_done)
+        return image, annotations, timings
+
+class TimedCollate:
+    """Collate wrapper separating per-sample timings and timing the collate itself"""
+
+    def __init__(self, collate_fn: Callable):
+        self.collate_fn = collate_fn
+
+    def __call__(self, batch):
+        start = time.perf_counter()
+        collated = self.collate_fn([(image, annotations) for image, annotations, _ in batch])
+        stage_times = np.sum([timings for _, _, timings in batch], axis=0).tolist()
+        stage_times.append(time.perf_counter() - start)
+        return collated, stage_times
+
+def _loader_kwargs(config: Dict) -> Dict:
+    kwargs = {
+        'num_workers': config['num_workers'],
+        'pin_memory': config['pin_memory'],
+    }
+    # prefetch_factor and persistent_workers are only valid with worker processes
+    if config['num_workers'] > 0:
+        kwargs['prefetch_factor'] = config['prefetch_factor']
+        kwargs['persistent_workers'] = config['persistent_workers']
+    return kwargs
+
+def benchmark_loader(dataset,
+                     config: Dict,
+                     num_batches: int = 20,
+                     epochs: int = 2,
+                     bucketed: bool = False,
+                     seed: int = 0) -> Dict:
+    """
+    Measure samples/sec of a DataLoader configuration on a sample of dataset.
+
+    Several short epochs are run so worker startup and persistent workers are
+    part of the measurement. Stage times are summed over all workers and
+    reported per sample.
+    """
+    from dataloader_creator import collate_detections
+    from aspect_buckets import AspectRatioBucketSampler, BucketCollate, compute_aspect_ratios
+
+    num_samples = min(len(dataset), num_batches * config['batch_size'])
+    indices = random.Random(seed).sample(range(len(dataset)), num_samples)
+    timed_dataset = StageTimedDataset(dataset, indices)
+
+    if bucketed:
+        ratios = compute_aspect_ratios(dataset)[indices]
+        loader = DataLoader(timed_dataset,
+                            batch_sampler=AspectRatioBucketSampler(ratios, config['batch_size']),
+                            collate_fn=TimedCollate(BucketCollate()),
+                            **_loader_kwargs(config))
+    else:
+        loader = DataLoader(timed_dataset,
+                            batch_size=config['batch_size'],
+                            shuffle=True,
+                            collate_fn=TimedCollate(collate_detections),
+                            **_loader_kwargs(config))
+
+    stage_totals = np.zeros(len(STAGES))
+    wait_time = 0.0
+    samples = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        batch_start = time.perf_counter()
+        for (images, _), stage_times in loader:
+            # Time the main process spends blocked on the loader
+            wait_time += time.perf_counter() - batch_start
+            stage_totals += stage_times
+            samples += images.shape[0]
+            batch_start = time.perf_counter()
+    elapsed = time.perf_counter() - start
+
+    # Shut down persistent workers before the next configuration starts its own
+    del loader
+
+    result = dict(config)
+    result['samples_per_sec'] = samples / elapsed if elapsed > 0 else 0.0
+    result['wait_fraction'] = wait_time / elapsed if elapsed > 0 else 0.0
+    result['stage_ms_per_sample'] = {stage: 1000 * total / max(samples, 1)
+                                     for stage, total in zip(STAGES, stage_totals)}
+    return result
+
+def tune_dataloader(dataset,
+                    worker_counts: Optional[Sequence[int]] = None,
+                    batch_sizes: Sequence[int] = (4, 8, 16, 32),
+                    prefetch_factors: Sequence[int] = (2, 4, 8),
+                    num_batches: int = 20,
+                    bucketed: bool = False,
+                    on_result: Optional[Callable[[Dict], None]] = None) -> Tuple[Dict, List[Dict]]:
+    """
+    Sweep DataLoader settings one dimension at a time, keeping the best value of
+    each dimension before moving to the next. Returns the best configuration and
+    every benchmark result; on_result is called with each result as it is
+    measured, e.g. to print progress.
+    """
+    if worker_counts is None:
+        cpus = os.cpu_count() or 1
+        worker_counts = sorted({0, 1, 2, 4, 8, cpus} & set(range(cpus + 1)))
+
+    best = {
+        'batch_size': 8,
+        'num_workers': 4 if 4 in worker_counts else max(worker_counts),
+        'prefetch_factor': 2,
+        'pin_memory': False,
+        'persistent_workers': False,
+    }
+    sweeps = [
+        ('num_workers', list(worker_counts)),
+        ('batch_size', list(batch_sizes)),
+        ('prefetch_factor', list(prefetch_factors)),
+        ('pin_memory', [False, True] if torch.cuda.is_available() else [False]),
+        ('persistent_workers', [False, True]),
+    ]
+
+    results = []
+    best_rate = 0.0
+    for key, values in sweeps:
+        if len(values) < 2:
+            continue
+        if best['num_workers'] == 0 and key in ('prefetch_factor', 'persistent_workers'):
+            continue
+        for value in values:
+            config = dict(best, **{key: value})
+            result = benchmark_loader(dataset, config, num_batches=num_batches, bucketed=bucketed)
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+            if result['samples_per_sec'] > best_rate:
+                best_rate = result['samples_per_sec']
+                best = config
+
+    return best, results
+
+def format_result(result: Dict) -> str:
+    stages = ", ".join(f"{stage} {ms:.2f}" for stage, ms in result['stage_ms_per_sample'].items())
+    return (f"workers={result['num_workers']:<2} batch={result['batch_size']:<3} "
+            f"prefetch={result['prefetch_factor']} pin={int(result['pin_memory'])} "
+            f"persistent={int(result['persistent_workers'])}: "
+            f"{result['samples_per_sec']:8.1f} samples/s, wait {100 * result['wait_fraction']:.0f}% "
+            f"(ms/sample: {stages})")
+
+def save_tuned_config(config: Dict, path: str):
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+
+def load_tuned_config(path: str) -> Dict:
+    """Load a configuration written by save_tuned_config, empty when it does not exist"""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+# Usage example:
+if __name__ == "__main__":
+    import argparse
+    from dataloader_creator import GameUIDataset, COCOUIDataset
+    from aspect_buckets import BUCKET_TRANSFORM
+
+    parser = argparse.ArgumentParser(description="Benchmark and tune DataLoader settings for a dataset")
+    parser.add_argument("dataset_path")
+    parser.add_argument("--annotation-file", help="COCO JSON, tunes the coco backend instead of the folder layout")
+    parser.add_argument("--bucketed", action="store_true")
+    parser.add_argument("--num-batches", type=int, default=20)
+    parser.add_argument("--output", help=f"Defaults to <dataset_path>/{TUNED_CONFIG_FILE}")
+    args = parser.parse_args()
+
+    transform = BUCKET_TRANSFORM if args.bucketed else None
+    if args.annotation_file:
+        dataset = COCOUIDataset(args.annotation_file, args.dataset_path, transform=transform)
+    else:
+        dataset = GameUIDataset(args.dataset_path, transform=transform)
+
+    best, _ = tune_dataloader(dataset, num_batches=args.num_batches, bucketed=args.bucketed,
+                              on_result=lambda result: print(format_result(result)))
+    output = args.output or str(Path(args.dataset_path) / TUNED_CONFIG_FILE)
+    save_tuned_config(best, output)
+    print(f"\nBest configuration written to {output}: {best}")
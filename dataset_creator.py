@@ -1,14 +1,277 @@
+from dataclasses import dataclass, replace
 from pathlib import Path
 import json
+import time
 import cv2
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import os
+from phash_index import DEFAULT_MAX_DISTANCE, INDEX_FILE, PerceptualHashIndex
+
+WINDOW_NAME = 'Annotation Tool'
+BOX_COLOR = (0, 255, 0)
+PRE_LABEL_COLOR = (0, 200, 255)
+SELECTED_COLOR = (255, 255, 0)
+RUBBER_BAND_COLOR = (0, 255, 0)
+THICKNESS = 2
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.5
+STATUS_HEIGHT = 24
+MIN_BOX_SIZE = 4
+
+@dataclass(frozen=True, eq=False)
+class Box:
+    """One annotation on the canvas, compared by identity so the undo history can share them"""
+    x: int
+    y: int
+    width: int
+    height: int
+    category_id: int
+    pre_label: bool = False
+
+    def contains(self, x: int, y: int) -> bool:
+        return self.x <= x <= self.x + self.width and self.y <= y <= self.y + self.height
+
+class AnnotationCanvas:
+    """
+    Box annotation window for one image.
+
+    The screen buffer is the image with the boxes drawn on it plus a status
+    bar. Every change redraws only its dirty rectangles from the untouched
+    image: the rubber band while dragging erases just its previous outline,
+    and undo restores the previous box list from memory.
+
+    Mouse: drag to draw a box in the current category, click a box to
+    select it. Keys: 1-9 and 0 pick the 1st-10th category (relabeling the
+    selected box), tab cycles through all categories, d or backspace
+    deletes the selected box, c undoes the last change, q finishes.
+    Pre-labels are drawn in orange until relabeled.
+    """
+
+    def __init__(self, image: np.ndarray, categories: Dict[str, int], annotations: Optional[List[Dict]] = None):
+        self.image = image
+        self.height, self.width = image.shape[:2]
+        self.category_ids = sorted(categories.values())
+        self.names = {category_id: name for name, category_id in categories.items()}
+        self.label_sizes = {category_id: cv2.getTextSize(name, FONT, FONT_SCALE, 1)[0]
+                            for category_id, name in self.names.items()}
+        self.category = self.category_ids[0]
+
+        self.boxes: List[Box] = []
+        for ann in annotations or []:
+            x, y, w, h = (int(round(v)) for v in ann['bbox'])
+            self.boxes.append(Box(x, y, w, h, ann['category_id'], pre_label=True))
+        self.history: List[List[Box]] = []
+        self.selected: Optional[Box] = None
+
+        self.drag_start: Optional[Tuple[int, int]] = None
+        self.band: Optional[Tuple[int, int, int, int]] = None
+        self.done = False
+        self.started = time.monotonic()
+        self.initial_boxes = list(self.boxes)
+        self.drawn = 0
+        self.relabeled = 0
+        self.undos = 0
+
+        self.canvas = np.empty((self.height + STATUS_HEIGHT, self.width, 3), dtype=np.uint8)
+        self.canvas[:self.height] = image
+        for box in self.boxes:
+            self._draw_box(self.canvas, box, 0, 0)
+        self._draw_status()
+        self.dirty = True
+
+    def _color(self, box: Box) -> Tuple[int, int, int]:
+        if box is self.selected:
+            return SELECTED_COLOR
+        return PRE_LABEL_COLOR if box.pre_label else BOX_COLOR
+
+    def _box_rect(self, box: Box) -> Tuple[int, int, int, int]:
+        """Pixels covered by a box outline and its label"""
+        label_w, label_h = self.label_sizes.get(box.category_id, (0, 0))
+        return (box.x - THICKNESS, box.y - label_h - 6 - THICKNESS,
+                box.x + max(box.width, label_w) + THICKNESS + 1, box.y + box.height + THICKNESS + 1)
+
+    def _draw_box(self, view: np.ndarray, box: Box, x0: int, y0: int):
+        """Draw a box onto view, whose top left corner is (x0, y0) of the image"""
+        x, y = box.x - x0, box.y - y0
+        color = self._color(box)
+        cv2.rectangle(view, (x, y), (x + box.width, y + box.height), color, THICKNESS)
+        cv2.putText(view, self.names.get(box.category_id, str(box.category_id)),
+                    (x, y - 4), FONT, FONT_SCALE, color, 1, cv2.LINE_AA)
+
+    def _refresh(self, rect: Tuple[int, int, int, int]):
+        """Redraw one dirty rectangle of the image from the original pixels and the boxes over it"""
+        x1, y1 = max(rect[0], 0), max(rect[1], 0)
+        x2, y2 = min(rect[2], self.width), min(rect[3], self.height)
+        if x1 >= x2 or y1 >= y2:
+            return
+        view = self.canvas[y1:y2, x1:x2]
+        view[:] = self.image[y1:y2, x1:x2]
+        boxes = [box for box in self.boxes if box is not self.selected]
+        if self.selected is not None:
+            boxes.append(self.selected)   # Selected box on top
+        for box in boxes:
+            bx1, by1, bx2, by2 = self._box_rect(box)
+            if bx1 < x2 and bx2 > x1 and by1 < y2 and by2 > y1:
+                self._draw_box(view, box, x1, y1)
+        if self.band is not None:
+            bx1, by1, bx2, by2 = self.band
+            cv2.rectangle(view, (bx1 - x1, by1 - y1), (bx2 - x1, by2 - y1), RUBBER_BAND_COLOR, THICKNESS)
+        self.dirty = True
+
+    def _band_strips(self, band: Tuple[int, int, int, int]) -> List[Tuple[int, int, int, int]]:
+        """The four thin rectangles covering a rubber band outline"""
+        x1, y1, x2, y2 = min(band[0], band[2]), min(band[1], band[3]), max(band[0], band[2]), max(band[1], band[3])
+        pad = THICKNESS + 1
+        return [(x1 - pad, y1 - pad, x2 + pad, y1 + pad), (x1 - pad, y2 - pad, x2 + pad, y2 + pad),
+                (x1 - pad, y1 - pad, x1 + pad, y2 + pad), (x2 - pad, y1 - pad, x2 + pad, y2 + pad)]
+
+    def _draw_status(self):
+        bar = self.canvas[self.height:]
+        bar[:] = 32
+        pre_labels = sum(box.pre_label for box in self.boxes)
+        key = self.category_ids.index(self.category) + 1
+        text = (f"[{key % 10 if key <= 10 else 'tab'}] {self.names[self.category]} | "
+                f"{len(self.boxes)} boxes, {pre_labels} pre-labels | "
+                f"1-9/0/tab category  click select  d delete  c undo  q done")
+        cv2.putText(bar, text, (6, STATUS_HEIGHT - 7), FONT, FONT_SCALE, (255, 255, 255), 1, cv2.LINE_AA)
+        self.dirty = True
+
+    def _set_boxes(self, boxes: List[Box]):
+        """Replace the box list, keeping the old one for undo and redrawing only what changed"""
+        self.history.append(self.boxes)
+        self._apply(boxes)
+
+    def _apply(self, boxes: List[Box]):
+        old = self.boxes
+        changed = set(old).symmetric_difference(boxes)
+        self.boxes = boxes
+        if self.selected is not None and self.selected not in boxes:
+            changed.add(self.selected)
+            self.selected = None
+        for box in changed:
+            self._refresh(self._box_rect(box))
+        self._draw_status()
+
+    def _select(self, box: Optional[Box]):
+        previous, self.selected = self.selected, box
+        for changed in (previous, box):
+            if changed is not None:
+                self._refresh(self._box_rect(changed))
+
+    def _clamp(self, x: int, y: int) -> Tuple[int, int]:
+        return min(max(x, 0), self.width - 1), min(max(y, 0), self.height - 1)
+
+    def on_mouse(self, event, x, y, flags, param):
+        if event == cv2.EVENT_LBUTTONDOWN:
+            self.drag_start = self._clamp(x, y)
+
+        elif event == cv2.EVENT_MOUSEMOVE and self.drag_start is not None:
+            old_band = self.band
+            self.band = (*self.drag_start, *self._clamp(x, y))
+            strips = self._band_strips(old_band) if old_band else []
+            for strip in strips + self._band_strips(self.band):
+                self._refresh(strip)
+
+        elif event == cv2.EVENT_LBUTTONUP and self.drag_start is not None:
+            (start_x, start_y), (end_x, end_y) = self.drag_start, self._clamp(x, y)
+            old_band, self.band, self.drag_start = self.band, None, None
+            if old_band is not None:
+                for strip in self._band_strips(old_band):
+                    self._refresh(strip)
+
+            width, height = abs(end_x - start_x), abs(end_y - start_y)
+            if width < MIN_BOX_SIZE or height < MIN_BOX_SIZE:
+                # A click: select the topmost box under the cursor
+                self._select(next((box for box in reversed(self.boxes) if box.contains(end_x, end_y)), None))
+                return
+            box = Box(min(start_x, end_x), min(start_y, end_y), width, height, self.category)
+            self.drawn += 1
+            self._set_boxes(self.boxes + [box])
+            self._select(box)
+
+    def on_key(self, key: int):
+        if key == ord('q'):
+            self.done = True
+        elif ord('0') <= key <= ord('9'):
+            index = (key - ord('1')) % 10
+            if index < len(self.category_ids):
+                self._pick_category(self.category_ids[index])
+        elif key == 9:   # Tab
+            index = self.category_ids.index(self.category)
+            self._pick_category(self.category_ids[(index + 1) % len(self.category_ids)])
+        elif key in (ord('d'), 8) and self.selected is not None:
+            self._set_boxes([box for box in self.boxes if box is not self.selected])
+        elif key == ord('c') and self.history:
+            self.undos += 1
+            self._apply(self.history.pop())
+
+    def _pick_category(self, category_id: int):
+        """Make category_id current, relabeling the selected box"""
+        self.category = category_id
+        if self.selected is not None and (self.selected.category_id != category_id or self.selected.pre_label):
+            box = replace(self.selected, category_id=category_id, pre_label=False)
+            self.relabeled += 1
+            self._set_boxes([box if b is self.selected else b for b in self.boxes])
+            self._select(box)
+        self._draw_status()
+
+    def annotations(self) -> List[Dict]:
+        return [{
+            'bbox': [box.x, box.y, box.width, box.height],
+            'category_id': box.category_id,
+            'area': box.width * box.height,
+            'iscrowd': 0
+        } for box in self.boxes]
+
+    def stats(self) -> Dict[str, float]:
+        """What the labeler did: boxes drawn, relabels, undos, pre-labels kept as proposed and time spent"""
+        kept = sum(box in self.boxes for box in self.initial_boxes)
+        return {
+            'boxes': len(self.boxes),
+            'drawn': self.drawn,
+            'pre_labels': len(self.initial_boxes),
+            'pre_labels_kept': kept,
+            'relabeled': self.relabeled,
+            'undos': self.undos,
+            'seconds': time.monotonic() - self.started,
+        }
+
+    def run(self) -> List[Dict]:
+        """Show the window until q is pressed and return the annotations"""
+        cv2.namedWindow(WINDOW_NAME)
+        cv2.setMouseCallback(WINDOW_NAME, self.on_mouse)
+        while not self.done:
+            if self.dirty:
+                cv2.imshow(WINDOW_NAME, self.canvas)
+                self.dirty = False
+            key = cv2.waitKey(15) & 0xFF
+            if key != 0xFF:
+                self.on_key(key)
+        cv2.destroyWindow(WINDOW_NAME)
+        return self.annotations()
+
 
 class DatasetCreator:
     """Helper class for creating and managing the UI element detection dataset"""
     
-    def __init__(self, base_path: str):
+    def __init__(self,
+                 base_path: str,
+                 pre_labeler=None,
+                 pre_label_threshold: float = 0.5,
+                 window_manager=None,
+                 dedup_distance: Optional[int] = None):
+        """
+        pre_labeler proposes boxes for annotate_image: an ElementDetector,
+        ElementTracker or DetectionClient (detect_elements), or a detection
+        backend such as TemplateMatchingBackend (detect).
+
+        window_manager (core.window_manager.WindowManager) is used by
+        capture_and_save_screenshot. With dedup_distance set, screenshots
+        within that perceptual-hash distance of an image already in the
+        dataset are not saved (see phash_index). The index is built on the
+        first save and written every index_save_every new images and on flush.
+        """
         self.base_path = Path(base_path)
         self.images_path = self.base_path / "images"
         self.annotations_path = self.base_path / "annotations"
@@ -37,103 +300,190 @@ class DatasetCreator:
         with open(self.categories_path, 'w') as f:
             json.dump(self.categories, f, indent=2)
 
-    def capture_and_save_screenshot(self, window_title: str) -> str:
-        """Capture game window screenshot and save it"""
-        # Implementation depends on your window capture method
-        pass
+        self.pre_labeler = pre_labeler
+        self.pre_label_threshold = pre_label_threshold
+        self.last_session_stats: Dict[str, float] = {}
+        self.window_manager = window_manager
+
+        self.dedup_distance = dedup_distance
+        self.dedup_index: Optional[PerceptualHashIndex] = None
+        self.dedup_index_path = self.base_path / INDEX_FILE
+        self.index_save_every = 50
+        self.unsaved_hashes = 0
+        self.skipped_duplicates = 0
+
+    def _load_dedup_index(self) -> PerceptualHashIndex:
+        if self.dedup_index_path.exists():
+            self.dedup_index = PerceptualHashIndex.load(self.dedup_index_path, self.dedup_distance)
+        else:
+            self.dedup_index = PerceptualHashIndex(self.dedup_distance)
+        # Images saved after the last index write, or added by other tools
+        self.unsaved_hashes = self.dedup_index.update_from_directory(self.images_path)
+        return self.dedup_index
+
+    def save_screenshot(self, image: np.ndarray, name: str) -> Optional[Path]:
+        """
+        Save image as images/<name>.png, unless dedup is on and it is a
+        near-duplicate of an image already in the dataset. Returns the path,
+        or None when skipped.
+        """
+        file_name = f"{name}.png"
+        if self.dedup_distance is not None:
+            index = self.dedup_index or self._load_dedup_index()
+            if file_name not in index:
+                if index.check_and_add(file_name, image) is not None:
+                    self.skipped_duplicates += 1
+                    return None
+                self.unsaved_hashes += 1
+                if self.unsaved_hashes >= self.index_save_every:
+                    self.flush()
+        path = self.images_path / file_name
+        cv2.imwrite(str(path), image)
+        return path
+
+    def flush(self):
+        """Write the dedup index if it has hashes not saved yet"""
+        if self.dedup_index is not None and self.unsaved_hashes:
+            self.dedup_index.save(self.dedup_index_path)
+            self.unsaved_hashes = 0
 
-    def annotate_image(self, image_path: str) -> Dict:
+    def capture_and_save_screenshot(self, window_title: str, name: Optional[str] = None) -> Optional[str]:
+        """Capture game window screenshot and save it, returning None for a near-duplicate"""
+        if self.window_manager is None:
+            raise ValueError("capture_and_save_screenshot needs a window_manager")
+        windows = self.window_manager.find_game_windows(window_title)
+        if not windows:
+            raise ValueError(f"No window matching {window_title}")
+        image = self.window_manager.capture_window(windows[0])
+        path = self.save_screenshot(image, name or time.strftime("screenshot_%Y%m%d_%H%M%S"))
+        return str(path) if path is not None else None
+
+    def pre_labels(self, image: np.ndarray) -> List[Dict]:
+        """
+        Annotations proposed by the pre_labeler for an image, in the same
+        format annotate_image returns. Elements whose name is not a category
+        are dropped.
+        """
+        if self.pre_labeler is None:
+            return []
+        if hasattr(self.pre_labeler, 'detect_elements'):
+            elements = self.pre_labeler.detect_elements(image, self.pre_label_threshold, use_cache=False)
+        else:
+            elements = self.pre_labeler.detect(image, self.pre_label_threshold)
+
+        height, width = image.shape[:2]
+        annotations = []
+        for element in elements:
+            if element.name not in self.categories:
+                continue
+            w, h = int(round(element.width * width)), int(round(element.height * height))
+            annotations.append({
+                'bbox': [int(round(element.x * width - w / 2)), int(round(element.y * height - h / 2)), w, h],
+                'category_id': self.categories[element.name],
+                'area': w * h,
+                'iscrowd': 0
+            })
+        return annotations
+
+    def annotate_image(self, image_path: str, initial_annotations: Optional[List[Dict]] = None) -> List[Dict]:
         """
         Interactive tool to annotate UI elements in an image.
         Returns annotation data in COCO format.
+
+        The image starts with initial_annotations, else the annotation file
+        already saved for it (e.g. by SessionReader.export_to_dataset), else
+        the pre_labeler's proposals, so most boxes only need correcting.
+        See AnnotationCanvas for the keys.
         """
         image = cv2.imread(str(image_path))
-        annotations = []
-        
-        def draw_rectangle(event, x, y, flags, param):
-            nonlocal drawing, start_x, start_y, image_copy
-            
-            if event == cv2.EVENT_LBUTTONDOWN:
-                drawing = True
-                start_x, start_y = x, y
-                image_copy = image.copy()
-            
-            elif event == cv2.EVENT_MOUSEMOVE and drawing:
-                temp = image_copy.copy()
-                cv2.rectangle(temp, (start_x, start_y), (x, y), (0, 255, 0), 2)
-                cv2.imshow('Annotation Tool', temp)
-            
-            elif event == cv2.EVENT_LBUTTONUP:
-                drawing = False
-                end_x, end_y = x, y
-                cv2.rectangle(image, (start_x, start_y), (end_x, end_y), (0, 255, 0), 2)
-                
-                # Get category from user
-                print("\nAvailable categories:")
-                for name, id in self.categories.items():
-                    print(f"{id}: {name}")
-                
-                category_id = int(input("Enter category ID: "))
-                
-                # Save annotation
-                width = abs(end_x - start_x)
-                height = abs(end_y - start_y)
-                x = min(start_x, end_x)
-                y = min(start_y, end_y)
-                
-                annotation = {
-                    'bbox': [x, y, width, height],
-                    'category_id': category_id,
-                    'area': width * height,
-                    'iscrowd': 0
-                }
-                annotations.append(annotation)
-        
-        # Set up annotation window
-        cv2.namedWindow('Annotation Tool')
-        cv2.setMouseCallback('Annotation Tool', draw_rectangle)
-        
-        drawing = False
-        start_x = start_y = -1
-        image_copy = image.copy()
-        
-        while True:
-            cv2.imshow('Annotation Tool', image)
-            key = cv2.waitKey(1) & 0xFF
-            
-            if key == ord('q'):  # Quit
-                break
-            elif key == ord('c'):  # Clear last annotation
-                if annotations:
-                    annotations.pop()
-                    image = cv2.imread(str(image_path))
-                    for ann in annotations:
-                        x, y, w, h = ann['bbox']
-                        cv2.rectangle(image, (int(x), int(y)), 
-                                    (int(x + w), int(y + h)), (0, 255, 0), 2)
-        
-        cv2.destroyAllWindows()
+        if image is None:
+            raise ValueError(f"Cannot read image: {image_path}")
+        if initial_annotations is None:
+            existing = self.annotations_path / f"{Path(image_path).stem}.json"
+            if existing.exists():
+                with open(existing) as f:
+                    initial_annotations = json.load(f)
+            else:
+                initial_annotations = self.pre_labels(image)
+
+        canvas = AnnotationCanvas(image, self.categories, initial_annotations)
+        annotations = canvas.run()
+        self.last_session_stats = canvas.stats()
         return annotations
 
-    def create_dataset(self, num_samples: int = 10):
+    def create_dataset(self, num_samples: int = 10, window_title: str = "Game Title"):
         """
         Create a dataset by capturing screenshots and annotating them.
+        Captures that are near-duplicates of saved images are skipped.
+        """
+        session = time.strftime("%Y%m%d_%H%M%S")
+        try:
+            for i in range(num_samples):
+                # Capture screenshot
+                image_path = self.capture_and_save_screenshot(window_title, f"sample_{session}_{i:03d}")
+                if image_path is None:
+                    print(f"Skipped sample_{i}: near-duplicate of a saved screenshot")
+                    continue
+
+                # Annotate image
+                annotations = self.annotate_image(image_path)
+
+                # Save annotations
+                annotation_path = self.annotations_path / f"{Path(image_path).stem}.json"
+                with open(annotation_path, 'w') as f:
+                    json.dump(annotations, f, indent=2)
+
+                print(f"Saved annotations for {Path(image_path).stem}")
+        finally:
+            self.flush()
+
+    def annotate_images(self, image_paths: Optional[List[Path]] = None) -> Dict[str, float]:
         """
-        for i in range(num_samples):
-            # Capture screenshot
-            image_path = self.capture_and_save_screenshot(f"sample_{i}.png")
-            
-            # Annotate image
+        Annotate images already in images/ (all of them by default), saving
+        each one's annotations next to the others. Returns the totals of the
+        session stats with the resulting boxes per hour.
+        """
+        totals: Dict[str, float] = {}
+        for image_path in image_paths if image_paths is not None else sorted(self.images_path.glob("*.png")):
             annotations = self.annotate_image(image_path)
-            
-            # Save annotations
-            annotation_path = self.annotations_path / f"sample_{i}.json"
-            with open(annotation_path, 'w') as f:
+            with open(self.annotations_path / f"{Path(image_path).stem}.json", 'w') as f:
                 json.dump(annotations, f, indent=2)
-            
-            print(f"Saved annotations for sample_{i}")
+            for key, value in self.last_session_stats.items():
+                totals[key] = totals.get(key, 0) + value
+            print(f"Saved annotations for {Path(image_path).name}: {self.last_session_stats}")
+        if totals.get('seconds'):
+            totals['boxes_per_hour'] = totals['boxes'] / totals['seconds'] * 3600
+        return totals
 
 # Usage example:
 if __name__ == "__main__":
-    dataset_creator = DatasetCreator("game_ui_dataset")
-    dataset_creator.create_dataset(num_samples=10)
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Capture and annotate UI element screenshots")
+    parser.add_argument("base_path", nargs="?", default="game_ui_dataset")
+    parser.add_argument("--annotate", action="store_true", help="Annotate the images already in the dataset")
+    parser.add_argument("--template-dir", help="Pre-label with template matching")
+    parser.add_argument("--model", help="Pre-label with an ElementDetector model")
+    parser.add_argument("--categories")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--window-title", default="Game Title")
+    parser.add_argument("--dedup", action="store_true", help="Skip near-duplicates of saved screenshots")
+    parser.add_argument("--dedup-distance", type=int, default=DEFAULT_MAX_DISTANCE)
+    args = parser.parse_args()
+
+    pre_labeler = None
+    if args.model:
+        from core.element_detection import ElementDetector
+        pre_labeler = ElementDetector(args.model, args.categories)
+    elif args.template_dir:
+        from core.detection_backends import TemplateMatchingBackend
+        pre_labeler = TemplateMatchingBackend(args.template_dir)
+
+    dataset_creator = DatasetCreator(args.base_path, pre_labeler, args.threshold,
+                                     dedup_distance=args.dedup_distance if args.dedup else None)
+    if args.annotate:
+        print(dataset_creator.annotate_images())
+    else:
+        from core.window_manager import WindowManager
+        dataset_creator.window_manager = WindowManager()
+        dataset_creator.create_dataset(num_samples=10, window_title=args.window_title)
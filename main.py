@@ -19,23 +19,65 @@
 #     └── logger.py
 
 # Example usage:
+import time
+_import_start = time.perf_counter()
 from core.window_manager import WindowManager
 from core.element_detection import ElementDetector
+from core.element_tracker import ElementTracker
 from core.action_manager import ActionManager
+from core.multi_window_executor import MultiWindowExecutor
+from core.instrumentation import metrics
+# torch is not imported here, ElementDetector imports it on its loading thread
+# (run with python -X importtime main.py for a per-module breakdown)
+IMPORT_TIME = time.perf_counter() - _import_start
 
 
 if __name__ == "__main__":
-    # Initialize components
+    startup_start = time.perf_counter()
+    # Per-stage latency histograms and counters, see core/instrumentation.py
+    metrics.enable()
+
+    # Initialize components, the model loads and warms up in the background
     window_manager = WindowManager()
     element_detector = ElementDetector("path/to/model")
-    action_manager = ActionManager(window_manager, element_detector)
+    # Retries verify tracked elements instead of detecting them again
+    action_manager = ActionManager(window_manager, ElementTracker(element_detector))
     
-    # Find game windows
+    # Find game windows and load action sequences while the model loads
+    start = time.perf_counter()
     windows = window_manager.find_game_windows("Game Title")
+    discovery_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    action_manager.load_sequences("config/sequences.json")
+    sequences_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    element_detector.ready.result()
+    model_wait = time.perf_counter() - start
+
+    print(f"Startup {time.perf_counter() - startup_start + IMPORT_TIME:.2f}s")
+    print(f"  imports           {IMPORT_TIME:6.2f}s")
+    print(f"  window discovery  {discovery_time:6.2f}s")
+    print(f"  load sequences    {sequences_time:6.2f}s")
+    print(f"  waiting for model {model_wait:6.2f}s")
+    for stage, seconds in element_detector.startup_timings.items():
+        print(f"    {stage:<15} {seconds:6.2f}s (background)")
     
     if windows:
-        # Load action sequences
-        action_manager.load_sequences("config/sequences.json")
-        
-        # Execute mining sequence on first window
-        success = action_manager.execute_sequence("mine", windows[0])
\ No newline at end of file
+        # Capture in the background so the next frame is ready while detection runs
+        for window in windows:
+            window_manager.start_capture(window, fps=10)
+
+        # Execute mining sequence on every window through the same tracker as action_manager
+        executor = MultiWindowExecutor(window_manager, action_manager)
+        runs = executor.run("mine", windows)
+        for run in runs.values():
+            print(f"{run.window.title}: {run.status} ({run.actions_done} actions)"
+                  + (f" - {run.error}" if run.error else ""))
+        executor.close()
+        window_manager.stop_capture()
+
+        print(metrics.format_table())
+        metrics.export_json("metrics.json")
+        metrics.write_prometheus("metrics.prom")
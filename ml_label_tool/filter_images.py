@@ -1,20 +1,24 @@
 import os
 import shutil
 
-# Define paths
-images_dir = 'train_data/gog_train_v2/images'
-labels_dir = 'train_data/gog_train_v2/labels'
-output_dir = 'train_data/gog_train_v2/filtered_images'
+def filter_images(images_dir, labels_dir, output_dir):
+    """Copy the images that have a corresponding <name>_P.png label"""
+    # Ensure output directory exists
+    os.makedirs(output_dir, exist_ok=True)
 
-# Ensure output directory exists
-os.makedirs(output_dir, exist_ok=True)
+    # Loop through images and copy only if corresponding label exists
+    for image_file in os.listdir(images_dir):
+        base_name = os.path.splitext(image_file)[0]
+        label_file = f"{base_name}_P.png"
 
-# Loop through images and copy only if corresponding label exists
-for image_file in os.listdir(images_dir):
-    base_name = os.path.splitext(image_file)[0]
-    label_file = f"{base_name}_P.png"
-    
-    if os.path.isfile(os.path.join(labels_dir, label_file)):
-        shutil.copy(os.path.join(images_dir, image_file), output_dir)
+        if os.path.isfile(os.path.join(labels_dir, label_file)):
+            shutil.copy(os.path.join(images_dir, image_file), output_dir)
 
-print("Filtered images copied successfully.")
+if __name__ == "__main__":
+    # Define paths
+    images_dir = 'train_data/gog_train_v2/images'
+    labels_dir = 'train_data/gog_train_v2/labels'
+    output_dir = 'train_data/gog_train_v2/filtered_images'
+
+    filter_images(images_dir, labels_dir, output_dir)
+    print("Filtered images copied successfully.")
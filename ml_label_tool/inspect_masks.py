@@ -40,9 +40,10 @@ def show_images_with_masks(images_dir, labels_dir, num_samples=6):
 
         plt.show()
 
-# Example usage
-images_dir = 'train_data/gog_train_v2/images'
-labels_dir = 'train_data/gog_train_v2/labels'
-show_images_with_masks(images_dir, labels_dir, num_samples=6)
+if __name__ == "__main__":
+    # Example usage
+    images_dir = 'train_data/gog_train_v2/images'
+    labels_dir = 'train_data/gog_train_v2/labels'
+    show_images_with_masks(images_dir, labels_dir, num_samples=6)
 
-test_land = 'test'
+    test_land = 'test'
@@ -2,7 +2,6 @@ import json
 import os
 import numpy as np
 from PIL import Image, ImageDraw
-import matplotlib.pyplot as plt
 
 def labelme_to_mask(json_file, output_path, class_mapping):
     """
@@ -42,7 +41,7 @@ def labelme_to_mask(json_file, output_path, class_mapping):
     Image.fromarray(mask).save(output_path)
 
 # Example usage:
-class_mapping = {
+CLASS_MAPPING = {
     'navigation_button': 1,
     'resource_indicator': 2,
     'building': 3,
@@ -52,20 +51,24 @@ class_mapping = {
     'interactive_zone': 7
 }
 
-# Convert all JSON files in a directory
-input_dir = 'train_data/gog_train/labels2'
-output_dir = 'train_data/gog_train/images'
-os.makedirs(output_dir, exist_ok=True)
+def convert_directory(input_dir, output_dir, class_mapping=CLASS_MAPPING):
+    """Convert all JSON files in a directory to <name>_P.png masks"""
+    os.makedirs(output_dir, exist_ok=True)
+    for json_file in os.listdir(input_dir):
+        if json_file.endswith('.json'):
+            base_name = os.path.splitext(json_file)[0]
+            json_path = os.path.join(input_dir, json_file)
+            mask_path = os.path.join(output_dir, f'{base_name}_P.png')
+            labelme_to_mask(json_path, mask_path, class_mapping)
 
-for json_file in os.listdir(input_dir):
-    if json_file.endswith('.json'):
-        base_name = os.path.splitext(json_file)[0]
-        json_path = os.path.join(input_dir, json_file)
-        mask_path = os.path.join(output_dir, f'{base_name}_P.png')
-        labelme_to_mask(json_path, mask_path, class_mapping)
+if __name__ == "__main__":
+    # Convert all JSON files in a directory
+    input_dir = 'train_data/gog_train/labels2'
+    output_dir = 'train_data/gog_train/images'
+    convert_directory(input_dir, output_dir)
 
-# Create codes.txt
-with open('train_data/gog_train/codes.txt', 'w') as f:
-    f.write('background\n')  # Class 0
-    for class_name in class_mapping:
-        f.write(f'{class_name}\n')
\ No newline at end of file
+    # Create codes.txt
+    with open('train_data/gog_train/codes.txt', 'w') as f:
+        f.write('background\n')  # Class 0
+        for class_name in CLASS_MAPPING:
+            f.write(f'{class_name}\n')
@@ -87,8 +87,9 @@ def process_labelme_dataset(input_dir, output_dir):
     print(f"\nProcessed files saved to: {output_dir}")
     print(f"Created codes.txt with {len(class_mapping) + 1} classes")
 
-# Usage
-input_dir = 'train_data/gog_train/labels2'  # Directory containing your JSON files
-output_dir = 'train_data/gog_train/images'  # Directory where masks and codes.txt will be saved
+if __name__ == "__main__":
+    # Usage
+    input_dir = 'train_data/gog_train/labels2'  # Directory containing your JSON files
+    output_dir = 'train_data/gog_train/images'  # Directory where masks and codes.txt will be saved
 
-process_labelme_dataset(input_dir, output_dir)
\ No newline at end of file
+    process_labelme_dataset(input_dir, output_dir)
@@ -77,25 +77,30 @@ def labelme_to_mask(json_file, output_path, class_mapping):
     # Save mask
     Image.fromarray(mask).save(output_path)
 
-# Directory setup
-input_dir = 'train_data/gog_train_v3/labels2'  # Directory containing your JSON files
-output_dir = 'train_data/gog_train_v3/images2'  # Directory where masks and codes.txt will be saved
-os.makedirs(output_dir, exist_ok=True)
+def process_labelme_dataset(input_dir, output_dir):
+    """Write codes.txt and a <name>_P.png mask for every JSON file of input_dir"""
+    os.makedirs(output_dir, exist_ok=True)
 
-# Build class mapping from your JSON files
-class_mapping = build_class_mapping(input_dir)
+    # Build class mapping from your JSON files
+    class_mapping = build_class_mapping(input_dir)
 
-# Save codes.txt
-with open(os.path.join(output_dir, 'codes.txt'), 'w') as f:
-    f.write('background\n')  # Class 0
-    for label in sorted(class_mapping.keys()):
-        f.write(f'{label}\n')
+    # Save codes.txt
+    with open(os.path.join(output_dir, 'codes.txt'), 'w') as f:
+        f.write('background\n')  # Class 0
+        for label in sorted(class_mapping.keys()):
+            f.write(f'{label}\n')
 
-# Convert all JSON files to masks
-for json_file in os.listdir(input_dir):
-    if json_file.endswith('.json'):
-        base_name = os.path.splitext(json_file)[0]
-        json_path = os.path.join(input_dir, json_file)
-        mask_path = os.path.join(output_dir, f'{base_name}_P.png')
-        labelme_to_mask(json_path, mask_path, class_mapping)
-        print(f"Processed {json_file}")
\ No newline at end of file
+    # Convert all JSON files to masks
+    for json_file in os.listdir(input_dir):
+        if json_file.endswith('.json'):
+            base_name = os.path.splitext(json_file)[0]
+            json_path = os.path.join(input_dir, json_file)
+            mask_path = os.path.join(output_dir, f'{base_name}_P.png')
+            labelme_to_mask(json_path, mask_path, class_mapping)
+            print(f"Processed {json_file}")
+
+if __name__ == "__main__":
+    # Directory setup
+    input_dir = 'train_data/gog_train_v3/labels2'  # Directory containing your JSON files
+    output_dir = 'train_data/gog_train_v3/images2'  # Directory where masks and codes.txt will be saved
+    process_labelme_dataset(input_dir, output_dir)
@@ -0,0 +1,244 @@
+from pathlib import Path
+import json
+import random
+import shutil
+import cv2
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+INDEX_FILE = "phash_index.json"
+# Hamming distance (out of 64 bits) below which two screenshots count as the same screen
+DEFAULT_MAX_DISTANCE = 6
+
+def phash(image: np.ndarray) -> int:
+    """
+    64-bit DCT perceptual hash: the sign of the lowest 8x8 DCT coefficients
+    of the 32x32 grayscale thumbnail relative to their median. Capture noise,
+    small text changes and recompression flip only a few bits.
+    """
+    if image.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        image = cv2.cvtColor(image, code)
+    small = cv2.resize(image, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    coefficients = cv2.dct(small)[:8, :8].flatten()
+    bits = coefficients > np.median(coefficients[1:])   # DC term excluded from the median
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def phash_file(path) -> int:
+    """phash of an image file, decoded at a quarter of its size since only 32x32 is used"""
+    image = cv2.imread(str(path), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if image is None:
+        raise ValueError(f"Cannot read image: {path}")
+    return phash(image)
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+class _Node:
+    __slots__ = ('hash', 'items', 'children')
+
+    def __init__(self, hash_value: int, item):
+        self.hash = hash_value
+        self.items = [item]
+        self.children: Dict[int, "_Node"] = {}
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance. A search within distance r
+    only descends into children whose edge distance is within r of the
+    node's own distance, so lookups visit a small part of a large index.
+    """
+
+    def __init__(self):
+        self.root: Optional[_Node] = None
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, hash_value: int, item):
+        self.size += 1
+        if self.root is None:
+            self.root = _Node(hash_value, item)
+            return
+        node = self.root
+        while True:
+            distance = hamming(hash_value, node.hash)
+            if distance == 0:
+                node.items.append(item)
+                return
+            child = node.children.get(distance)
+            if child is None:
+                node.children[distance] = _Node(hash_value, item)
+                return
+            node = child
+
+    def search(self, hash_value: int, max_distance: int) -> List[Tuple[int, object]]:
+        """(distance, item) of every item within max_distance, closest first"""
+        results = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(hash_value, node.hash)
+            if distance <= max_distance:
+                results.extend((distance, item) for item in node.items)
+            for edge, child in node.children.items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        results.sort(key=lambda result: result[0])
+        return results
+
+class PerceptualHashIndex:
+    """
+    Perceptual hashes of saved screenshots, keyed by file name, for
+    rejecting a new capture that is a near-duplicate of one already saved.
+    Persisted as JSON next to the images.
+    """
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.hashes: Dict[str, int] = {}
+        self.tree = BKTree()
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.hashes
+
+    def add(self, key: str, hash_value: int):
+        if key in self.hashes:
+            raise ValueError(f"{key} is already indexed")
+        self.hashes[key] = hash_value
+        self.tree.add(hash_value, key)
+
+    def find(self, hash_value: int) -> Optional[Tuple[str, int]]:
+        """(key, distance) of the closest indexed image within max_distance"""
+        results = self.tree.search(hash_value, self.max_distance)
+        if not results:
+            return None
+        distance, key = results[0]
+        return key, distance
+
+    def check_and_add(self, key: str, image: np.ndarray) -> Optional[str]:
+        """Index the image under key unless it is a near-duplicate; returns the duplicated key"""
+        hash_value = phash(image)
+        duplicate = self.find(hash_value)
+        if duplicate is not None:
+            return duplicate[0]
+        self.add(key, hash_value)
+        return None
+
+    def update_from_directory(self, directory, patterns: Iterable[str] = ("*.png", "*.jpg")) -> int:
+        """Hash the images of directory that are not indexed yet, returning how many were added"""
+        added = 0
+        for pattern in patterns:
+            for path in sorted(Path(directory).glob(pattern)):
+                if path.name not in self.hashes:
+                    self.add(path.name, phash_file(path))
+                    added += 1
+        return added
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'max_distance': self.max_distance,
+                       'hashes': {key: f"{value:016x}" for key, value in self.hashes.items()}}, f)
+
+    @classmethod
+    def load(cls, path, max_distance: Optional[int] = None) -> "PerceptualHashIndex":
+        with open(path) as f:
+            data = json.load(f)
+        index = cls(max_distance if max_distance is not None else data['max_distance'])
+        for key, value in data['hashes'].items():
+            index.add(key, int(value, 16))
+        return index
+
+def group_near_duplicates(hashes: Sequence[int], max_distance: int = DEFAULT_MAX_DISTANCE) -> List[int]:
+    """
+    Group id of every hash. Near-duplicates are grouped transitively, so a
+    slow drift of the same screen across many captures stays one group.
+    """
+    parent = list(range(len(hashes)))
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    tree = BKTree()
+    for i, hash_value in enumerate(hashes):
+        for _, j in tree.search(hash_value, max_distance):
+            parent[root(j)] = root(i)
+        tree.add(hash_value, i)
+
+    group_ids: Dict[int, int] = {}
+    return [group_ids.setdefault(root(i), len(group_ids)) for i in range(len(hashes))]
+
+def grouped_split(image_paths: Sequence,
+                  val_fraction: float = 0.2,
+                  max_distance: int = DEFAULT_MAX_DISTANCE,
+                  seed: int = 0) -> Tuple[List[int], List[int]]:
+    """
+    Train and val indices with every near-duplicate group entirely on one
+    side. Groups are shuffled and moved to val until it holds val_fraction
+    of the images, so val may end up slightly larger.
+    """
+    groups = group_near_duplicates([phash_file(path) for path in image_paths], max_distance)
+    members: Dict[int, List[int]] = {}
+    for index, group in enumerate(groups):
+        members.setdefault(group, []).append(index)
+    order = list(members)
+    random.Random(seed).shuffle(order)
+
+    val_size = int(val_fraction * len(image_paths))
+    train, val = [], []
+    for group in order:
+        (val if len(val) < val_size else train).extend(members[group])
+    return sorted(train), sorted(val)
+
+def dedup_directory(directory,
+                    max_distance: int = DEFAULT_MAX_DISTANCE,
+                    patterns: Iterable[str] = ("*.png", "*.jpg"),
+                    move_to: Optional[str] = None) -> Dict[str, str]:
+    """
+    Find the near-duplicate images of a directory, keeping the first of each
+    (in file name order). Returns duplicate name -> kept name; with move_to
+    the duplicates are moved there.
+    """
+    index = PerceptualHashIndex(max_distance)
+    paths = sorted(path for pattern in patterns for path in Path(directory).glob(pattern))
+    duplicates = {}
+    for path in paths:
+        hash_value = phash_file(path)
+        duplicate = index.find(hash_value)
+        if duplicate is None:
+            index.add(path.name, hash_value)
+        else:
+            duplicates[path.name] = duplicate[0]
+
+    if move_to is not None:
+        Path(move_to).mkdir(parents=True, exist_ok=True)
+        for name in duplicates:
+            shutil.move(str(Path(directory) / name), str(Path(move_to) / name))
+    return duplicates
+
+# Usage example:
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Find near-duplicate screenshots in a directory")
+    parser.add_argument("directory")
+    parser.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE,
+                        help="Hamming distance (of 64 bits) still counted as a duplicate")
+    parser.add_argument("--move-to", help="Move the duplicates to this directory")
+    parser.add_argument("--verbose", action="store_true", help="List every duplicate")
+    args = parser.parse_args()
+
+    duplicates = dedup_directory(args.directory, args.max_distance, move_to=args.move_to)
+    if args.verbose:
+        for name, kept in sorted(duplicates.items()):
+            print(f"{name} duplicates {kept}")
+    kept = len(set(duplicates.values()))
+    print(f"{len(duplicates)} near-duplicates of {kept} images"
+          + (f" moved to {args.move_to}" if args.move_to else ""))
@@ -0,0 +1,239 @@
+from pathlib import Path
+import io
+import json
+import random
+import tarfile
+import time
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+import torchvision.transforms as T
+from PIL import Image
+from typing import Dict, Iterator, List, Optional, Tuple
+from phash_index import grouped_split
+
+INDEX_FILE = "shards.json"
+READ_BUFFER_SIZE = 8 * 1024 * 1024
+
+def _add_member(tar: tarfile.TarFile, name: str, data: bytes, mtime: float):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime
+    tar.addfile(info, io.BytesIO(data))
+
+def _write_split(dataset,
+                 indices: List[int],
+                 output_dir: Path,
+                 split: str,
+                 shard_size: int) -> List[Dict]:
+    """Write the samples at indices into sequential tar shards of about shard_size bytes"""
+    shards = []
+    tar = None
+    shard_bytes = 0
+    mtime = time.time()
+
+    for key in indices:
+        if tar is None or shard_bytes >= shard_size:
+            if tar is not None:
+                tar.close()
+            shard_name = f"{split}-{len(shards):05d}.tar"
+            tar = tarfile.open(output_dir / shard_name, 'w', format=tarfile.USTAR_FORMAT)
+            shards.append({'file': shard_name, 'num_samples': 0})
+            shard_bytes = 0
+
+        # Images are stored as their original encoded bytes, decoding happens in the reader
+        image_path = Path(dataset.image_path(key))
+        image_bytes = image_path.read_bytes()
+        annotation_bytes = json.dumps(dataset.get_annotations(key)).encode('utf-8')
+
+        # Both members of a sample share the key so the reader can pair them while streaming
+        _add_member(tar, f"{key:08d}{image_path.suffix.lower()}", image_bytes, mtime)
+        _add_member(tar, f"{key:08d}.json", annotation_bytes, mtime)
+        shards[-1]['num_samples'] += 1
+        shard_bytes += len(image_bytes) + len(annotation_bytes)
+
+    if tar is not None:
+        tar.close()
+    return shards
+
+def pack_shards(dataset,
+                output_dir: str,
+                shard_size_mb: int = 256,
+                val_fraction: float = 0.2,
+                seed: int = 0,
+                split: str = "random") -> Dict:
+    """
+    Pack a map-style dataset into large sequential tar shards.
+
+    dataset can be a GameUIDataset or COCOUIDataset (anything providing
+    image_path(idx) and get_annotations(idx)). Samples are split into train and
+    val shards and an index file (shards.json) records the shards of each split.
+    split "grouped" keeps near-duplicate screenshots on the same side (see
+    phash_index.grouped_split).
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Shuffle once at pack time so neighbouring samples in a shard are unrelated
+    indices = list(range(len(dataset)))
+    random.Random(seed).shuffle(indices)
+    if split == "random":
+        val_size = int(val_fraction * len(indices))
+        splits = {'train': indices[val_size:], 'val': indices[:val_size]}
+    elif split == "grouped":
+        train, val = grouped_split([dataset.image_path(i) for i in range(len(dataset))], val_fraction, seed=seed)
+        train, val = set(train), set(val)
+        splits = {'train': [i for i in indices if i in train], 'val': [i for i in indices if i in val]}
+    else:
+        raise ValueError(f"Unknown split: {split}")
+
+    shard_size = shard_size_mb * 1024 * 1024
+    index = {
+        'categories': dataset.categories,
+        'splits': {split: _write_split(dataset, split_indices, output_dir, split, shard_size)
+                   for split, split_indices in splits.items()}
+    }
+
+    with open(output_dir / INDEX_FILE, 'w') as f:
+        json.dump(index, f, indent=2)
+    return index
+
+def iterate_shard(shard_path: Path) -> Iterator[Tuple[bytes, List[Dict]]]:
+    """Stream (image bytes, annotations) pairs from a shard with one sequential read"""
+    with open(shard_path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+        with tarfile.open(fileobj=f, mode='r|') as tar:
+            key = None
+            image_bytes = annotations = None
+            for member in tar:
+                if not member.isfile():
+                    continue
+                member_key, _, extension = member.name.rpartition('.')
+                if member_key != key:
+                    key = member_key
+                    image_bytes = annotations = None
+
+                data = tar.extractfile(member).read()
+                if extension == 'json':
+                    annotations = json.loads(data)
+                else:
+                    image_bytes = data
+
+                if image_bytes is not None and annotations is not None:
+                    yield image_bytes, annotations
+                    image_bytes = annotations = None
+
+class ShardedUIDataset(IterableDataset):
+    """
+    Streaming reader for shards written by pack_shards.
+
+    Every DataLoader worker reads its own subset of the shards, so the number of
+    shards of a split should be at least num_workers. Samples pass through a
+    shuffle buffer; call set_epoch to get a different order every epoch.
+    """
+
+    def __init__(self,
+                 shard_dir: str,
+                 split: str = "train",
+                 transform=None,
+                 target_size: Tuple[int, int] = (800, 600),
+                 shuffle: bool = True,
+                 shuffle_buffer: int = 1000,
+                 seed: int = 0):
+        self.shard_dir = Path(shard_dir)
+        self.split = split
+        self.transform = transform or T.Compose([
+            T.Resize(target_size),
+            T.ToTensor(),
+            T.Normalize(mean=[0.485, 0.456, 0.406],
+                       std=[0.229, 0.224, 0.225])
+        ])
+        self.shuffle = shuffle
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.epoch = 0
+
+        with open(self.shard_dir / INDEX_FILE) as f:
+            index = json.load(f)
+        self.categories = index['categories']
+        self.shards = index['splits'][split]
+
+    def __len__(self) -> int:
+        return sum(shard['num_samples'] for shard in self.shards)
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def _worker_shards(self, rng: random.Random) -> List[str]:
+        shards = [shard['file'] for shard in self.shards]
+        if self.shuffle:
+            # Same shard order in every worker, so the slices below do not overlap
+            rng.shuffle(shards)
+
+        worker_info = get_worker_info()
+        if worker_info is None:
+            return shards
+        return shards[worker_info.id::worker_info.num_workers]
+
+    def _decode(self, image_bytes: bytes, annotations: List[Dict]) -> Tuple[torch.Tensor, List[Dict]]:
+        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+        width, height = image.size
+
+        # Convert annotations to relative coordinates
+        for ann in annotations:
+            x, y, w, h = ann['bbox']
+            ann['bbox'] = [x/width, y/height, w/width, h/height]
+
+        if self.transform:
+            image = self.transform(image)
+
+        return image, annotations
+
+    def __iter__(self) -> Iterator[Tuple[torch.Tensor, List[Dict]]]:
+        shard_rng = random.Random(self.seed + self.epoch)
+        shards = self._worker_shards(shard_rng)
+
+        worker_info = get_worker_info()
+        worker_id = worker_info.id if worker_info is not None else 0
+        buffer_rng = random.Random((self.seed + self.epoch) * 1000003 + worker_id)
+
+        buffer = []
+        for shard in shards:
+            for image_bytes, annotations in iterate_shard(self.shard_dir / shard):
+                if not self.shuffle:
+                    yield self._decode(image_bytes, annotations)
+                    continue
+
+                # Keep encoded bytes in the buffer, decode only when a sample leaves it
+                if len(buffer) < self.shuffle_buffer:
+                    buffer.append((image_bytes, annotations))
+                    continue
+                i = buffer_rng.randrange(len(buffer))
+                sample, buffer[i] = buffer[i], (image_bytes, annotations)
+                yield self._decode(*sample)
+
+        buffer_rng.shuffle(buffer)
+        for sample in buffer:
+            yield self._decode(*sample)
+
+# Usage example:
+if __name__ == "__main__":
+    import argparse
+    from dataloader_creator import GameUIDataset, COCOUIDataset
+
+    parser = argparse.ArgumentParser(description="Pack a dataset into sequential tar shards")
+    parser.add_argument("dataset_path")
+    parser.add_argument("output_dir")
+    parser.add_argument("--annotation-file", help="COCO JSON, packs a COCO dataset instead of the folder layout")
+    parser.add_argument("--shard-size-mb", type=int, default=256)
+    parser.add_argument("--val-fraction", type=float, default=0.2)
+    parser.add_argument("--split", choices=["random", "grouped"], default="random",
+                        help="grouped keeps near-duplicate screenshots on the same side")
+    args = parser.parse_args()
+
+    if args.annotation_file:
+        dataset = COCOUIDataset(args.annotation_file, args.dataset_path)
+    else:
+        dataset = GameUIDataset(args.dataset_path)
+
+    index = pack_shards(dataset, args.output_dir, args.shard_size_mb, args.val_fraction, split=args.split)
+    for split, shards in index['splits'].items():
+        print(f"{split}: {sum(s['num_samples'] for s in shards)} samples in {len(shards)} shards")
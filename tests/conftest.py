@@ -0,0 +1,43 @@
+import json
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+from PIL import Image
+
+# The modules live at the repository root (and core/ is a namespace package)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+@pytest.fixture
+def folder_dataset(tmp_path):
+    """
+    DatasetCreator layout with 10 small images. Image i is filled with gray
+    level 20 * i and has one annotation with id i, so pairs can be checked.
+    """
+    root = tmp_path / "dataset"
+    (root / "images").mkdir(parents=True)
+    (root / "annotations").mkdir()
+    (root / "categories.json").write_text(json.dumps({"mail": 1, "vip": 2}))
+    for i in range(10):
+        Image.fromarray(np.full((24, 32, 3), 20 * i, dtype=np.uint8)).save(root / "images" / f"{i:03d}.png")
+        annotations = [{'id': i, 'bbox': [4, 2, 8, 6], 'category_id': 1 + i % 2, 'area': 48, 'iscrowd': 0}]
+        (root / "annotations" / f"{i:03d}.json").write_text(json.dumps(annotations))
+    return root
+
+class StubBackend:
+    """Detection backend returning fixed elements and counting its calls"""
+
+    def __init__(self, elements):
+        self.elements = list(elements)
+        self.calls = 0
+
+    def detect(self, image, threshold, names=None):
+        self.calls += 1
+        return [e for e in self.elements
+                if e.confidence >= threshold and (names is None or e.name in names)]
+
+@pytest.fixture
+def stub_backend():
+    from core.element_detection import DetectedElement
+    return StubBackend([DetectedElement("mail", 0.9, 0.25, 0.5, 0.1, 0.1),
+                        DetectedElement("vip", 0.95, 0.75, 0.5, 0.1, 0.1)])
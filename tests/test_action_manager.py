@@ -0,0 +1,131 @@
+import threading
+import time
+import numpy as np
+import pytest
+from core.action_manager import Action, ActionManager, ActionRun, ActionSequence
+from core.element_detection import DetectedElement
+from core.simulated_environment import SimulatedCaptureBackend, SimulatedState, Transition
+from core.window_manager import WindowManager
+
+WIDTH, HEIGHT = 160, 120
+MAIL = (0.1, 0.1, 0.3, 0.3)
+
+def screen(button=True):
+    image = np.full((HEIGHT, WIDTH, 4), 60, dtype=np.uint8)
+    if button:
+        x1, y1, x2, y2 = MAIL
+        image[int(y1 * HEIGHT):int(y2 * HEIGHT), int(x1 * WIDTH):int(x2 * WIDTH), :3] = 220
+    return image
+
+class ButtonDetector:
+    """Finds the mail button by its bright pixels, counting the frames it looks at"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def find_elements(self, image, names, threshold=0.7, use_cache=True, cache_timeout=1.0, cache_key=None):
+        self.calls += 1
+        x1, y1, x2, y2 = MAIL
+        if "mail" in names and image[int((y1 + y2) / 2 * HEIGHT), int((x1 + x2) / 2 * WIDTH), 0] > 200:
+            return {"mail": DetectedElement("mail", 0.9, (x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1)}
+        return {}
+
+def environment(initial="home", **action):
+    """A window on a still screen ("home" shows the mail button, "blank" does not)"""
+    states = {"home": SimulatedState("home", screen(), [Transition(MAIL, "blank")]),
+              "blank": SimulatedState("blank", screen(button=False))}
+    simulation = SimulatedCaptureBackend(states, initial, render_latency=0.0, noise=2)
+    detector = ButtonDetector()
+    action_manager = ActionManager(WindowManager(simulation), detector)
+    sequence = ActionSequence("open")
+    sequence.add_action(Action("open_mail", "mail", [], **action))
+    action_manager.sequences["open"] = sequence
+    window, = action_manager.window_manager.find_game_windows("Simulated")
+    return simulation, detector, action_manager, window
+
+def test_target_on_screen_is_clicked_at_once():
+    simulation, detector, action_manager, window = environment()
+    assert action_manager.execute_sequence("open", window)
+    assert detector.calls == 1 and simulation.transitions == 1
+    timing, = action_manager.action_timings
+    assert timing.attempts == 1 and timing.time_to_ready < 0.1
+
+def test_action_fails_at_its_timeout():
+    simulation, detector, action_manager, window = environment("blank", timeout=0.3, retry_interval=0.05)
+    start = time.monotonic()
+    assert not action_manager.execute_sequence("open", window)
+    assert 0.3 <= time.monotonic() - start < 0.5
+    assert simulation.clicks == 0
+    assert action_manager.timing_summary()["open_mail"]["failed"] == 1
+
+def test_max_retries_caps_the_detections():
+    _, detector, action_manager, window = environment("blank", timeout=5.0, retry_interval=0.02)
+    start = time.monotonic()
+    assert not action_manager.execute_sequence("open", window, max_retries=3)
+    assert detector.calls == 3
+    assert time.monotonic() - start < 1.0
+
+def test_still_screen_is_not_detected_again():
+    # Noisy captures of a still screen, with a retry_interval longer than the timeout
+    _, detector, action_manager, window = environment("blank", timeout=0.3, retry_interval=10.0)
+    assert not action_manager.execute_sequence("open", window)
+    timing, = action_manager.action_timings
+    assert detector.calls == 1 and timing.attempts == 1
+    assert timing.frames > 3
+
+def test_wait_grows_from_min_wait_to_retry_interval():
+    _, _, action_manager, window = environment("blank")
+    action = Action("open_mail", "mail", [], timeout=5.0, retry_interval=0.2)
+    run = ActionRun(action_manager, "open", action, window)
+    still = screen(button=False)
+    assert run.needs_detection(still)
+    assert not run.detected({})
+
+    waits = [run.next_wait()]
+    for _ in range(5):
+        assert not run.needs_detection(still.copy())
+        waits.append(run.next_wait())
+    assert waits == pytest.approx([0.02, 0.04, 0.08, 0.16, 0.2, 0.2])
+
+    # A change is detected at once and the waits start over
+    assert run.needs_detection(screen())
+    assert not run.detected({})
+    assert run.next_wait() == pytest.approx(0.02)
+
+def test_wait_ends_when_a_new_continuous_frame_arrives():
+    _, _, action_manager, window = environment("blank")
+    window_manager = action_manager.window_manager
+    _, seq = action_manager._first_frame(window)
+    start = time.monotonic()
+    # Outside continuous capture the wait is a sleep
+    action_manager._next_frame(window, seq, 0.2)
+    assert time.monotonic() - start >= 0.2
+
+    window_manager.start_capture(window, fps=50.0)
+    try:
+        _, seq = action_manager._first_frame(window)
+        start = time.monotonic()
+        image, next_seq = action_manager._next_frame(window, seq, 5.0)
+        assert time.monotonic() - start < 1.0
+        assert image is not None and next_seq > seq
+    finally:
+        window_manager.stop_capture()
+
+def test_target_appearing_during_the_wait_is_clicked():
+    simulation, detector, action_manager, window = environment("blank", timeout=5.0, retry_interval=10.0)
+    simulation.states["blank"].transitions.append(Transition((0.0, 0.0, 0.05, 0.05), "home"))
+    # The button appears 0.2 s in, long after the still screen stopped being detected
+    threading.Timer(0.2, simulation.click, [window, 0, 0]).start()
+    start = time.monotonic()
+    assert action_manager.execute_sequence("open", window)
+    assert time.monotonic() - start < 1.0
+    assert detector.calls == 2
+
+def test_action_timings_keep_the_most_recent():
+    simulation, detector, action_manager, window = environment()
+    bounded = ActionManager(action_manager.window_manager, detector, timing_history=2)
+    bounded.sequences = action_manager.sequences
+    for _ in range(3):
+        simulation.reset()
+        assert bounded.execute_sequence("open", window)
+    assert len(bounded.action_timings) == 2
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import torch
+from aspect_buckets import (DEFAULT_BUCKET_RATIOS, AspectRatioBucketSampler, BucketCollate,
+                            bucket_shape, letterbox, nearest_bucket)
+
+def unletterbox(box, image_size, size):
+    """Inverse of the box mapping in letterbox"""
+    height, width = image_size
+    out_height, out_width = size
+    scale = min(out_height / height, out_width / width)
+    new_height, new_width = round(height * scale), round(width * scale)
+    pad_top, pad_left = (out_height - new_height) // 2, (out_width - new_width) // 2
+    x, y, w, h = box
+    return [(x * out_width - pad_left) / new_width, (y * out_height - pad_top) / new_height,
+            w * out_width / new_width, h * out_height / new_height]
+
+@pytest.mark.parametrize("image_size, size", [((100, 200), (96, 96)), ((200, 100), (64, 128)),
+                                              ((90, 160), (90, 160))])
+def test_letterbox_boxes_round_trip(image_size, size):
+    box = [0.1, 0.2, 0.3, 0.4]
+    image = torch.rand(3, *image_size)
+    output, boxed = letterbox(image, [{'bbox': box, 'category_id': 1}], size)
+    assert output.shape == (3, *size)
+    assert boxed[0]['category_id'] == 1
+    np.testing.assert_allclose(unletterbox(boxed[0]['bbox'], image_size, size), box, atol=1e-6)
+
+def test_letterbox_box_covers_the_same_pixels():
+    # A white rectangle on black must land where the remapped box says
+    image = torch.zeros(3, 100, 200)
+    image[:, 20:60, 40:120] = 1.0
+    output, boxed = letterbox(image, [{'bbox': [40 / 200, 20 / 100, 80 / 200, 40 / 100]}], (128, 128))
+    x, y, w, h = (round(v * 128) for v in boxed[0]['bbox'])
+    inside = torch.zeros(128, 128, dtype=torch.bool)
+    inside[y + 1:y + h - 1, x + 1:x + w - 1] = True
+    around = torch.ones(128, 128, dtype=torch.bool)
+    around[y - 1:y + h + 1, x - 1:x + w + 1] = False
+    assert output[0][inside].min() > 0.9
+    assert output[0][around].max() < 0.1
+
+def test_letterbox_does_not_modify_the_annotations():
+    annotations = [{'bbox': [0.1, 0.2, 0.3, 0.4]}]
+    letterbox(torch.rand(3, 50, 100), annotations, (64, 64))
+    assert annotations == [{'bbox': [0.1, 0.2, 0.3, 0.4]}]
+
+def test_bucket_shapes_follow_ratio_and_stride():
+    for ratio in DEFAULT_BUCKET_RATIOS:
+        height, width = bucket_shape(ratio)
+        assert height % 32 == 0 and width % 32 == 0
+        assert width / height == pytest.approx(ratio, rel=0.1)
+        assert nearest_bucket(width / height) == DEFAULT_BUCKET_RATIOS.index(ratio)
+
+def test_sampler_batches_stay_within_one_bucket():
+    ratios = [16 / 9] * 7 + [9 / 16] * 5 + [1.0] * 3
+    sampler = AspectRatioBucketSampler(ratios, batch_size=2, seed=1)
+    batches = list(sampler)
+    assert len(batches) == len(sampler) == 4 + 3 + 2
+    assert sorted(i for batch in batches for i in batch) == list(range(len(ratios)))
+    for batch in batches:
+        assert len({nearest_bucket(ratios[i]) for i in batch}) == 1
+
+    sampler.set_epoch(1)
+    assert list(sampler) != batches
+    assert len(AspectRatioBucketSampler(ratios, batch_size=2, drop_last=True)) == 3 + 2 + 1
+
+def test_bucket_collate_stacks_to_the_bucket_shape():
+    collate = BucketCollate()
+    batch = [(torch.rand(3, 90, 160), [{'bbox': [0, 0, 1, 1]}]), (torch.rand(3, 720, 1280), [])]
+    images, annotations = collate(batch)
+    assert images.shape == (2, 3, *bucket_shape(16 / 9))
+    assert len(annotations) == 2
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+import torch
+from augmentation import IMAGENET_MEAN, IMAGENET_STD, AugmentingCollate, BatchAugmenter
+
+IDENTITY = dict(flip_p=0.0, scale_range=(1.0, 1.0), crop_p=0.0, translate=0.0,
+                brightness=0.0, contrast=0.0, hue=0.0)
+
+def rectangle_batch(n=4, height=48, width=64):
+    """Images and class-id masks with one rectangle, and its relative box"""
+    images = np.zeros((n, height, width, 3), dtype=np.uint8)
+    masks = np.zeros((n, height, width), dtype=np.uint8)
+    images[:, 12:36, 16:40] = 200
+    masks[:, 12:36, 16:40] = 1
+    boxes = [np.array([[16 / width, 12 / height, 24 / width, 24 / height]], dtype=np.float32)] * n
+    return images, masks, boxes
+
+def mask_box(mask):
+    ys, xs = np.nonzero(mask)
+    height, width = mask.shape
+    return np.array([xs.min() / width, ys.min() / height,
+                     (xs.max() + 1 - xs.min()) / width, (ys.max() + 1 - ys.min()) / height])
+
+def test_identity_parameters_keep_the_batch():
+    images, masks, boxes = rectangle_batch()
+    out = BatchAugmenter(**IDENTITY, seed=0)(images, masks, boxes)
+    np.testing.assert_array_equal(out.images, images)
+    np.testing.assert_array_equal(out.masks, masks)
+    np.testing.assert_allclose(out.boxes[0], boxes[0], atol=1e-6)
+    assert out.valid[0].all()
+
+def test_flip_mirrors_image_mask_and_box():
+    images, masks, boxes = rectangle_batch()
+    out = BatchAugmenter(**dict(IDENTITY, flip_p=1.0), seed=0)(images, masks, boxes)
+    np.testing.assert_array_equal(out.images, images[:, :, ::-1])
+    np.testing.assert_array_equal(out.masks, masks[:, :, ::-1])
+    x, y, w, h = boxes[0][0]
+    np.testing.assert_allclose(out.boxes[0][0], [1 - x - w, y, w, h], atol=1e-6)
+
+def test_boxes_follow_the_geometry():
+    images, masks, boxes = rectangle_batch(n=16)
+    augmenter = BatchAugmenter(scale_range=(0.8, 1.2), crop_p=0.5, translate=0.05,
+                               brightness=0.0, contrast=0.0, hue=0.0, min_visibility=1.0, seed=3)
+    out = augmenter(images, masks, boxes)
+    checked = 0
+    for mask, sample_boxes, valid in zip(out.masks, out.boxes, out.valid):
+        if valid[0]:
+            np.testing.assert_allclose(sample_boxes[0], mask_box(mask), atol=2 / 48)
+            checked += 1
+    assert checked > 0
+
+def test_boxes_moved_out_of_frame_are_invalid():
+    images, _, _ = rectangle_batch(n=1)
+    # Zoomed in 2x on the center, the corner box is cut off
+    augmenter = BatchAugmenter(**dict(IDENTITY, scale_range=(2.0, 2.0)), seed=0)
+    out = augmenter(images, None, [np.array([[0.0, 0.0, 0.1, 0.1], [0.4, 0.4, 0.2, 0.2]], dtype=np.float32)])
+    assert out.valid[0].tolist() == [False, True]
+    assert out.masks is None
+
+def test_seed_makes_augmentation_reproducible():
+    images, masks, boxes = rectangle_batch()
+    first = BatchAugmenter(seed=5)(images, masks, boxes)
+    second = BatchAugmenter(seed=5)(images, masks, boxes)
+    other = BatchAugmenter(seed=6)(images, masks, boxes)
+    np.testing.assert_array_equal(first.images, second.images)
+    np.testing.assert_array_equal(first.masks, second.masks)
+    assert not np.array_equal(first.images, other.images)
+
+def test_collate_normalizes_and_drops_invalid_annotations():
+    images, masks, _ = rectangle_batch(n=2)
+    batch = [(images[i], [{'bbox': [0.0, 0.0, 0.1, 0.1], 'id': 1}, {'bbox': [0.4, 0.4, 0.2, 0.2], 'id': 2}],
+              masks[i]) for i in range(2)]
+    collate = AugmentingCollate(BatchAugmenter(**dict(IDENTITY, scale_range=(2.0, 2.0)), seed=0))
+    tensor, annotations, out_masks = collate(batch)
+    assert tensor.shape == (2, 3, 48, 64) and tensor.dtype == torch.float32
+    assert out_masks.shape == (2, 48, 64)
+    assert [[ann['id'] for ann in anns] for anns in annotations] == [[2], [2]]
+    # The center stays inside the rectangle when zooming on it
+    expected = (200 / 255 - np.array(IMAGENET_MEAN)) / np.array(IMAGENET_STD)
+    np.testing.assert_allclose(tensor[0, :, 24, 32].numpy(), expected, rtol=1e-5)
+
+class RectangleDataset(torch.utils.data.Dataset):
+    def __len__(self):
+        return 8
+
+    def __getitem__(self, idx):
+        images, _, boxes = rectangle_batch(n=1)
+        return images[0], [{'bbox': boxes[0][0].tolist()}]
+
+def test_loader_workers_augment_differently():
+    collate = AugmentingCollate(BatchAugmenter(seed=0))
+    loader = torch.utils.data.DataLoader(RectangleDataset(), batch_size=1, num_workers=2,
+                                         collate_fn=collate, worker_init_fn=collate.seed_worker)
+    # Batches 0 and 1 come from different workers, which start from the same generator
+    first, second = [annotations[0][0]['bbox'] if annotations[0] else None
+                     for _, annotations in list(loader)[:2]]
+    assert first != second
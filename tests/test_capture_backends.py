@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+import pytest
+import core.capture_backends as capture_backends
+from core.capture_backends import ReplayCaptureBackend, benchmark_capture
+from core.window_manager import WindowManager
+
+def frames(count=3, channels=3):
+    return [np.full((20, 30, channels), 10 * (i + 1), dtype=np.uint8) for i in range(count)]
+
+def test_windows_replay_independently():
+    backend = ReplayCaptureBackend(frames(), window_count=2, title="Replay game")
+    assert backend.find_windows("Other") == []
+    first, second = backend.find_windows("Replay")
+    assert (first.width, first.height) == (30, 20)
+    assert [backend.capture(first)[0, 0, 0] for _ in range(4)] == [10, 20, 30, 10]
+    assert backend.capture(second)[0, 0, 0] == 10
+
+def test_without_loop_the_last_frame_repeats():
+    backend = ReplayCaptureBackend(frames(), loop=False)
+    window, = backend.find_windows("Replay")
+    assert [backend.capture(window)[0, 0, 0] for _ in range(5)] == [10, 20, 30, 30, 30]
+
+def test_fps_follows_the_clock(monkeypatch):
+    now = [50.0]
+    monkeypatch.setattr(capture_backends.time, 'monotonic', lambda: now[0])
+    backend = ReplayCaptureBackend(frames(), fps=10)
+    window, = backend.find_windows("Replay")
+    assert backend.capture(window)[0, 0, 0] == 10
+    assert backend.capture(window)[0, 0, 0] == 10
+    now[0] += 0.25
+    assert backend.capture(window)[0, 0, 0] == 30
+
+def test_bgr_frames_come_out_as_bgra_in_a_reused_buffer():
+    backend = ReplayCaptureBackend(frames())
+    window, = backend.find_windows("Replay")
+    first = backend.capture(window)
+    second = backend.capture(window)
+    assert first.shape == (20, 30, 4)
+    assert np.shares_memory(first, second)
+    assert (second[..., :3] == 20).all() and (second[..., 3] == 255).all()
+    # BGRA frames are handed out as they are
+    backend = ReplayCaptureBackend(frames(channels=4))
+    window, = backend.find_windows("Replay")
+    assert backend.capture(window) is backend.frames[0]
+
+def test_from_directory_reads_in_name_order(tmp_path):
+    for i, name in enumerate(("b.png", "a.png", "c.jpg", "notes.txt")):
+        if name.endswith("txt"):
+            (tmp_path / name).write_text("not an image")
+        else:
+            cv2.imwrite(str(tmp_path / name), np.full((8, 8, 3), 50 * i, dtype=np.uint8))
+    backend = ReplayCaptureBackend.from_directory(str(tmp_path))
+    assert len(backend.frames) == 3
+    assert [int(frame[0, 0, 0]) for frame in backend.frames[:2]] == [50, 0]
+    with pytest.raises(ValueError):
+        ReplayCaptureBackend([])
+
+def test_window_manager_goes_through_the_backend():
+    backend = ReplayCaptureBackend(frames(), window_count=2)
+    window_manager = WindowManager(backend)
+    windows = window_manager.find_game_windows("Replay")
+    assert set(window_manager.windows) == {1, 2}
+    image, seq = window_manager.capture_window_seq(windows[1])
+    assert image.shape == (20, 30, 4) and seq == 0
+    window_manager.click_at(windows[1], 0.5, 0.25)
+    assert backend.clicks[0][:3] == (2, 15, 5)
+    assert benchmark_capture(backend, windows[0], frames=5)['fps'] > 0
+
+def test_window_manager_needs_a_backend_off_windows():
+    if capture_backends.win32gui is not None:
+        pytest.skip("Win32CaptureBackend is the default on Windows")
+    with pytest.raises(RuntimeError):
+        WindowManager().find_game_windows("Game")
@@ -0,0 +1,76 @@
+import json
+import os
+import numpy as np
+import pytest
+from PIL import Image
+from dataloader_creator import COCOUIDataset
+
+@pytest.fixture
+def coco_dir(tmp_path):
+    for name, size in (("a.png", (40, 20)), ("b.png", (30, 30)), ("c.png", (10, 10))):
+        Image.new('RGB', size).save(tmp_path / name)
+    coco = {
+        'images': [{'id': 7, 'file_name': 'b.png', 'width': 30, 'height': 30},
+                   {'id': 3, 'file_name': 'a.png', 'width': 40, 'height': 20},
+                   {'id': 9, 'file_name': 'c.png'}],
+        'categories': [{'id': 1, 'name': 'mail'}, {'id': 2, 'name': 'vip'}],
+        'annotations': [
+            {'id': 1, 'image_id': 7, 'category_id': 2, 'bbox': [1, 2, 3, 4]},
+            {'id': 2, 'image_id': 3, 'category_id': 1, 'bbox': [4, 2, 8, 10], 'iscrowd': 1},
+            # Polygon only, as written by generate_poly_coco
+            {'id': 3, 'image_id': 7, 'category_id': 1,
+             'segmentation': [[2, 2, 12, 2, 12, 8], [20, 20, 22, 20, 22, 25]]},
+        ],
+    }
+    path = tmp_path / "coco.json"
+    path.write_text(json.dumps(coco))
+    return tmp_path, path
+
+def test_annotations_are_grouped_per_image(coco_dir):
+    image_dir, path = coco_dir
+    dataset = COCOUIDataset(str(path), str(image_dir), cache_index=False)
+    assert len(dataset) == 3
+    assert [dataset.image_path(i) for i in range(3)] == [str(image_dir / name) for name in ("a.png", "b.png", "c.png")]
+    assert dataset.categories == {'mail': 1, 'vip': 2}
+
+    assert [ann['id'] for ann in dataset.get_annotations(0)] == [2]
+    assert dataset.get_annotations(0)[0]['iscrowd'] == 1
+    assert [ann['id'] for ann in dataset.get_annotations(1)] == [1, 3]
+    assert dataset.get_annotations(2) == []
+    assert dataset.annotation_range(7) == (1, 3)
+
+def test_polygon_only_annotation_gets_box_and_segmentation(coco_dir):
+    image_dir, path = coco_dir
+    dataset = COCOUIDataset(str(path), str(image_dir), cache_index=False)
+    polygon = dataset.get_annotations(1)[1]
+    assert polygon['bbox'] == [2, 2, 20, 23]
+    assert polygon['segmentation'] == [[2, 2, 12, 2, 12, 8], [20, 20, 22, 20, 22, 25]]
+    assert 'segmentation' not in dataset.get_annotations(1)[0]
+
+def test_getitem_returns_relative_boxes(coco_dir):
+    image_dir, path = coco_dir
+    dataset = COCOUIDataset(str(path), str(image_dir), transform=lambda image: image, cache_index=False)
+    image, annotations = dataset[0]
+    assert image.size == (40, 20)
+    np.testing.assert_allclose(annotations[0]['bbox'], [0.1, 0.1, 0.2, 0.5])
+
+def test_index_cache_is_reused_until_the_json_changes(coco_dir, monkeypatch):
+    image_dir, path = coco_dir
+    first = COCOUIDataset(str(path), str(image_dir))
+    assert first.index_path.exists()
+
+    # A stale index must not be used, even with the same file size
+    coco = json.loads(path.read_text())
+    coco['categories'][0]['name'] = 'mall'
+    path.write_text(json.dumps(coco))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    second = COCOUIDataset(str(path), str(image_dir))
+    assert second.categories == {'mall': 1, 'vip': 2}
+
+    calls = []
+    original = COCOUIDataset._build_index
+    monkeypatch.setattr(COCOUIDataset, '_build_index', lambda self: calls.append(1) or original(self))
+    third = COCOUIDataset(str(path), str(image_dir))
+    assert calls == []
+    assert third.get_annotations(1) == second.get_annotations(1)
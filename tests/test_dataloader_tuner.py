@@ -0,0 +1,61 @@
+import pytest
+import torchvision.transforms as T
+import dataloader_tuner
+from dataloader_creator import GameUIDataset, create_dataloaders
+from dataloader_tuner import (STAGES, StageTimedDataset, benchmark_loader, load_tuned_config,
+                              save_tuned_config, tune_dataloader)
+
+CONFIG = {'batch_size': 4, 'num_workers': 0, 'prefetch_factor': 2,
+          'pin_memory': False, 'persistent_workers': False}
+
+@pytest.fixture
+def dataset(folder_dataset):
+    return GameUIDataset(str(folder_dataset), transform=T.Compose([T.Resize((16, 16)), T.ToTensor()]))
+
+def test_stage_timed_dataset_matches_the_dataset(dataset):
+    timed = StageTimedDataset(dataset, [3, 5])
+    assert len(timed) == 2
+    image, annotations, timings = timed[1]
+    expected_image, expected_annotations = dataset[5]
+    assert (image == expected_image).all()
+    assert annotations == expected_annotations
+    assert len(timings) == 3 and all(t >= 0 for t in timings)
+
+@pytest.mark.parametrize("bucketed", [False, True])
+def test_benchmark_loader_reports_every_stage(dataset, bucketed):
+    if bucketed:
+        dataset.transform = T.ToTensor()
+    result = benchmark_loader(dataset, CONFIG, num_batches=2, epochs=1, bucketed=bucketed)
+    assert result['batch_size'] == 4
+    assert result['samples_per_sec'] > 0
+    assert 0 <= result['wait_fraction'] <= 1
+    assert set(result['stage_ms_per_sample']) == set(STAGES)
+
+def test_tune_sweeps_each_dimension_and_keeps_the_fastest(dataset, monkeypatch, capsys):
+    rates = {2: 10.0, 4: 30.0, 8: 20.0}
+
+    def fake_benchmark(dataset, config, num_batches, bucketed):
+        return dict(config, samples_per_sec=rates[config['batch_size']] + config['num_workers'],
+                    wait_fraction=0.0, stage_ms_per_sample={stage: 0.0 for stage in STAGES})
+    monkeypatch.setattr(dataloader_tuner, 'benchmark_loader', fake_benchmark)
+
+    seen = []
+    best, results = tune_dataloader(dataset, worker_counts=[0, 1], batch_sizes=(2, 4, 8),
+                                    prefetch_factors=(2, 4), on_result=seen.append)
+    assert seen == results
+    assert capsys.readouterr().out == ""
+    assert best['batch_size'] == 4 and best['num_workers'] == 1
+    assert {result['batch_size'] for result in results} == {2, 4, 8}
+
+def test_tuned_config_round_trip_feeds_create_dataloaders(folder_dataset, tmp_path):
+    path = tmp_path / "loader.json"
+    assert load_tuned_config(str(path)) == {}
+    save_tuned_config(dict(CONFIG, batch_size=3), str(path))
+    assert load_tuned_config(str(path))['batch_size'] == 3
+
+    train_loader, val_loader = create_dataloaders(str(folder_dataset), loader_config=str(path))
+    assert train_loader.batch_size == 3 and val_loader.batch_size == 3
+    assert train_loader.num_workers == 0
+    # Explicit arguments win over the tuned values
+    train_loader, _ = create_dataloaders(str(folder_dataset), batch_size=5, loader_config=str(path))
+    assert train_loader.batch_size == 5
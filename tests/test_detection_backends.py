@@ -0,0 +1,59 @@
+import cv2
+import numpy as np
+import pytest
+from core.detection_backends import TemplateMatchingBackend
+
+WIDTH, HEIGHT = 160, 120
+
+def icon(seed):
+    rng = np.random.default_rng(seed)
+    return cv2.resize(rng.integers(0, 256, (4, 4, 3), dtype=np.uint8), (16, 16), interpolation=cv2.INTER_NEAREST)
+
+ICONS = {"mail": icon(0), "vip": icon(1)}
+
+def frame(positions, scale=1):
+    """Frame with the icons pasted at their (x, y) pixel positions of a WIDTH x HEIGHT frame"""
+    image = np.full((HEIGHT * scale, WIDTH * scale, 3), 90, dtype=np.uint8)
+    for name, (x, y) in positions.items():
+        scaled = cv2.resize(ICONS[name], None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+        image[y * scale:y * scale + scaled.shape[0], x * scale:x * scale + scaled.shape[1]] = scaled
+    return image
+
+@pytest.fixture
+def backend(tmp_path):
+    for name, image in ICONS.items():
+        cv2.imwrite(str(tmp_path / f"{name}.png"), image)
+    return TemplateMatchingBackend(str(tmp_path), reference_width=WIDTH, match_scale=1.0)
+
+def center(x, y):
+    return pytest.approx(((x + 8) / WIDTH, (y + 8) / HEIGHT), abs=1e-6)
+
+def test_finds_templates_at_their_positions(backend):
+    elements = backend.detect(frame({"mail": (20, 30), "vip": (100, 70)}), 0.9)
+    assert [e.name for e in elements] == ["mail", "vip"]
+    assert (elements[0].x, elements[0].y) == center(20, 30)
+    assert (elements[1].x, elements[1].y) == center(100, 70)
+    assert elements[0].width == pytest.approx(16 / WIDTH) and elements[0].confidence > 0.99
+
+def test_names_and_threshold_filter(backend):
+    image = frame({"mail": (20, 30)})
+    assert [e.name for e in backend.detect(image, 0.9)] == ["mail"]
+    assert backend.detect(image, 0.9, names=["vip"]) == []
+    assert backend.detect(image, 0.9, names=["vip", "gifts"]) == []
+    assert [e.name for e in backend.detect(image, 0.9, names=["mail"])] == ["mail"]
+
+def test_moved_template_is_found_across_the_frame(backend):
+    backend.detect(frame({"mail": (20, 30)}), 0.9)
+    assert backend.last_locations[(WIDTH, HEIGHT, "mail")] == (20, 30)
+
+    # Far outside the local search window around the last location
+    elements = backend.detect(frame({"mail": (120, 90)}), 0.9)
+    assert (elements[0].x, elements[0].y) == center(120, 90)
+    assert backend.last_locations[(WIDTH, HEIGHT, "mail")] == (120, 90)
+
+def test_templates_are_rescaled_per_window_size(backend):
+    elements = backend.detect(frame({"vip": (60, 40)}, scale=2), 0.9)
+    assert [e.name for e in elements] == ["vip"]
+    assert (elements[0].x, elements[0].y) == center(60, 40)
+    assert set(backend.scaled_templates) == {(2 * WIDTH, 2 * HEIGHT)}
+    assert backend.scaled_templates[(2 * WIDTH, 2 * HEIGHT)]["vip"].shape[:2] == (32, 32)
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+import core.detection_cache as detection_cache
+from core.detection_cache import DetectionCache, frame_fingerprint
+from core.element_detection import ElementDetector
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(detection_cache.time, 'monotonic', clock)
+    return clock
+
+def frame(seed, shape=(120, 160, 3)):
+    # Blocky frames, so their thumbnails differ clearly
+    rng = np.random.default_rng(seed)
+    return np.kron(rng.integers(0, 256, (shape[0] // 20, shape[1] // 20, shape[2]), dtype=np.uint8),
+                   np.ones((20, 20, 1), dtype=np.uint8))
+
+def test_fingerprint_ignores_pixel_noise():
+    image = frame(0)
+    noisy = np.clip(image.astype(np.int16) + np.random.default_rng(1).integers(-2, 3, image.shape),
+                    0, 255).astype(np.uint8)
+    diff = np.abs(frame_fingerprint(image).astype(np.int16) - frame_fingerprint(noisy))
+    assert frame_fingerprint(image).shape == (16, 16)
+    assert diff.max() <= 2
+
+def test_hit_miss_and_noise_tolerance(clock):
+    cache = DetectionCache()
+    image = frame(0)
+    assert cache.get(image, 1.0, cache_key=1) is None
+    cache.put(image, ["mail"], cache_key=1)
+    assert cache.get(image.copy(), 1.0) == ["mail"]
+    assert cache.get(frame(1), 1.0, cache_key=1) is None
+
+    # Noise that moves the thumbnail by up to tolerance hits through the window's last frame
+    shifted = np.clip(image.astype(np.int16) + 3, 0, 255).astype(np.uint8)
+    assert cache.get(shifted, 1.0, cache_key=1) == ["mail"]
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 2
+
+def test_entries_expire_after_the_timeout(clock):
+    cache = DetectionCache()
+    image = frame(0)
+    cache.put(image, ["mail"], cache_key=1)
+    clock.now += 0.5
+    assert cache.get(image, 1.0) == ["mail"]
+    clock.now += 0.6
+    assert cache.get(image, 1.0, cache_key=1) is None
+    assert cache.stats()['expirations'] == 1
+    assert cache.stats()['entries'] == 0 and cache.latest == {}
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = DetectionCache(max_entries=2)
+    cache.put(frame(0), [0])
+    cache.put(frame(1), [1])
+    assert cache.get(frame(0), 1.0) == [0]   # frame 1 is now the oldest
+    cache.put(frame(2), [2])
+    assert cache.get(frame(1), 1.0) is None
+    assert cache.get(frame(0), 1.0) == [0]
+    assert cache.get(frame(2), 1.0) == [2]
+    assert cache.stats()['evictions'] == 1
+
+def test_detector_runs_backend_once_per_frame(stub_backend):
+    detector = ElementDetector(None, fast_backend=stub_backend)
+    image = frame(0)
+    first = detector.detect_elements(image, 0.5, cache_key=1)
+    second = detector.detect_elements(image.copy(), 0.5, cache_key=1)
+    assert [e.name for e in first] == [e.name for e in second] == ["mail", "vip"]
+    assert stub_backend.calls == 1
+    detector.detect_elements(image, 0.5, use_cache=False)
+    assert stub_backend.calls == 2
+    # The threshold applies to cached results too
+    assert [e.name for e in detector.detect_elements(image, 0.92, cache_key=1)] == ["vip"]
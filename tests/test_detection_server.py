@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+import stat
+import threading
+import time
+import numpy as np
+import pytest
+from multiprocessing.connection import Client
+from core.detection_server import (AUTHKEY_ENV, DetectionClient, DetectionServer, create_authkey,
+                                   load_authkey)
+from core.element_detection import DetectedElement, ElementDetector
+
+class BrightnessBackend:
+    """One element whose confidence is the frame's mean brightness, so replies identify frames"""
+
+    def detect(self, image, threshold, names=None):
+        element = DetectedElement("mail", float(image.mean()) / 255, 0.5, 0.5, 0.1, 0.1)
+        return [element] if element.confidence >= threshold and (names is None or "mail" in names) else []
+
+def test_authkey_file_is_private_and_fresh(tmp_path, monkeypatch):
+    monkeypatch.delenv(AUTHKEY_ENV, raising=False)
+    path = str(tmp_path / "keys" / "server.key")
+    key = create_authkey(path)
+    assert len(key) == 32
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert load_authkey(path) == key
+    assert create_authkey(path) != key
+
+def test_authkey_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv(AUTHKEY_ENV, "00ff")
+    assert load_authkey(str(tmp_path / "missing.key")) == b"\x00\xff"
+    monkeypatch.delenv(AUTHKEY_ENV)
+    with pytest.raises(RuntimeError):
+        load_authkey(str(tmp_path / "missing.key"))
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.delenv(AUTHKEY_ENV, raising=False)
+    detector = ElementDetector(None, fast_backend=BrightnessBackend(), min_confidence=0.0, fast_threshold=0.0)
+    server = DetectionServer(detector, ('127.0.0.1', 0), authkey_file=str(tmp_path / "server.key"))
+    server.start()
+    deadline = time.monotonic() + 5
+    while server.listener is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield server
+    server.stop()
+
+def run_client(address, authkey, results):
+    """Client in its own process, as the bots use it; four threads share the connection"""
+    client = DetectionClient(address, authkey)
+    replies = {}
+
+    def query(level):
+        image = np.full((60, 80, 3), level, dtype=np.uint8)
+        for _ in range(20):
+            elements = client.detect_elements(image, 0.0, use_cache=False)
+            replies.setdefault(level, set()).add(round(elements[0].confidence * 255))
+    threads = [threading.Thread(target=query, args=(level,)) for level in (40, 80, 120, 160)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    found = client.find_elements(np.full((60, 80, 3), 200, dtype=np.uint8), ["mail", "vip"], 0.5)
+    client.close()
+    results.put((replies, sorted(found)))
+
+def test_clients_get_the_result_of_their_own_frame(server, tmp_path):
+    address = server.listener.address
+    authkey = load_authkey(str(tmp_path / "server.key"))
+    results = multiprocessing.get_context("fork").Queue()
+    process = multiprocessing.get_context("fork").Process(target=run_client, args=(address, authkey, results))
+    process.start()
+    replies, found = results.get(timeout=30)
+    process.join()
+    assert replies == {40: {40}, 80: {80}, 120: {120}, 160: {160}}
+    assert found == ["mail"]
+    assert server.request_count == 81
+
+def test_wrong_key_is_refused_and_server_keeps_serving(server, tmp_path):
+    from multiprocessing import AuthenticationError
+    with pytest.raises(AuthenticationError):
+        Client(server.listener.address, authkey=b'gog_viper')
+    connection = Client(server.listener.address, authkey=load_authkey(str(tmp_path / "server.key")))
+    connection.send(('info',))
+    assert connection.recv()[0] == 'ok'
+    connection.close()
@@ -0,0 +1,235 @@
+import json
+import cv2
+import numpy as np
+import pytest
+import torch
+import torch.nn as nn
+from core.element_detection import DetectedElement, ElementDetector
+from core.instrumentation import metrics
+
+WIDTH, HEIGHT = 160, 120
+# Gray level of each category's block; the background is darker than both
+LEVELS = {"mail": 220, "vip": 150}
+BACKGROUND = 60
+
+class BlockModel(nn.Module):
+    """
+    Detects the uniform blocks of frame(): every connected area brighter
+    than the background in the red channel is a box, labeled mail (1) when
+    it is as bright as a mail block and vip (2) otherwise. Letterbox padding
+    normalizes to 0 and is not detected. Notes the batch size of every call.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes = []
+
+    def forward(self, x):
+        self.batch_sizes.append(len(x))
+        outputs = []
+        for image in x:
+            red = image[0].numpy()
+            count, components, stats, _ = cv2.connectedComponentsWithStats((red > 0.0).astype(np.uint8))
+            boxes, labels = [], []
+            for k in range(1, count):
+                left, top, width, height, _ = stats[k]
+                boxes.append([left, top, left + width, top + height])
+                labels.append(1 if red[components == k].max() > 1.0 else 2)
+            outputs.append({'boxes': torch.tensor(boxes, dtype=torch.float32).reshape(-1, 4),
+                            'labels': torch.tensor(labels, dtype=torch.int64),
+                            'scores': torch.full((len(boxes),), 0.9)})
+        return outputs
+
+def frame(blocks, size=(HEIGHT, WIDTH)):
+    """BGR frame with a block per (name, (x1, y1, x2, y2) relative) item of blocks"""
+    height, width = size
+    image = np.full((height, width, 3), BACKGROUND, dtype=np.uint8)
+    for name, (x1, y1, x2, y2) in blocks.items():
+        image[int(y1 * height):int(y2 * height), int(x1 * width):int(x2 * width)] = LEVELS[name]
+    return image
+
+def boxes(elements):
+    """name -> relative (x1, y1, x2, y2) of every element"""
+    return {e.name: (e.x - e.width / 2, e.y - e.height / 2, e.x + e.width / 2, e.y + e.height / 2)
+            for e in elements}
+
+def assert_boxes(elements, expected, tolerance=0.03):
+    found = boxes(elements)
+    assert len(elements) == len(found) and set(found) == set(expected)
+    for name, box in expected.items():
+        assert found[name] == pytest.approx(box, abs=tolerance), name
+
+@pytest.fixture
+def make_detector(tmp_path):
+    model_path = tmp_path / "model.pt"
+    torch.save(BlockModel().eval(), model_path)
+    categories_path = tmp_path / "categories.json"
+    categories_path.write_text(json.dumps({"mail": 1, "vip": 2}))
+
+    def make_detector(**kwargs):
+        detector = ElementDetector(str(model_path), str(categories_path), input_size=(60, 80),
+                                   background_load=False, **kwargs)
+        detector.model.batch_sizes.clear()   # Forget the warmup call
+        return detector
+    return make_detector
+
+MAIL = (0.1, 0.1, 0.3, 0.3)
+VIP = (0.6, 0.6, 0.8, 0.8)
+
+def test_full_frame_detection(make_detector):
+    detector = make_detector()
+    elements = detector.detect_elements(frame({"mail": MAIL, "vip": VIP}), use_cache=False)
+    assert_boxes(elements, {"mail": MAIL, "vip": VIP})
+    assert detector.inference_count == 1
+
+def incremental_detector(make_detector):
+    return make_detector(incremental=True, tile_size=16, tile_margin=8)
+
+def test_incremental_carries_over_clean_tiles(make_detector):
+    detector = incremental_detector(make_detector)
+    first = detector.detect_elements(frame({"mail": MAIL, "vip": VIP}), use_cache=False, cache_key=1)
+    second = detector.detect_elements(frame({"mail": MAIL, "vip": VIP}), use_cache=False, cache_key=1)
+    assert boxes(second) == boxes(first)
+    assert detector.inference_count == 1 and detector.region_inference_count == 0
+
+def test_incremental_redetects_only_dirty_tiles(make_detector):
+    detector = incremental_detector(make_detector)
+    detector.detect_elements(frame({"mail": MAIL, "vip": VIP}), use_cache=False, cache_key=1)
+    mail = boxes(detector.frame_states[1].elements)["mail"]
+
+    moved = (0.55, 0.5, 0.75, 0.7)
+    elements = detector.detect_elements(frame({"mail": MAIL, "vip": moved}), use_cache=False, cache_key=1)
+    assert_boxes(elements, {"mail": MAIL, "vip": moved})
+    # mail was outside the changed tiles and is carried over as detected on the first frame
+    assert boxes(elements)["mail"] == mail
+    assert detector.inference_count == 1 and detector.region_inference_count >= 1
+
+    # A block that disappears is dropped with its tiles
+    elements = detector.detect_elements(frame({"mail": MAIL}), use_cache=False, cache_key=1)
+    assert_boxes(elements, {"mail": MAIL})
+    assert detector.inference_count == 1
+
+def test_incremental_falls_back_to_a_full_frame(make_detector):
+    detector = incremental_detector(make_detector)
+    detector.detect_elements(frame({"mail": MAIL}), use_cache=False, cache_key=1)
+
+    # Most tiles changed: one full pass instead of many regions
+    changed = frame({"vip": (0.0, 0.0, 0.9, 0.9)})
+    regions = detector.region_inference_count
+    assert_boxes(detector.detect_elements(changed, use_cache=False, cache_key=1), {"vip": (0.0, 0.0, 0.9, 0.9)})
+    assert detector.inference_count == 2 and detector.region_inference_count == regions
+
+    # So does a window that was resized, and a window seen for the first time
+    detector.detect_elements(frame({"mail": MAIL}, size=(90, 160)), use_cache=False, cache_key=1)
+    detector.detect_elements(frame({"mail": MAIL}), use_cache=False, cache_key=2)
+    assert detector.inference_count == 4 and detector.region_inference_count == regions
+
+def test_batch_maps_letterboxed_boxes_back_to_each_frame(make_detector):
+    detector = make_detector()
+    # Wider, taller and same-aspect frames, so padding is added on either axis or not at all
+    frames = [frame({"mail": MAIL, "vip": VIP}, size=(90, 240)),
+              frame({"mail": (0.5, 0.1, 0.9, 0.4), "vip": (0.1, 0.6, 0.4, 0.9)}, size=(200, 100)),
+              frame({"vip": VIP}, size=(120, 160))]
+    batched = detector.detect_elements_batch(frames, use_cache=False)
+    assert detector.model.batch_sizes == [3]
+
+    for image, elements in zip(frames, batched):
+        expected = boxes(detector.detect_elements(image, use_cache=False))
+        assert_boxes(elements, expected)
+
+def test_batch_skips_cached_frames(make_detector):
+    detector = make_detector()
+    frames = [frame({"mail": MAIL}), frame({"vip": VIP})]
+    detector.detect_elements(frames[0], cache_key=1)
+    batched = detector.detect_elements_batch(frames, cache_keys=[1, 2])
+    assert detector.model.batch_sizes == [1, 1]
+    assert [[e.name for e in elements] for elements in batched] == [["mail"], ["vip"]]
+
+def test_fast_backend_alone_when_it_finds_every_category(make_detector, stub_backend):
+    detector = make_detector(fast_backend=stub_backend)
+    elements = detector.detect_elements(frame({"mail": MAIL, "vip": VIP}), cache_key=1)
+    assert elements == stub_backend.elements
+    assert detector.fast_path_count == 1 and detector.inference_count == 0
+
+def test_model_fills_in_what_the_fast_backend_missed(make_detector, stub_backend):
+    # The backend only has a mail template, and places it apart from the block the model sees
+    backend = stub_backend
+    backend.elements = [DetectedElement("mail", 0.95, 0.5, 0.5, 0.1, 0.1)]
+    detector = make_detector(fast_backend=backend)
+    image = frame({"mail": MAIL, "vip": VIP})
+
+    elements = detector.detect_elements(image, cache_key=1)
+    assert elements[0] == backend.elements[0]
+    assert_boxes(elements[1:], {"vip": VIP})
+    assert detector.fast_path_count == 0 and detector.inference_count == 1
+
+    # The merged result is complete and cached, the partial one never is
+    assert detector.detect_elements(image, cache_key=1) == elements
+    assert backend.calls == 1 and detector.inference_count == 1
+
+    # detect_elements_batch merges the same way
+    batched = detector.detect_elements_batch([image], use_cache=False)
+    assert batched == [elements]
+
+def test_no_model_uses_the_fast_backend_result_as_it_is(stub_backend):
+    stub_backend.elements = stub_backend.elements[:1]
+    detector = ElementDetector(None, fast_backend=stub_backend)
+    assert detector.detect_elements(frame({}), 0.5) == stub_backend.elements
+    assert detector.fast_path_count == 1
+
+@pytest.fixture
+def stages():
+    """How often find_elements answered at each stage, read from the shared metrics"""
+    metrics.reset()
+    metrics.enable()
+    yield lambda: {dict(labels)['stage']: value for (name, labels), value in metrics.counters.items()
+                   if name == "find_elements_stage"}
+    metrics.disable()
+    metrics.reset()
+
+def test_find_answers_from_the_cache(make_detector, stages):
+    detector = make_detector()
+    image = frame({"mail": MAIL, "vip": VIP})
+    detector.detect_elements(image, cache_key=1)
+    found = detector.find_elements(image, ["vip"], cache_key=1)
+    assert list(found) == ["vip"]
+    assert stages() == {"cache": 1} and detector.inference_count == 1
+
+def test_find_stops_at_the_fast_backend(make_detector, stub_backend, stages):
+    stub_backend.elements = stub_backend.elements[:1]
+    detector = make_detector(fast_backend=stub_backend)
+    image = frame({"mail": MAIL, "vip": VIP})
+    assert detector.find_elements(image, ["mail"], cache_key=1) == {"mail": stub_backend.elements[0]}
+    assert stages() == {"fast": 1} and detector.inference_count == 0
+    # Only the wanted names were looked for, so nothing is cached
+    assert detector.detection_cache.stats()['entries'] == 0
+
+def test_find_searches_where_elements_were_last_seen(make_detector, stages):
+    detector = make_detector()
+    detector.find_elements(frame({"vip": VIP}), ["vip"], cache_key=1)
+    assert stages() == {"full": 1}
+
+    moved = (0.65, 0.55, 0.85, 0.75)
+    found = detector.find_elements(frame({"vip": moved}), ["vip"], use_cache=False, cache_key=1)
+    assert_boxes(found.values(), {"vip": moved})
+    assert stages() == {"full": 1, "roi": 1}
+    assert detector.inference_count == 1 and detector.region_inference_count == 1
+
+    # Last positions are per window
+    detector.find_elements(frame({"vip": moved}), ["vip"], use_cache=False, cache_key=2)
+    assert stages() == {"full": 2, "roi": 1} and detector.inference_count == 2
+
+def test_find_falls_back_to_a_cached_full_pass(make_detector, stub_backend, stages):
+    stub_backend.elements = stub_backend.elements[:1]
+    detector = make_detector(fast_backend=stub_backend)
+    image = frame({"mail": MAIL, "vip": VIP})
+
+    found = detector.find_elements(image, ["mail", "vip", "gifts"], cache_key=1)
+    assert found["mail"] == stub_backend.elements[0]
+    assert_boxes([found["vip"]], {"vip": VIP})
+    assert "gifts" not in found
+    assert stages() == {"full": 1} and detector.inference_count == 1
+
+    # The full pass is complete and cached for detect_elements
+    assert detector.detect_elements(image, cache_key=1) == [found["mail"], found["vip"]]
+    assert detector.inference_count == 1 and stub_backend.calls == 1
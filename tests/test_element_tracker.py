@@ -0,0 +1,158 @@
+import numpy as np
+import pytest
+from core.element_detection import DetectedElement
+from core.element_tracker import ElementTracker
+
+WIDTH, HEIGHT, ICON = 200, 100, 20
+ICONS = {name: np.random.default_rng(seed).integers(0, 256, (ICON, ICON, 3), dtype=np.uint8)
+         for seed, name in enumerate(("mail", "vip"))}
+
+def render(positions):
+    """Frame with the named icons at pixel (x, y) top-left corners"""
+    image = np.full((HEIGHT, WIDTH, 3), 100, dtype=np.uint8)
+    for name, (x, y) in positions.items():
+        image[y:y + ICON, x:x + ICON] = ICONS[name]
+    return image
+
+class ScriptedDetector:
+    """Reports the icons at the positions the test last rendered, counting its runs"""
+    min_confidence = 0.05
+
+    def __init__(self):
+        self.positions = {}
+        self.runs = []
+
+    def _elements(self):
+        return [DetectedElement(name, 0.9, (x + ICON / 2) / WIDTH, (y + ICON / 2) / HEIGHT,
+                                ICON / WIDTH, ICON / HEIGHT) for name, (x, y) in self.positions.items()]
+
+    def detect_elements(self, image, threshold=0.7, use_cache=True, cache_timeout=1.0, cache_key=None):
+        self.runs.append(None)
+        return [e for e in self._elements() if e.confidence >= threshold]
+
+    def find_elements(self, image, names, threshold=0.7, use_cache=True, cache_timeout=1.0, cache_key=None):
+        names = set(names)
+        self.runs.append(names)
+        return {e.name: e for e in self._elements() if e.name in names and e.confidence >= threshold}
+
+@pytest.fixture
+def detector():
+    return ScriptedDetector()
+
+def frame(detector, positions):
+    detector.positions = dict(positions)
+    return render(positions)
+
+def test_tracks_replace_detection_on_a_still_screen(detector):
+    tracker = ElementTracker(detector, detection_interval=5, decay=0.9)
+    image = frame(detector, {"mail": (30, 40), "vip": (120, 20)})
+    first = tracker.detect_elements(image, 0.5, cache_key=1)
+    second = tracker.detect_elements(image.copy(), 0.5, cache_key=1)
+    assert len(detector.runs) == 1
+    assert {e.name for e in second} == {e.name for e in first} == {"mail", "vip"}
+    # Every verification decays the detection's confidence
+    assert [e.confidence for e in second] == pytest.approx([0.81, 0.81])
+    assert [e.confidence for e in tracker.detect_elements(image, 0.5, cache_key=1)] == pytest.approx([0.729, 0.729])
+
+def test_small_moves_are_followed(detector):
+    tracker = ElementTracker(detector)
+    tracker.find_elements(frame(detector, {"mail": (30, 40)}), ["mail"], 0.5, cache_key=1)
+    moved = render({"mail": (34, 37)})
+    mail = tracker.find_elements(moved, ["mail"], 0.5, cache_key=1)["mail"]
+    assert len(detector.runs) == 1
+    assert mail.x == pytest.approx((34 + ICON / 2) / WIDTH)
+    assert mail.y == pytest.approx((37 + ICON / 2) / HEIGHT)
+
+def test_detector_runs_when_a_track_is_lost(detector):
+    tracker = ElementTracker(detector)
+    tracker.detect_elements(frame(detector, {"mail": (30, 40)}), 0.5, cache_key=1)
+    assert tracker.detect_elements(frame(detector, {}), 0.5, cache_key=1) == []
+    assert len(detector.runs) == 2
+    assert tracker.stats()['verification_failures'] == 1
+
+def test_detector_runs_every_interval_and_when_confidence_decays(detector):
+    tracker = ElementTracker(detector, detection_interval=3, decay=0.99)
+    image = frame(detector, {"mail": (30, 40)})
+    for _ in range(6):
+        tracker.detect_elements(image, 0.5, cache_key=1)
+    assert len(detector.runs) == 2
+
+    tracker = ElementTracker(detector, detection_interval=100, decay=0.5)
+    detector.runs.clear()
+    for _ in range(3):
+        tracker.detect_elements(image, 0.5, cache_key=1)
+    # 0.9 decays to 0.45 on the first verification, below the threshold
+    assert len(detector.runs) == 3
+
+def test_find_queries_only_untracked_names(detector):
+    tracker = ElementTracker(detector)
+    image = frame(detector, {"mail": (30, 40), "vip": (120, 20)})
+    tracker.find_elements(image, ["mail"], 0.5, cache_key=1)
+    found = tracker.find_elements(image, ["mail", "vip"], 0.5, cache_key=1)
+    assert set(found) == {"mail", "vip"}
+    assert detector.runs == [{"mail"}, {"vip"}]
+    tracker.find_elements(image, ["mail", "vip"], 0.5, cache_key=1)
+    assert len(detector.runs) == 2
+
+def test_windows_are_tracked_separately(detector):
+    tracker = ElementTracker(detector)
+    image = frame(detector, {"mail": (30, 40)})
+    tracker.detect_elements(image, 0.5, cache_key=1)
+    tracker.detect_elements(image, 0.5, cache_key=2)
+    tracker.detect_elements(image, 0.5, cache_key=1)
+    assert len(detector.runs) == 2
+    tracker.reset(1)
+    tracker.detect_elements(image, 0.5, cache_key=1)
+    assert len(detector.runs) == 3
+
+def test_query_replaces_the_hidden_track_of_a_name(detector):
+    tracker = ElementTracker(detector, max_misses=2)
+    tracker.detect_elements(frame(detector, {"mail": (30, 40), "vip": (120, 20)}), 0.5, cache_key=1)
+    # vip is covered: its track fails verification and is kept as a miss
+    tracker.detect_elements(frame(detector, {"mail": (30, 40)}), 0.5, cache_key=1)
+    assert sorted((t.element.name, t.misses) for t in tracker.windows[1].tracks) == [("mail", 0), ("vip", 1)]
+
+    # mail verifies, vip is queried again and found: one vip track, not two
+    image = frame(detector, {"mail": (30, 40), "vip": (120, 20)})
+    assert set(tracker.find_elements(image, ["mail", "vip"], 0.5, cache_key=1)) == {"mail", "vip"}
+    assert detector.runs[-1] == {"vip"}
+    assert sorted((t.element.name, t.misses) for t in tracker.windows[1].tracks) == [("mail", 0), ("vip", 0)]
+
+def test_query_that_misses_a_hidden_name_ages_its_track(detector):
+    tracker = ElementTracker(detector, max_misses=2)
+    tracker.detect_elements(frame(detector, {"mail": (30, 40), "vip": (120, 20)}), 0.5, cache_key=1)
+    image = frame(detector, {"mail": (30, 40)})
+    tracker.detect_elements(image, 0.5, cache_key=1)
+    for misses in (2, None):
+        assert tracker.find_elements(image, ["mail", "vip"], 0.5, cache_key=1).keys() == {"mail"}
+        vip = [t.misses for t in tracker.windows[1].tracks if t.element.name == "vip"]
+        assert vip == ([misses] if misses else [])
+
+class BatchDetector(ScriptedDetector):
+    """ScriptedDetector with detect_elements_batch, noting the batch sizes"""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def detect_elements_batch(self, images, threshold=0.7, use_cache=True, cache_timeout=1.0,
+                              cache_keys=None, executor=None):
+        self.batches.append(len(images))
+        return [self.detect_elements(image, threshold) for image in images]
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_batch_detects_only_windows_whose_tracks_fail(batched):
+    detector = BatchDetector() if batched else ScriptedDetector()
+    tracker = ElementTracker(detector)
+    image = frame(detector, {"mail": (30, 40)})
+    results = tracker.detect_elements_batch([image, image, image], 0.5, cache_keys=[1, 2, 3])
+    assert [[e.name for e in elements] for elements in results] == [["mail"]] * 3
+    assert len(detector.runs) == 3
+
+    # Window 2 lost its element, the other two verify their tracks
+    empty = frame(detector, {})
+    results = tracker.detect_elements_batch([image, empty, image], 0.5, cache_keys=[1, 2, 3])
+    assert [[e.name for e in elements] for elements in results] == [["mail"], [], ["mail"]]
+    assert len(detector.runs) == 4 and tracker.stats()['detections'] == 4
+    if batched:
+        assert detector.batches == [3, 1]
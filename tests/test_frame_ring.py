@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+import numpy as np
+import pytest
+from core.capture_backends import ReplayCaptureBackend
+from core.frame_ring import CaptureThread, FrameRing
+from core.window_manager import WindowManager
+
+def image(value, shape=(4, 6, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+def test_wrapped_ring_returns_the_newest_frame():
+    ring = FrameRing(slots=3)
+    assert ring.latest() is None
+    for value in range(1, 8):
+        ring.write(image(value))
+    frame = ring.latest()
+    assert frame.seq == 7 and (frame.image == 7).all() and frame.valid()
+    assert ring.wait_for(after_seq=2).seq == 7
+
+def test_overwritten_slot_is_no_longer_valid():
+    ring = FrameRing(slots=2)
+    ring.write(image(1))
+    frame = ring.latest()
+    ring.write(image(2))
+    assert frame.valid()
+    ring.write(image(3))
+    assert not frame.valid() and (frame.image == 3).all()
+
+def test_resized_frames_get_new_buffers():
+    ring = FrameRing(slots=2)
+    ring.write(image(1))
+    ring.write(image(2))
+    ring.write(image(3, shape=(8, 6, 4)))
+    assert ring.latest().image.shape == (8, 6, 4)
+
+def test_wait_for_times_out_with_none():
+    ring = FrameRing()
+    ring.write(image(1))
+    start = time.monotonic()
+    assert ring.wait_for(after_seq=1, timeout=0.05) is None
+    assert time.monotonic() - start >= 0.05
+
+def test_wait_for_wakes_up_on_a_new_frame():
+    ring = FrameRing()
+    threading.Timer(0.02, ring.write, [image(5)]).start()
+    frame = ring.wait_for(after_seq=0, timeout=5.0)
+    assert frame.seq == 1 and (frame.image == 5).all()
+
+def test_capture_errors_reach_waiting_readers():
+    def capture():
+        raise OSError("window closed")
+    thread = CaptureThread(capture)
+    thread.start()
+    with pytest.raises(OSError):
+        thread.ring.wait_for(timeout=5.0)
+    thread.join(5.0)
+    assert not thread.is_alive()
+
+def capturing_manager(fps=200.0):
+    backend = ReplayCaptureBackend([image(value) for value in (10, 20, 30)])
+    window_manager = WindowManager(backend)
+    window, = window_manager.find_game_windows("Replay")
+    window_manager.start_capture(window, fps=fps, slots=2)
+    return window_manager, window
+
+def test_newer_frame_copies_out_of_the_ring():
+    window_manager, window = capturing_manager()
+    try:
+        copied, seq = window_manager.newer_frame(window, 0, timeout=5.0)
+        expected = copied.copy()
+        # Several captures later every slot of the ring has been rewritten
+        assert window_manager.wait_for_frame(window, seq + 4, timeout=5.0) is not None
+        assert not np.shares_memory(copied, window_manager.latest_frame(window).image)
+        np.testing.assert_array_equal(copied, expected)
+    finally:
+        window_manager.stop_capture()
+    assert window_manager.capture_threads == {}
+
+def test_stop_capture_gives_up_on_a_hung_capture(caplog):
+    release = threading.Event()
+
+    class HangingBackend(ReplayCaptureBackend):
+        def capture(self, window):
+            release.wait()
+            return super().capture(window)
+
+    window_manager = WindowManager(HangingBackend([image(1)]))
+    window, = window_manager.find_game_windows("Replay")
+    window_manager.start_capture(window)
+    thread = window_manager.capture_threads[window.handle]
+    try:
+        start = time.monotonic()
+        with caplog.at_level(logging.WARNING, logger="core.window_manager"):
+            window_manager.stop_capture(timeout=0.1)
+        assert time.monotonic() - start < 2.0
+        assert thread.is_alive() and "did not stop" in caplog.text
+        # Readers waiting on the abandoned ring are released
+        assert thread.ring.wait_for(timeout=5.0) is None
+    finally:
+        release.set()
+        thread.join(5.0)
+    assert not thread.is_alive()
@@ -0,0 +1,95 @@
+import copy
+import json
+import numpy as np
+import pytest
+import torch
+import torch.nn as nn
+from core.element_detection import DetectedElement, ElementDetector
+from core.inference_modes import detection_parity, prepare_model
+
+class Classifier(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.features = nn.Sequential(nn.Conv2d(3, 8, 3, padding=1), nn.ReLU(), nn.AdaptiveAvgPool2d(4))
+        self.head = nn.Linear(8 * 16, 5)
+
+    def forward(self, x):
+        return self.head(torch.flatten(self.features(x), 1))
+
+class FakeDetector(nn.Module):
+    """Two fixed boxes per image, with scores that depend on a convolution of the input"""
+
+    def __init__(self):
+        super().__init__()
+        self.conv = nn.Conv2d(3, 4, 3, padding=1)
+
+    def forward(self, x):
+        outputs = []
+        for image in x:
+            score = torch.sigmoid(self.conv(image[None]).mean())
+            height, width = image.shape[-2:]
+            outputs.append({'boxes': torch.tensor([[0.1 * width, 0.2 * height, 0.3 * width, 0.4 * height],
+                                                   [0.5 * width, 0.5 * height, 0.7 * width, 0.9 * height]]),
+                            'labels': torch.tensor([1, 2]),
+                            'scores': torch.stack([0.5 + 0.4 * score, 0.3 * score])})
+        return outputs
+
+def element(name, x, confidence=0.9):
+    return DetectedElement(name, confidence, x, 0.5, 0.1, 0.1)
+
+def test_parity_of_identical_outputs():
+    frames = [[element("mail", 0.2), element("vip", 0.6)], []]
+    assert detection_parity(frames, frames) == {'recall': 1.0, 'extra': 0, 'max_score_delta': 0.0}
+
+def test_parity_matches_by_name_and_iou():
+    reference = [[element("mail", 0.2), element("vip", 0.6)]]
+    candidate = [[element("mail", 0.21, 0.8), element("vip", 0.9), element("gifts", 0.1)]]
+    result = detection_parity(reference, candidate)
+    assert result['recall'] == 0.5
+    assert result['extra'] == 2
+    assert result['max_score_delta'] == pytest.approx(0.1)
+
+@pytest.mark.parametrize("mode", ["eager", "traced", "channels_last", "int8_dynamic"])
+def test_float_modes_match_eager(mode):
+    torch.manual_seed(0)
+    model = Classifier().eval()
+    example = torch.rand(1, 3, 32, 32)
+    with torch.no_grad():
+        expected = model(example)
+        prepared = prepare_model(model, mode, example)
+        output = prepared(example)
+    torch.testing.assert_close(output, expected, atol=0.05, rtol=0.05)
+
+def test_int8_static_is_calibrated():
+    torch.manual_seed(0)
+    model = Classifier().eval()
+    example = torch.rand(1, 3, 32, 32)
+    with pytest.raises(ValueError):
+        prepare_model(model, "int8_static", example)
+    with torch.no_grad():
+        expected = model(example)
+        quantized = prepare_model(copy.deepcopy(model), "int8_static", example,
+                                  [torch.rand(1, 3, 32, 32) for _ in range(8)])
+        torch.testing.assert_close(quantized(example), expected, atol=0.1, rtol=0.1)
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        prepare_model(Classifier(), "fp4", torch.rand(1, 3, 8, 8))
+
+def test_detector_modes_agree(tmp_path):
+    torch.manual_seed(0)
+    model_path = tmp_path / "model.pt"
+    torch.save(FakeDetector().eval(), model_path)
+    categories_path = tmp_path / "categories.json"
+    categories_path.write_text(json.dumps({"mail": 1, "vip": 2}))
+    frames = [np.random.default_rng(i).integers(0, 256, (60, 80, 3), dtype=np.uint8) for i in range(3)]
+
+    results = {}
+    for mode in ("eager", "channels_last"):
+        detector = ElementDetector(str(model_path), str(categories_path), input_size=(48, 64),
+                                   inference_mode=mode, background_load=False)
+        results[mode] = [detector.detect_elements(frame, 0.1, use_cache=False) for frame in frames]
+    assert [e.name for e in results["eager"][0]] == ["mail", "vip"]
+    parity = detection_parity(results["eager"], results["channels_last"])
+    assert parity['recall'] == 1.0 and parity['extra'] == 0
+    assert parity['max_score_delta'] < 1e-4
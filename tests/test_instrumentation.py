@@ -0,0 +1,105 @@
+import json
+import math
+import re
+import numpy as np
+import pytest
+from core.instrumentation import NULL_SPAN, Histogram, Instrumentation
+
+def test_histogram_quantiles_are_within_bucket_precision():
+    values = np.random.default_rng(0).lognormal(mean=-4, sigma=1.5, size=5000)
+    histogram = Histogram()
+    for value in values:
+        histogram.observe(float(value))
+    assert histogram.count == 5000 and histogram.sum == pytest.approx(values.sum())
+    assert histogram.max == values.max()
+    for q in (0.5, 0.95, 0.99):
+        assert histogram.quantile(q) == pytest.approx(np.quantile(values, q), rel=0.1)
+    assert histogram.quantile(1.0) <= histogram.max
+
+def test_histogram_edge_cases():
+    histogram = Histogram()
+    assert math.isnan(histogram.quantile(0.5))
+    histogram.observe(0.25)
+    assert histogram.quantile(0.5) == pytest.approx(0.25, rel=0.1)
+    # Beyond the last bucket, quantiles are capped by the largest value
+    histogram.observe(500.0)
+    assert histogram.quantile(0.99) <= 500.0
+
+def test_counters_add_up_per_label_set():
+    metrics = Instrumentation(enabled=True)
+    metrics.count("detection_cache", result="hit")
+    metrics.count("detection_cache", result="hit")
+    metrics.count("detection_cache", result="miss")
+    metrics.count("batch_frames", 5)
+    counters = {(entry['name'], tuple(entry['labels'].items())): entry['value']
+                for entry in metrics.snapshot()['counters']}
+    assert counters == {("batch_frames", ()): 5,
+                        ("detection_cache", (("result", "hit"),)): 2,
+                        ("detection_cache", (("result", "miss"),)): 1}
+
+def test_spans_time_blocks_and_count_errors():
+    metrics = Instrumentation(enabled=True, trace_size=2)
+    for _ in range(3):
+        with metrics.span("capture_window"):
+            pass
+    with pytest.raises(ValueError):
+        with metrics.span("detect_elements", kind="full"):
+            raise ValueError("model failed")
+
+    snapshot = metrics.snapshot()
+    histograms = {entry['name']: entry for entry in snapshot['histograms']}
+    assert histograms["capture_window"]['count'] == 3
+    assert histograms["detect_elements"]['labels'] == {"kind": "full"}
+    assert {entry['name']: entry['value'] for entry in snapshot['counters']} == {"detect_elements_errors": 1}
+    # Only the last trace_size spans are traced
+    assert [span['name'] for span in snapshot['trace']] == ["capture_window", "detect_elements"]
+
+def test_disabled_instrumentation_records_nothing():
+    metrics = Instrumentation()
+    assert metrics.span("capture_window") is NULL_SPAN
+    with metrics.span("capture_window"):
+        pass
+    metrics.count("sequences", result="done")
+    metrics.observe("sequence", 1.0)
+    assert metrics.histograms == {} and metrics.counters == {}
+
+    metrics.enable()
+    metrics.count("sequences", result="done")
+    metrics.disable()
+    metrics.count("sequences", result="done")
+    assert list(metrics.counters.values()) == [1]
+    metrics.reset()
+    assert metrics.counters == {}
+
+def test_prometheus_text_format():
+    metrics = Instrumentation(enabled=True)
+    for seconds in (0.01, 0.02, 0.03):
+        metrics.observe("model_inference", seconds, kind="batch")
+    metrics.count("sequences", sequence='say "hi"', result="done")
+    text = metrics.prometheus_text()
+    lines = text.splitlines()
+    assert text.endswith("\n")
+
+    assert "# TYPE gog_viper_model_inference_seconds summary" in lines
+    assert "# TYPE gog_viper_sequences_total counter" in lines
+    quantiles = [line for line in lines if 'quantile=' in line]
+    assert [re.search(r'quantile="([^"]+)"', line).group(1) for line in quantiles] == ["0.5", "0.95", "0.99"]
+    assert all(line.startswith('gog_viper_model_inference_seconds{kind="batch",') for line in quantiles)
+    assert 'gog_viper_model_inference_seconds_count{kind="batch"} 3' in lines
+    sum_line, = [line for line in lines if line.startswith("gog_viper_model_inference_seconds_sum")]
+    assert float(sum_line.split()[-1]) == pytest.approx(0.06)
+    # Label values are escaped
+    assert 'gog_viper_sequences_total{result="done",sequence="say \\"hi\\""} 1' in lines
+
+    # Every sample line is name{labels} value
+    sample = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[^}]*\})? \S+$')
+    assert all(sample.match(line) for line in lines if not line.startswith("#"))
+
+def test_export_json(tmp_path):
+    metrics = Instrumentation(enabled=True)
+    metrics.observe("sequence", 0.5, sequence="inbox")
+    metrics.export_json(str(tmp_path / "metrics.json"))
+    exported = json.loads((tmp_path / "metrics.json").read_text())
+    assert exported['histograms'][0]['labels'] == {"sequence": "inbox"}
+    assert exported['exported'] >= exported['started']
+    assert "sequence{sequence=inbox}" in metrics.format_table()
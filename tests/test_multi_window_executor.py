@@ -0,0 +1,136 @@
+import threading
+import time
+import numpy as np
+import pytest
+from core.action_manager import Action, ActionManager, ActionSequence
+from core.element_detection import DetectedElement, ElementDetector
+from core.element_tracker import ElementTracker
+from core.multi_window_executor import MultiWindowExecutor, summarize
+from core.simulated_environment import SimulatedCaptureBackend, SimulatedState, Transition
+from core.window_manager import WindowManager
+
+WIDTH, HEIGHT = 160, 120
+# Where each state shows its button, relative (x1, y1, x2, y2)
+BUTTONS = {"mail": (0.1, 0.1, 0.3, 0.3), "close": (0.7, 0.1, 0.9, 0.3)}
+
+def screen(button):
+    image = np.full((HEIGHT, WIDTH, 4), 60, dtype=np.uint8)
+    x1, y1, x2, y2 = BUTTONS[button]
+    image[int(y1 * HEIGHT):int(y2 * HEIGHT), int(x1 * WIDTH):int(x2 * WIDTH), :3] = 220
+    return image
+
+class ButtonBackend:
+    """Finds the buttons by their bright pixels"""
+
+    def detect(self, image, threshold, names=None):
+        elements = []
+        for name, (x1, y1, x2, y2) in BUTTONS.items():
+            if image[int((y1 + y2) / 2 * HEIGHT), int((x1 + x2) / 2 * WIDTH), 0] > 200:
+                elements.append(DetectedElement(name, 0.9, (x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1))
+        return [e for e in elements if names is None or e.name in names]
+
+class FailingCapture(SimulatedCaptureBackend):
+    def capture(self, window):
+        if window.handle == 2:
+            raise OSError("window closed")
+        return super().capture(window)
+
+def spy(obj, name, calls):
+    """Note (class name, thread, number of frames) of every call of obj.name"""
+    method = getattr(obj, name)
+
+    def wrapper(images, *args, **kwargs):
+        calls.append((type(obj).__name__, threading.current_thread().name, len(images)))
+        return method(images, *args, **kwargs)
+    setattr(obj, name, wrapper)
+
+def environment(window_count=3, backend_class=SimulatedCaptureBackend, tracker=False):
+    states = {"home": SimulatedState("home", screen("mail"), [Transition(BUTTONS["mail"], "mail")]),
+              "mail": SimulatedState("mail", screen("close"), [Transition(BUTTONS["close"], "home")])}
+    simulation = backend_class(states, "home", window_count, render_latency=0.05, noise=2)
+    backend = ButtonBackend()
+    detector = ElementDetector(None, fast_backend=backend)
+    action_manager = ActionManager(WindowManager(simulation), ElementTracker(detector) if tracker else detector)
+    sequence = ActionSequence("inbox")
+    sequence.add_action(Action("open_mail", "mail", [], timeout=2.0, retry_interval=0.05))
+    sequence.add_action(Action("close_mail", "close", [], timeout=2.0, retry_interval=0.05))
+    action_manager.sequences["inbox"] = sequence
+    windows = action_manager.window_manager.find_game_windows("Simulated")
+    return simulation, backend, action_manager, windows
+
+@pytest.mark.parametrize("tracker", [False, True])
+def test_every_window_runs_the_sequence(tracker):
+    simulation, backend, action_manager, windows = environment(tracker=tracker)
+    calls = []
+    detector = action_manager.element_detector
+    spy(detector, "detect_elements_batch", calls)
+    if tracker:
+        spy(detector.detector, "detect_elements_batch", calls)
+    executor = MultiWindowExecutor(action_manager.window_manager, action_manager)
+    try:
+        runs = executor.run("inbox", windows)
+    finally:
+        executor.close()
+    assert [run.status for run in runs.values()] == ["done"] * 3
+    assert all(run.actions_done == 2 for run in runs.values())
+    assert simulation.transitions == 6 and simulation.missed_clicks == 0
+    time.sleep(simulation.render_latency)
+    assert all(simulation.state(window) == "home" for window in windows)
+
+    # The shared retry logic recorded a timing per action and window
+    summary = action_manager.timing_summary()
+    assert summary["open_mail"]["count"] == 3 and summary["close_mail"]["count"] == 3
+    assert summary["close_mail"]["failed"] == 0
+
+    # The first round detects every window's first frame in one batch, through the tracker
+    # into the detector, and detectors are only called from the thread running run()
+    main = threading.current_thread().name
+    if tracker:
+        assert calls[:2] == [("ElementTracker", main, 3), ("ElementDetector", main, 3)]
+    else:
+        assert calls[0] == ("ElementDetector", main, 3)
+    assert {thread for _, thread, _ in calls} == {main}
+
+def test_missing_target_fails_at_the_action_timeout():
+    _, _, action_manager, windows = environment(window_count=2)
+    action_manager.sequences["inbox"].actions[1] = Action("vip", "vip", [], timeout=0.3, retry_interval=0.05)
+    executor = MultiWindowExecutor(action_manager.window_manager, action_manager)
+    try:
+        runs = executor.run("inbox", windows)
+    finally:
+        executor.close()
+    for run in runs.values():
+        assert run.status == "failed" and run.actions_done == 1
+        assert "vip not found" in run.error
+        assert run.finished - run.started >= 0.3
+    assert action_manager.timing_summary()["vip"]["failed"] == 2
+    assert summarize(runs, 1.0) == {'windows': 2, 'done': 0, 'failed': 2, 'actions': 2,
+                                    'actions_per_sec': 2.0}
+
+def test_max_retries_caps_detections():
+    _, _, action_manager, windows = environment(window_count=1)
+    action_manager.sequences["inbox"].actions[0] = Action("vip", "vip", [], timeout=5.0, retry_interval=0.01)
+    executor = MultiWindowExecutor(action_manager.window_manager, action_manager)
+    try:
+        runs = executor.run("inbox", windows, max_retries=3)
+    finally:
+        executor.close()
+    assert runs[windows[0].handle].status == "failed"
+    assert action_manager.action_timings[0].attempts == 3
+
+def test_a_failing_window_does_not_stop_the_others():
+    simulation, _, action_manager, windows = environment(backend_class=FailingCapture)
+    executor = MultiWindowExecutor(action_manager.window_manager, action_manager)
+    try:
+        runs = executor.run("inbox", windows)
+    finally:
+        executor.close()
+    assert {handle: run.status for handle, run in runs.items()} == {1: "done", 2: "failed", 3: "done"}
+    assert "window closed" in runs[2].error
+
+def test_unknown_sequence_is_rejected():
+    _, _, action_manager, windows = environment(window_count=1)
+    executor = MultiWindowExecutor(action_manager.window_manager, action_manager)
+    with pytest.raises(ValueError):
+        executor.run("missing", windows)
+    executor.close()
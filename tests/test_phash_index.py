@@ -0,0 +1,131 @@
+import json
+import random
+import cv2
+import numpy as np
+import pytest
+from dataset_creator import DatasetCreator
+from phash_index import (INDEX_FILE, BKTree, PerceptualHashIndex, dedup_directory,
+                         group_near_duplicates, grouped_split, hamming, phash)
+
+def screens(count, seed=0):
+    """Distinct blocky screens, far apart in phash distance"""
+    rng = np.random.default_rng(seed)
+    return [cv2.resize(rng.integers(0, 256, (8, 8, 3), dtype=np.uint8), (64, 48),
+                       interpolation=cv2.INTER_NEAREST) for _ in range(count)]
+
+def noisy(image, seed=0):
+    noise = np.random.default_rng(seed).integers(-3, 4, image.shape)
+    return np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+def test_phash_ignores_capture_noise_but_not_other_screens():
+    first, second = screens(2)
+    assert hamming(phash(first), phash(noisy(first))) <= 2
+    assert hamming(phash(first), phash(second)) > 10
+    assert phash(first) == phash(cv2.cvtColor(first, cv2.COLOR_BGR2BGRA))
+
+@pytest.mark.parametrize("max_distance", [0, 3, 10, 32])
+def test_bktree_search_matches_brute_force(max_distance):
+    rng = random.Random(max_distance)
+    hashes = [rng.getrandbits(64) for _ in range(300)]
+    # Near copies so small radii have hits too
+    hashes += [value ^ (1 << rng.randrange(64)) for value in hashes[:50]]
+    tree = BKTree()
+    for i, value in enumerate(hashes):
+        tree.add(value, i)
+    assert len(tree) == len(hashes)
+
+    for query in hashes[:20] + [rng.getrandbits(64) for _ in range(20)]:
+        expected = sorted((hamming(query, value), i) for i, value in enumerate(hashes)
+                          if hamming(query, value) <= max_distance)
+        results = tree.search(query, max_distance)
+        assert sorted(results) == expected
+        assert [distance for distance, _ in results] == sorted(distance for distance, _ in results)
+
+def test_group_near_duplicates_is_transitive():
+    # 0-1 and 1-2 are within 2 bits, 0-2 are 4 apart
+    hashes = [0b0000, 0b0011, 0b1111, (1 << 64) - 1]
+    assert group_near_duplicates(hashes, max_distance=2) == [0, 0, 0, 1]
+    assert group_near_duplicates(hashes, max_distance=0) == [0, 1, 2, 3]
+
+def test_grouped_split_keeps_groups_on_one_side(tmp_path):
+    paths, groups = [], []
+    for group, image in enumerate(screens(8)):
+        for copy in range(3):
+            path = tmp_path / f"{group}_{copy}.png"
+            cv2.imwrite(str(path), noisy(image, seed=copy))
+            paths.append(path)
+            groups.append(group)
+
+    train, val = grouped_split(paths, val_fraction=0.25, seed=1)
+    assert sorted(train + val) == list(range(len(paths)))
+    assert len(val) >= 0.25 * len(paths)
+    assert not {groups[i] for i in train} & {groups[i] for i in val}
+    assert grouped_split(paths, val_fraction=0.25, seed=1) == (train, val)
+
+def test_dedup_directory_keeps_the_first_of_each_screen(tmp_path):
+    first, second = screens(2)
+    for name, image in (("a.png", first), ("b.png", noisy(first)), ("c.png", second)):
+        cv2.imwrite(str(tmp_path / name), image)
+
+    duplicates = dedup_directory(tmp_path, move_to=str(tmp_path / "duplicates"))
+    assert duplicates == {"b.png": "a.png"}
+    assert sorted(path.name for path in tmp_path.glob("*.png")) == ["a.png", "c.png"]
+    assert (tmp_path / "duplicates" / "b.png").exists()
+
+def test_index_round_trips_through_json(tmp_path):
+    index = PerceptualHashIndex(max_distance=4)
+    index.add("a.png", 0xdeadbeef)
+    with pytest.raises(ValueError):
+        index.add("a.png", 0)
+    index.save(tmp_path / INDEX_FILE)
+
+    loaded = PerceptualHashIndex.load(tmp_path / INDEX_FILE)
+    assert loaded.max_distance == 4 and loaded.hashes == index.hashes
+    assert loaded.find(0xdeadbeef ^ 0b11) == ("a.png", 2)
+    assert PerceptualHashIndex.load(tmp_path / INDEX_FILE, max_distance=1).find(0xdeadbeef ^ 0b11) is None
+
+def test_dataset_creator_saves_duplicates_without_dedup(tmp_path):
+    creator = DatasetCreator(str(tmp_path))
+    image = screens(1)[0]
+    assert creator.save_screenshot(image, "a") is not None
+    assert creator.save_screenshot(image, "b") is not None
+    assert creator.dedup_index is None
+    assert not (tmp_path / INDEX_FILE).exists()
+
+def test_dataset_creator_skips_near_duplicates(tmp_path):
+    creator = DatasetCreator(str(tmp_path), dedup_distance=4)
+    first, second = screens(2)
+    assert creator.save_screenshot(first, "a") == tmp_path / "images" / "a.png"
+    assert creator.save_screenshot(noisy(first), "b") is None
+    assert creator.save_screenshot(second, "c") is not None
+    assert creator.skipped_duplicates == 1
+    assert sorted(path.name for path in (tmp_path / "images").iterdir()) == ["a.png", "c.png"]
+
+def test_dataset_creator_batches_index_writes(tmp_path):
+    creator = DatasetCreator(str(tmp_path), dedup_distance=4)
+    creator.index_save_every = 3
+    images = screens(4)
+    index_path = tmp_path / INDEX_FILE
+    for i, image in enumerate(images[:2]):
+        creator.save_screenshot(image, str(i))
+    assert not index_path.exists()
+
+    creator.save_screenshot(images[2], "2")
+    assert len(json.loads(index_path.read_text())['hashes']) == 3
+
+    creator.save_screenshot(images[3], "3")
+    assert len(json.loads(index_path.read_text())['hashes']) == 3
+    creator.flush()
+    assert len(json.loads(index_path.read_text())['hashes']) == 4
+    assert creator.unsaved_hashes == 0
+
+def test_dataset_creator_indexes_images_saved_since_the_last_write(tmp_path):
+    first, second = screens(2)
+    (tmp_path / "images").mkdir()
+    cv2.imwrite(str(tmp_path / "images" / "old.png"), first)
+
+    creator = DatasetCreator(str(tmp_path), dedup_distance=4)
+    assert creator.save_screenshot(noisy(first), "new") is None
+    assert creator.save_screenshot(second, "other") is not None
+    creator.flush()
+    assert set(json.loads((tmp_path / INDEX_FILE).read_text())['hashes']) == {"old.png", "other.png"}
@@ -0,0 +1,46 @@
+import tracemalloc
+import cv2
+import numpy as np
+import pytest
+from core.preprocessing import FramePreprocessor
+
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+@pytest.mark.parametrize("channels", [3, 4])
+def test_matches_reference_preprocessing(channels):
+    frame = np.random.default_rng(0).integers(0, 256, (120, 160, channels), dtype=np.uint8)
+    tensor = FramePreprocessor(MEAN, STD)(frame, (60, 80))
+    resized = cv2.resize(frame, (80, 60), interpolation=cv2.INTER_AREA)
+    rgb = cv2.cvtColor(resized, cv2.COLOR_BGRA2RGB if channels == 4 else cv2.COLOR_BGR2RGB)
+    expected = ((rgb / 255.0 - MEAN) / STD).transpose(2, 0, 1)[None]
+    assert tensor.shape == (1, 3, 60, 80)
+    np.testing.assert_allclose(tensor.numpy(), expected, atol=1e-5)
+
+def test_steady_state_reuses_buffers():
+    preprocessor = FramePreprocessor(MEAN, STD)
+    frames = [np.random.default_rng(i).integers(0, 256, (600, 800, 4), dtype=np.uint8) for i in range(3)]
+    first = preprocessor(frames[0], (300, 400))
+    pointer = first.data_ptr()
+    for frame in frames[1:]:
+        assert preprocessor(frame, (300, 400)).data_ptr() == pointer
+    assert len(preprocessor.buffers) == 1
+    # A new size gets its own buffers and leaves the others alone
+    assert preprocessor(frames[0], (150, 200)).data_ptr() != pointer
+    assert len(preprocessor.buffers) == 2
+
+def test_steady_state_makes_no_large_allocations():
+    preprocessor = FramePreprocessor(MEAN, STD)
+    frame = np.random.default_rng(0).integers(0, 256, (600, 800, 4), dtype=np.uint8)
+    preprocessor(frame, (300, 400))
+
+    tracemalloc.start()
+    try:
+        for _ in range(10):
+            preprocessor(frame, (300, 400))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # A float32 input alone would be 1.4 MB; what remains is the fixed-size
+    # cast buffer NumPy uses for the uint8 * float32 multiply
+    assert peak < 256 * 1024
@@ -0,0 +1,125 @@
+import threading
+import time
+import numpy as np
+import pytest
+from core.element_detection import DetectedElement
+from core.session_recorder import SessionReader, SessionRecorder
+from dataset_creator import DatasetCreator
+
+def frames(count, shape, seed=0):
+    """A blocky screen that changes a few tiles per frame, like a game UI"""
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 256, shape, dtype=np.uint8)
+    result = []
+    for _ in range(count):
+        image = image.copy()
+        y, x = rng.integers(0, shape[0] - 5), rng.integers(0, shape[1] - 5)
+        image[y:y + 5, x:x + 5] = rng.integers(0, 256)
+        result.append(image)
+    return result
+
+@pytest.fixture
+def session(tmp_path):
+    """Two windows of sizes that are not whole tiles, one resized and switched to grayscale midway"""
+    first = frames(7, (30, 45, 4))
+    second = frames(3, (20, 17, 3), seed=1) + frames(4, (20, 17), seed=2)
+    recorded = []
+    path = tmp_path / "session.gvsr"
+    with SessionRecorder(str(path), keyframe_interval=3, tile_size=8) as recorder:
+        for a, b in zip(first, second):
+            for window, image in ((1, a), (2, b)):
+                assert recorder.record_frame(image, window) == len(recorded)
+                recorded.append((window, image))
+    return path, recorded
+
+def test_frames_decode_pixel_exact(session):
+    path, recorded = session
+    reader = SessionReader(str(path))
+    assert len(reader) == len(recorded) and reader.windows == [1, 2]
+    assert sum(entry.keyframe for entry in reader.entries) < len(recorded) / 2
+    for position, (window, image) in enumerate(recorded):
+        assert reader.entries[position].window == window
+        np.testing.assert_array_equal(reader[position], image)
+
+def test_random_access_decodes_from_the_previous_keyframe(session):
+    path, recorded = session
+    reader = SessionReader(str(path))
+    for position in (11, 3, 13, 0, -1, 6):
+        np.testing.assert_array_equal(reader[position], recorded[position][1])
+
+def test_window_filter(session):
+    path, recorded = session
+    reader = SessionReader(str(path), window=2)
+    expected = [image for window, image in recorded if window == 2]
+    assert len(reader) == len(expected)
+    for decoded, image in zip(reader, expected):
+        np.testing.assert_array_equal(decoded, image)
+
+def test_truncated_recording_is_read_up_to_its_last_whole_frame(session):
+    path, recorded = session
+    last = SessionReader(str(path)).entries[-1].offset
+    data = path.read_bytes()
+    # The bot died while writing the last frame: no index, half a record
+    path.write_bytes(data[:last + 20])
+    reader = SessionReader(str(path))
+    assert len(reader) == len(recorded) - 1
+    for position in range(len(reader)):
+        np.testing.assert_array_equal(reader[position], recorded[position][1])
+
+def test_events_are_attached_to_their_frames(tmp_path):
+    images = frames(3, (24, 32, 3))
+    mail = DetectedElement("mail", 0.9, 0.5, 0.5, 0.25, 0.5)
+    path = tmp_path / "session.gvsr"
+    with SessionRecorder(str(path), tile_size=8) as recorder:
+        recorder.record_frame(images[0], window=1)
+        recorder.record_frame(images[1], window=2)
+        recorder.record_detections([mail], window=1)
+        recorder.record_click(1, 0.5, 0.5)
+        recorder.record_frame(images[2], window=1)
+        recorder.record_click(2, 0.1, 0.2)
+
+    reader = SessionReader(str(path))
+    clicks = reader.events('click')
+    assert [(event['window'], event['frame']) for event in clicks] == [(1, 0), (2, 1)]
+    detections, = reader.events('detections')
+    assert detections['frame'] == 0 and detections['elements'][0]['name'] == "mail"
+
+    dataset = DatasetCreator(str(tmp_path / "dataset"))
+    paths = reader.export_to_dataset(dataset, prefix="s")
+    assert [p.name for p in paths] == ["s_1_000000.png", "s_2_000001.png", "s_1_000002.png"]
+    annotations = sorted(p.name for p in dataset.annotations_path.iterdir())
+    assert annotations == ["s_1_000000.json"]
+
+def test_events_after_a_dropped_frame_are_detached(tmp_path):
+    images = frames(5, (16, 16, 3))
+    writing, release = threading.Event(), threading.Event()
+    recorder = SessionRecorder(str(tmp_path / "session.gvsr"), tile_size=8, max_queue=2)
+    write_frame = recorder._write_frame
+
+    def stalled_write_frame(*args):
+        writing.set()
+        release.wait()
+        write_frame(*args)
+    recorder._write_frame = stalled_write_frame
+
+    try:
+        assert recorder.record_frame(images[0], window=1) == 0
+        assert writing.wait(5.0)
+        # The writer is stuck on frame 0, two more fill the queue
+        assert recorder.record_frame(images[1], window=1) == 1
+        assert recorder.record_frame(images[2], window=1) == 2
+        assert recorder.record_frame(images[3], window=1) is None
+        recorder.record_click(1, 0.5, 0.5)
+        assert recorder.dropped_frames == 1 and recorder.dropped_events == 1
+    finally:
+        release.set()
+    while not recorder.queue.empty():
+        time.sleep(0.001)
+    recorder.record_click(1, 0.5, 0.5)
+    recorder.close()
+
+    reader = SessionReader(str(recorder.path))
+    assert len(reader) == 3
+    np.testing.assert_array_equal(reader[2], images[2])
+    # Not attached to frame 2, which was captured before the click's screen
+    assert [event['frame'] for event in reader.events('click')] == [None]
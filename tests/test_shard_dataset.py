@@ -0,0 +1,65 @@
+import json
+import numpy as np
+import pytest
+import torch
+from dataloader_creator import GameUIDataset
+from shard_dataset import INDEX_FILE, ShardedUIDataset, iterate_shard, pack_shards
+
+def as_array(image):
+    return np.asarray(image)
+
+@pytest.fixture
+def shards(folder_dataset, tmp_path):
+    dataset = GameUIDataset(str(folder_dataset))
+    # shard_size_mb=0 starts a new shard for every sample
+    index = pack_shards(dataset, str(tmp_path / "shards"), shard_size_mb=0, val_fraction=0.3)
+    return tmp_path / "shards", index
+
+def test_pack_writes_index_and_splits(shards):
+    shard_dir, index = shards
+    assert json.loads((shard_dir / INDEX_FILE).read_text()) == index
+    assert index['categories'] == {"mail": 1, "vip": 2}
+    assert sum(shard['num_samples'] for shard in index['splits']['train']) == 7
+    assert sum(shard['num_samples'] for shard in index['splits']['val']) == 3
+    assert all((shard_dir / shard['file']).exists()
+               for split in index['splits'].values() for shard in split)
+
+def test_round_trip_keeps_images_paired_with_annotations(shards):
+    shard_dir, _ = shards
+    seen = []
+    for split in ("train", "val"):
+        dataset = ShardedUIDataset(str(shard_dir), split, transform=as_array)
+        samples = list(dataset)
+        assert len(samples) == len(dataset)
+        for image, annotations in samples:
+            i = annotations[0]['id']
+            assert image.shape == (24, 32, 3)
+            assert (image == 20 * i).all()
+            np.testing.assert_allclose(annotations[0]['bbox'], [4 / 32, 2 / 24, 8 / 32, 6 / 24])
+            seen.append(i)
+    assert sorted(seen) == list(range(10))
+
+def test_iterate_shard_yields_raw_pairs(shards):
+    shard_dir, index = shards
+    pairs = [pair for shard in index['splits']['val'] for pair in iterate_shard(shard_dir / shard['file'])]
+    assert len(pairs) == 3
+    assert all(image_bytes.startswith(b'\x89PNG') for image_bytes, _ in pairs)
+
+def test_shuffle_follows_seed_and_epoch(shards):
+    shard_dir, _ = shards
+
+    def order(seed, epoch):
+        dataset = ShardedUIDataset(str(shard_dir), "train", transform=as_array, shuffle_buffer=3, seed=seed)
+        dataset.set_epoch(epoch)
+        return [annotations[0]['id'] for _, annotations in dataset]
+
+    assert order(0, 0) == order(0, 0)
+    assert sorted(order(0, 1)) == sorted(order(0, 0))
+    assert len({tuple(order(0, epoch)) for epoch in range(5)}) > 1
+
+def test_workers_read_disjoint_shards(shards):
+    shard_dir, _ = shards
+    dataset = ShardedUIDataset(str(shard_dir), "train", transform=as_array)
+    loader = torch.utils.data.DataLoader(dataset, batch_size=None, num_workers=2)
+    ids = [annotations[0]['id'] for _, annotations in loader]
+    assert len(ids) == 7 and len(set(ids)) == 7